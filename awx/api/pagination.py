@@ -1,12 +1,17 @@
 # Copyright (c) 2015 Ansible, Inc.
 # All Rights Reserved.
 
+import base64
+import json
 from collections import OrderedDict
 
 # Django REST Framework
 from django.conf import settings
 from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import F, Q, QuerySet
+from django.utils.dateparse import parse_datetime
 from rest_framework import pagination
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from rest_framework.utils.urls import replace_query_param
 from rest_framework.settings import api_settings
@@ -102,31 +107,151 @@ class LimitPagination(pagination.BasePagination):
         return self.default_limit
 
 
+class EventCursorPagination(pagination.BasePagination):
+    """
+    Keyset pagination for job events, ordered by (job_created, job, counter).
+
+    Each page is fetched with a `WHERE (key) > (last key of the previous
+    page)` condition rather than an OFFSET, and no count is done, so walking
+    the events of a job costs the same for every page.  Start with an empty
+    `cursor` query parameter and follow the opaque `next` link.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = settings.MAX_PAGE_SIZE
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.key_fields = self.get_key_fields(queryset.model)
+        position = self.decode_cursor(request)
+        if isinstance(queryset, QuerySet):
+            # NULLs last, as postgres sorts them ascending, whatever the database
+            events = queryset.order_by(*[F(name).asc(nulls_last=True) for name in self.key_fields])
+            if position is not None:
+                events = events.filter(self.after(position))
+        else:
+            # archived events, see ArchivedEventList, which also sorts NULLs last
+            events = queryset.order_by(*self.key_fields)
+            if position is not None:
+                events = events.filter(lambda event: self.sort_key(event) > self.sort_key(position))
+        results = list(events[: self.page_size + 1])
+        self.next_position = None
+        if len(results) > self.page_size:
+            results = results[: self.page_size]
+            self.next_position = {name: getattr(results[-1], name) for name in self.key_fields}
+        return results
+
+    def get_key_fields(self, model):
+        return ['job_created', model.JOB_REFERENCE, 'counter']
+
+    def get_page_size(self, request):
+        try:
+            return pagination._positive_int(request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def sort_key(self, event):
+        values = [event.get(name) if isinstance(event, dict) else getattr(event, name) for name in self.key_fields]
+        # legacy events have no job_created, they sort last like NULLs in the database
+        return [(value is None, value) for value in values]
+
+    def after(self, position):
+        # (a, b, c) > (x, y, z) is a > x or (a = x and b > y) or (a = x and b = y and c > z)
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name in self.key_fields:
+            value = position[name]
+            if value is None:
+                # NULLs sort last, nothing is greater
+                equal &= Q(**{f'{name}__isnull': True})
+            else:
+                condition |= equal & (Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True}))
+                equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(position, dict) or set(position) != set(self.key_fields):
+                raise ValueError(encoded)
+            # the job reference and counter are integers, job_created an ISO 8601 date or null for legacy events
+            for name in self.key_fields[1:]:
+                if type(position[name]) is not int:
+                    raise ValueError(encoded)
+            if position['job_created'] is not None:
+                position['job_created'] = parse_datetime(position['job_created'])
+                if position['job_created'] is None:
+                    raise ValueError(encoded)
+            return position
+        except (TypeError, ValueError, AttributeError):
+            raise ParseError(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        position = dict(position, job_created=position['job_created'].isoformat() if position['job_created'] else None)
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.get_full_path()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([('next', self.get_next_link()), ('results', data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
 class UnifiedJobEventPagination(Pagination):
     """
     By default, use Pagination for all operations.
     If `limit` query parameter specified use LimitPagination
+    If `cursor` query parameter specified use EventCursorPagination
     """
 
     def __init__(self, *args, **kwargs):
         self.use_limit_paginator = False
         self.limit_pagination = LimitPagination()
+        self.use_cursor_paginator = False
+        self.cursor_pagination = EventCursorPagination()
         return super().__init__(*args, **kwargs)
 
     def paginate_queryset(self, queryset, request, view=None):
-        if 'limit' in request.query_params:
+        if 'cursor' in request.query_params:
+            self.use_cursor_paginator = True
+        elif 'limit' in request.query_params:
             self.use_limit_paginator = True
 
+        if self.use_cursor_paginator:
+            return self.cursor_pagination.paginate_queryset(queryset, request, view=view)
         if self.use_limit_paginator:
             return self.limit_pagination.paginate_queryset(queryset, request, view=view)
         return super().paginate_queryset(queryset, request, view=view)
 
     def get_paginated_response(self, data):
+        if self.use_cursor_paginator:
+            return self.cursor_pagination.get_paginated_response(data)
         if self.use_limit_paginator:
             return self.limit_pagination.get_paginated_response(data)
         return super().get_paginated_response(data)
 
     def get_paginated_response_schema(self, schema):
+        if self.use_cursor_paginator:
+            return self.cursor_pagination.get_paginated_response_schema(schema)
         if self.use_limit_paginator:
             return self.limit_pagination.get_paginated_response_schema(schema)
         return super().get_paginated_response_schema(schema)
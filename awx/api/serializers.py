@@ -75,6 +75,7 @@ from awx.main.models import (
     JobHostSummary,
     JobLaunchConfig,
     JobNotificationMixin,
+    JobTaskStats,
     JobTemplate,
     Label,
     Notification,
@@ -3507,6 +3508,7 @@ class JobSerializer(UnifiedJobSerializer, JobOptionsSerializer):
             dict(
                 job_events=self.reverse('api:job_job_events_list', kwargs={'pk': obj.pk}),  # TODO: consider adding job_created
                 job_host_summaries=self.reverse('api:job_job_host_summaries_list', kwargs={'pk': obj.pk}),
+                task_stats=self.reverse('api:job_task_stats_list', kwargs={'pk': obj.pk}),
                 activity_stream=self.reverse('api:job_activity_stream_list', kwargs={'pk': obj.pk}),
                 notifications=self.reverse('api:job_notifications_list', kwargs={'pk': obj.pk}),
                 labels=self.reverse('api:job_label_list', kwargs={'pk': obj.pk}),
@@ -4406,6 +4408,39 @@ class JobHostSummarySerializer(BaseSerializer):
         return d
 
 
+class JobTaskStatsSerializer(BaseSerializer):
+    elapsed = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = JobTaskStats
+        fields = (
+            '*',
+            '-name',
+            '-description',
+            'job',
+            'task_uuid',
+            'play',
+            'role',
+            'task',
+            'event_counts',
+            'ok',
+            'changed',
+            'failed',
+            'ignored',
+            'skipped',
+            'unreachable',
+            'host_seconds',
+            'started',
+            'finished',
+            'elapsed',
+        )
+
+    def get_related(self, obj):
+        res = super(JobTaskStatsSerializer, self).get_related(obj)
+        res.update(dict(job=self.reverse('api:job_detail', kwargs={'pk': obj.job_id})))
+        return res
+
+
 class JobEventSerializer(BaseSerializer):
     event_display = serializers.CharField(source='get_event_display2', read_only=True)
     event_level = serializers.IntegerField(read_only=True)
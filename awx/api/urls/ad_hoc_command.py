@@ -12,6 +12,7 @@ from awx.api.views import (
     AdHocCommandActivityStreamList,
     AdHocCommandNotificationsList,
     AdHocCommandStdout,
+    AdHocCommandStdoutSearch,
 )
 
 
@@ -24,6 +25,7 @@ urls = [
     re_path(r'^(?P<pk>[0-9]+)/activity_stream/$', AdHocCommandActivityStreamList.as_view(), name='ad_hoc_command_activity_stream_list'),
     re_path(r'^(?P<pk>[0-9]+)/notifications/$', AdHocCommandNotificationsList.as_view(), name='ad_hoc_command_notifications_list'),
     re_path(r'^(?P<pk>[0-9]+)/stdout/$', AdHocCommandStdout.as_view(), name='ad_hoc_command_stdout'),
+    re_path(r'^(?P<pk>[0-9]+)/stdout/search/$', AdHocCommandStdoutSearch.as_view(), name='ad_hoc_command_stdout_search'),
 ]
 
 __all__ = ['urls']
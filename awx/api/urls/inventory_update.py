@@ -11,6 +11,7 @@ from awx.api.views import (
     InventoryUpdateDetail,
     InventoryUpdateCancel,
     InventoryUpdateStdout,
+    InventoryUpdateStdoutSearch,
     InventoryUpdateNotificationsList,
     InventoryUpdateCredentialsList,
 )
@@ -21,6 +22,7 @@ urls = [
     re_path(r'^(?P<pk>[0-9]+)/$', InventoryUpdateDetail.as_view(), name='inventory_update_detail'),
     re_path(r'^(?P<pk>[0-9]+)/cancel/$', InventoryUpdateCancel.as_view(), name='inventory_update_cancel'),
     re_path(r'^(?P<pk>[0-9]+)/stdout/$', InventoryUpdateStdout.as_view(), name='inventory_update_stdout'),
+    re_path(r'^(?P<pk>[0-9]+)/stdout/search/$', InventoryUpdateStdoutSearch.as_view(), name='inventory_update_stdout_search'),
     re_path(r'^(?P<pk>[0-9]+)/notifications/$', InventoryUpdateNotificationsList.as_view(), name='inventory_update_notifications_list'),
     re_path(r'^(?P<pk>[0-9]+)/credentials/$', InventoryUpdateCredentialsList.as_view(), name='inventory_update_credentials_list'),
     re_path(r'^(?P<pk>[0-9]+)/events/$', InventoryUpdateEventsList.as_view(), name='inventory_update_events_list'),
@@ -10,10 +10,12 @@ from awx.api.views import (
     JobRelaunch,
     JobCreateSchedule,
     JobJobHostSummariesList,
+    JobTaskStatsList,
     JobJobEventsChildrenSummary,
     JobJobEventsList,
     JobActivityStreamList,
     JobStdout,
+    JobStdoutSearch,
     JobNotificationsList,
     JobLabelList,
     JobHostSummaryDetail,
@@ -27,10 +29,12 @@ urls = [
     re_path(r'^(?P<pk>[0-9]+)/relaunch/$', JobRelaunch.as_view(), name='job_relaunch'),
     re_path(r'^(?P<pk>[0-9]+)/create_schedule/$', JobCreateSchedule.as_view(), name='job_create_schedule'),
     re_path(r'^(?P<pk>[0-9]+)/job_host_summaries/$', JobJobHostSummariesList.as_view(), name='job_job_host_summaries_list'),
+    re_path(r'^(?P<pk>[0-9]+)/task_stats/$', JobTaskStatsList.as_view(), name='job_task_stats_list'),
     re_path(r'^(?P<pk>[0-9]+)/job_events/$', JobJobEventsList.as_view(), name='job_job_events_list'),
     re_path(r'^(?P<pk>[0-9]+)/job_events/children_summary/$', JobJobEventsChildrenSummary.as_view(), name='job_job_events_children_summary'),
     re_path(r'^(?P<pk>[0-9]+)/activity_stream/$', JobActivityStreamList.as_view(), name='job_activity_stream_list'),
     re_path(r'^(?P<pk>[0-9]+)/stdout/$', JobStdout.as_view(), name='job_stdout'),
+    re_path(r'^(?P<pk>[0-9]+)/stdout/search/$', JobStdoutSearch.as_view(), name='job_stdout_search'),
     re_path(r'^(?P<pk>[0-9]+)/notifications/$', JobNotificationsList.as_view(), name='job_notifications_list'),
     re_path(r'^(?P<pk>[0-9]+)/labels/$', JobLabelList.as_view(), name='job_label_list'),
     re_path(r'^(?P<pk>[0-9]+)/$', JobHostSummaryDetail.as_view(), name='job_host_summary_detail'),
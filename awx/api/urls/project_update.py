@@ -8,6 +8,7 @@ from awx.api.views import (
     ProjectUpdateDetail,
     ProjectUpdateCancel,
     ProjectUpdateStdout,
+    ProjectUpdateStdoutSearch,
     ProjectUpdateScmInventoryUpdates,
     ProjectUpdateNotificationsList,
     ProjectUpdateEventsList,
@@ -19,6 +20,7 @@ urls = [
     re_path(r'^(?P<pk>[0-9]+)/$', ProjectUpdateDetail.as_view(), name='project_update_detail'),
     re_path(r'^(?P<pk>[0-9]+)/cancel/$', ProjectUpdateCancel.as_view(), name='project_update_cancel'),
     re_path(r'^(?P<pk>[0-9]+)/stdout/$', ProjectUpdateStdout.as_view(), name='project_update_stdout'),
+    re_path(r'^(?P<pk>[0-9]+)/stdout/search/$', ProjectUpdateStdoutSearch.as_view(), name='project_update_stdout_search'),
     re_path(r'^(?P<pk>[0-9]+)/scm_inventory_updates/$', ProjectUpdateScmInventoryUpdates.as_view(), name='project_update_scm_inventory_updates'),
     re_path(r'^(?P<pk>[0-9]+)/notifications/$', ProjectUpdateNotificationsList.as_view(), name='project_update_notifications_list'),
     re_path(r'^(?P<pk>[0-9]+)/events/$', ProjectUpdateEventsList.as_view(), name='project_update_events_list'),
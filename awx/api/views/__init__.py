@@ -5,7 +5,9 @@
 import dateutil
 import functools
 import html
+import io
 import itertools
+import json
 import logging
 import re
 import requests
@@ -29,7 +31,7 @@ from django.utils.safestring import mark_safe
 from django.utils.timezone import now
 from django.views.decorators.csrf import csrf_exempt
 from django.template.loader import render_to_string
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 
@@ -58,7 +60,6 @@ from social_core.backends.utils import load_backends
 from oauth2_provider.models import get_access_token_model
 
 import pytz
-from wsgiref.util import FileWrapper
 
 # django-ansible-base
 from ansible_base.lib.utils.requests import get_remote_hosts
@@ -121,6 +122,7 @@ from awx.api.metadata import RoleMetadata
 from awx.main.constants import ACTIVE_STATES, SURVEY_TYPE_MAPPING
 from awx.main.scheduler.dag_workflow import WorkflowDAG
 from awx.api.views.mixin import (
+    ArchivedEventsMixin,
     InstanceGroupMembershipMixin,
     OrganizationCountsMixin,
     RelatedJobsPreventDeleteMixin,
@@ -1085,7 +1087,7 @@ class ProjectUpdateDetail(UnifiedJobDeletionMixin, RetrieveDestroyAPIView):
     serializer_class = serializers.ProjectUpdateDetailSerializer
 
 
-class ProjectUpdateEventsList(SubListAPIView):
+class ProjectUpdateEventsList(ArchivedEventsMixin, SubListAPIView):
     model = models.ProjectUpdateEvent
     serializer_class = serializers.ProjectUpdateEventSerializer
     parent_model = models.ProjectUpdate
@@ -1104,7 +1106,7 @@ class ProjectUpdateEventsList(SubListAPIView):
         return pu.get_event_queryset()
 
 
-class SystemJobEventsList(SubListAPIView):
+class SystemJobEventsList(ArchivedEventsMixin, SubListAPIView):
     model = models.SystemJobEvent
     serializer_class = serializers.SystemJobEventSerializer
     parent_model = models.SystemJob
@@ -3710,6 +3712,16 @@ class JobJobHostSummariesList(BaseJobHostSummariesList):
     parent_model = models.Job
 
 
+class JobTaskStatsList(SubListAPIView):
+    model = models.JobTaskStats
+    serializer_class = serializers.JobTaskStatsSerializer
+    parent_model = models.Job
+    relationship = 'task_stats'
+    name = _('Job Task Stats List')
+    search_fields = ('play', 'role', 'task')
+    filter_read_permission = False
+
+
 class JobHostSummaryDetail(RetrieveAPIView):
     model = models.JobHostSummary
     serializer_class = serializers.JobHostSummarySerializer
@@ -3791,7 +3803,7 @@ class GroupJobEventsList(BaseJobEventsList):
     parent_model = models.Group
 
 
-class JobJobEventsList(BaseJobEventsList):
+class JobJobEventsList(ArchivedEventsMixin, BaseJobEventsList):
     parent_model = models.Job
     pagination_class = UnifiedJobEventPagination
 
@@ -3803,7 +3815,7 @@ class JobJobEventsList(BaseJobEventsList):
 
 class JobJobEventsChildrenSummary(APIView):
     renderer_classes = [JSONRenderer]
-    meta_events = ('debug', 'verbose', 'warning', 'error', 'system_warning', 'deprecated')
+    meta_events = models.JobEvent.META_EVENTS
 
     def get(self, request, **kwargs):
         resp = dict(children_summary={}, meta_event_nested_uuid={}, event_processing_finished=False, is_tree=True)
@@ -3813,96 +3825,7 @@ class JobJobEventsChildrenSummary(APIView):
         else:
             resp["event_processing_finished"] = True
 
-        events = list(job.get_event_queryset().values('counter', 'uuid', 'parent_uuid', 'event').order_by('counter'))
-        if len(events) == 0:
-            return Response(resp)
-
-        # key is counter, value is number of total children (including children of children, etc.)
-        map_counter_children_tally = {i['counter']: {"rowNumber": 0, "numChildren": 0} for i in events}
-        # key is uuid, value is counter
-        map_uuid_counter = {i['uuid']: i['counter'] for i in events}
-        # key is uuid, value is parent uuid. Used as a quick lookup
-        map_uuid_puuid = {i['uuid']: i['parent_uuid'] for i in events}
-        # key is counter of meta events (i.e. verbose), value is uuid of the assigned parent
-        map_meta_counter_nested_uuid = {}
-
-        # collapsible tree view in the UI only makes sense for tree-like
-        # hierarchy. If ansible is ran with a strategy like free or host_pinned, then
-        # events can be out of sequential order, and no longer follow a tree structure
-        # E1
-        #  E2
-        # E3
-        #  E4  <- parent is E3
-        #  E5  <- parent is E1
-        # in the above, there is no clear way to collapse E1, because E5 comes after
-        # E3, which occurs after E1. Thus the tree view should be disabled.
-
-        # mark the last seen uuid at a given level (0-3)
-        # if a parent uuid is not in this list, then we know the events are not tree-like
-        # and return a response with is_tree: False
-        level_current_uuid = [None, None, None, None]
-
-        prev_non_meta_event = events[0]
-        for i, e in enumerate(events):
-            if not e['event'] in JobJobEventsChildrenSummary.meta_events:
-                prev_non_meta_event = e
-            if not e['uuid']:
-                continue
-
-            if not e['event'] in JobJobEventsChildrenSummary.meta_events:
-                level = models.JobEvent.LEVEL_FOR_EVENT[e['event']]
-                level_current_uuid[level] = e['uuid']
-                # if setting level 1, for example, set levels 2 and 3 back to None
-                for u in range(level + 1, len(level_current_uuid)):
-                    level_current_uuid[u] = None
-
-            puuid = e['parent_uuid']
-            if puuid and puuid not in level_current_uuid:
-                # improper tree detected, so bail out early
-                resp['is_tree'] = False
-                return Response(resp)
-
-            # if event is verbose (or debug, etc), we need to "assign" it a
-            # parent. This code looks at the event level of the previous
-            # non-verbose event, and the level of the next (by looking ahead)
-            # non-verbose event. The verbose event is assigned the same parent
-            # uuid of the higher level event.
-            # e.g.
-            # E1
-            #  E2
-            # verbose
-            # verbose <- we are on this event currently
-            #    E4
-            # We'll compare E2 and E4, and the verbose event
-            # will be assigned the parent uuid of E4 (higher event level)
-            if e['event'] in JobJobEventsChildrenSummary.meta_events:
-                event_level_before = models.JobEvent.LEVEL_FOR_EVENT[prev_non_meta_event['event']]
-                # find next non meta event
-                z = i
-                next_non_meta_event = events[-1]
-                while z < len(events):
-                    if events[z]['event'] not in JobJobEventsChildrenSummary.meta_events:
-                        next_non_meta_event = events[z]
-                        break
-                    z += 1
-                event_level_after = models.JobEvent.LEVEL_FOR_EVENT[next_non_meta_event['event']]
-                if event_level_after and event_level_after > event_level_before:
-                    puuid = next_non_meta_event['parent_uuid']
-                else:
-                    puuid = prev_non_meta_event['parent_uuid']
-                if puuid:
-                    map_meta_counter_nested_uuid[e['counter']] = puuid
-            map_counter_children_tally[e['counter']]['rowNumber'] = i
-            if not puuid:
-                continue
-            # now traverse up the parent, grandparent, etc. events and tally those
-            while puuid:
-                map_counter_children_tally[map_uuid_counter[puuid]]['numChildren'] += 1
-                puuid = map_uuid_puuid.get(puuid, None)
-
-        # create new dictionary, dropping events with 0 children
-        resp["children_summary"] = {k: v for k, v in map_counter_children_tally.items() if v['numChildren'] != 0}
-        resp["meta_event_nested_uuid"] = map_meta_counter_nested_uuid
+        resp.update(job.get_events_children_summary())
         return Response(resp)
 
 
@@ -4075,7 +3998,7 @@ class HostAdHocCommandEventsList(BaseAdHocCommandEventsList):
 #    parent_model = Group
 
 
-class AdHocCommandAdHocCommandEventsList(BaseAdHocCommandEventsList):
+class AdHocCommandAdHocCommandEventsList(ArchivedEventsMixin, BaseAdHocCommandEventsList):
     parent_model = models.AdHocCommand
 
 
@@ -4142,36 +4065,16 @@ def redact_ansi(line):
     return re.sub(r'\x1b[^m]*m', '', line)
 
 
-class StdoutFilter(object):
-    def __init__(self, fileobj):
-        self._functions = []
-        self.fileobj = fileobj
-        self.extra_data = ''
-        if hasattr(fileobj, 'close'):
-            self.close = fileobj.close
-
-    def read(self, size=-1):
-        data = self.extra_data
-        while size > 0 and len(data) < size:
-            line = self.fileobj.readline(size)
-            if not line:
-                break
-            line = self.process_line(line)
-            data += line
-        if size > 0 and len(data) > size:
-            self.extra_data = data[size:]
-            data = data[:size]
-        else:
-            self.extra_data = ''
-        return data
-
-    def register(self, func):
-        self._functions.append(func)
-
-    def process_line(self, line):
-        for func in self._functions:
-            line = func(line)
-        return line
+def filter_stdout(chunks, functions):
+    """Apply each of functions to every line of a stream of stdout chunks"""
+    for chunk in chunks:
+        if functions:
+            # lines end at '\n' only, as read from the stdout file before
+            lines = list(io.StringIO(chunk))
+            for func in functions:
+                lines = [func(line) for line in lines]
+            chunk = ''.join(lines)
+        yield chunk
 
 
 class UnifiedJobStdout(RetrieveAPIView):
@@ -4200,39 +4103,47 @@ class UnifiedJobStdout(RetrieveAPIView):
                 dark = bool(dark_val and dark_val[0].lower() in ('1', 't', 'y'))
                 content_only = bool(target_format in ('api', 'json'))
                 dark_bg = (content_only and dark) or (not content_only and (dark or not dark_val))
-                content, start, end, absolute_end = unified_job.result_stdout_raw_limited(start_line, end_line)
+                cache_params = (target_format, str(start_line), str(end_line), dark_bg)
+                rendered = unified_job.get_cached_stdout(*cache_params)
+                if rendered is None:
+                    content, start, end, absolute_end = unified_job.result_stdout_raw_limited(start_line, end_line)
 
-                # Remove any ANSI escape sequences containing job event data.
-                content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
+                    # Remove any ANSI escape sequences containing job event data.
+                    content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
 
-                body = ansiconv.to_html(html.escape(content))
+                    if target_format == 'json':
+                        rendered = {'range': {'start': start, 'end': end, 'absolute_end': absolute_end}, 'content': content}
+                    else:
+                        body = ansiconv.to_html(html.escape(content))
 
-                context = {'title': get_view_name(self.__class__), 'body': mark_safe(body), 'dark': dark_bg, 'content_only': content_only}
-                data = render_to_string('api/stdout.html', context).strip()
+                        context = {'title': get_view_name(self.__class__), 'body': mark_safe(body), 'dark': dark_bg, 'content_only': content_only}
+                        rendered = render_to_string('api/stdout.html', context).strip()
+                    unified_job.cache_stdout(rendered, *cache_params)
 
                 if target_format == 'api':
-                    return Response(mark_safe(data))
+                    return Response(mark_safe(rendered))
                 if target_format == 'json':
-                    content = content.encode('utf-8')
+                    content = rendered['content'].encode('utf-8')
                     if content_encoding == 'base64':
                         content = b64encode(content)
-                    return Response({'range': {'start': start, 'end': end, 'absolute_end': absolute_end}, 'content': content})
-                return Response(data)
-            elif target_format == 'txt':
-                return Response(unified_job.result_stdout)
-            elif target_format == 'ansi':
-                return Response(unified_job.result_stdout_raw)
+                    return Response({'range': rendered['range'], 'content': content})
+                return Response(rendered)
+            elif target_format in ('txt', 'ansi'):
+                rendered = unified_job.get_cached_stdout(target_format)
+                if rendered is None:
+                    rendered = unified_job.result_stdout if target_format == 'txt' else unified_job.result_stdout_raw
+                    unified_job.cache_stdout(rendered, target_format)
+                return Response(rendered)
             elif target_format in {'txt_download', 'ansi_download'}:
                 filename = '{type}_{pk}{suffix}.txt'.format(
                     type=camelcase_to_underscore(unified_job.__class__.__name__), pk=unified_job.id, suffix='.ansi' if target_format == 'ansi_download' else ''
                 )
-                content_fd = unified_job.result_stdout_raw_handle(enforce_max_bytes=False)
-                redactor = StdoutFilter(content_fd)
+                functions = []
                 if target_format == 'txt_download':
-                    redactor.register(redact_ansi)
+                    functions.append(redact_ansi)
                 if type(unified_job) == models.ProjectUpdate:
-                    redactor.register(UriCleaner.remove_sensitive)
-                response = HttpResponse(FileWrapper(redactor), content_type='text/plain')
+                    functions.append(UriCleaner.remove_sensitive)
+                response = StreamingHttpResponse(filter_stdout(unified_job.result_stdout_raw_stream(), functions), content_type='text/plain')
                 response["Content-Disposition"] = 'attachment; filename="{}"'.format(filename)
                 return response
             else:
@@ -4247,6 +4158,69 @@ class UnifiedJobStdout(RetrieveAPIView):
                 return Response(response_message)
 
 
+class UnifiedJobStdoutSearch(RetrieveAPIView):
+    """
+    Find the lines of stdout containing the `q` query parameter, case
+    insensitively.  Each result carries the line number, as used by the
+    start_line and end_line of the stdout endpoint, and `context` (up to 10)
+    lines before and after it; at most `limit` results are returned.
+    """
+
+    serializer_class = serializers.UnifiedJobStdoutSerializer
+    renderer_classes = [JSONRenderer]
+    filter_backends = ()
+    max_context = 10
+
+    def retrieve(self, request, *args, **kwargs):
+        unified_job = self.get_object()
+        pattern = request.query_params.get('q', '')
+        if not pattern:
+            raise ParseError(_('A search term must be given with the q query parameter.'))
+        try:
+            context = min(max(int(request.query_params.get('context', 0)), 0), self.max_context)
+            limit = min(max(int(request.query_params.get('limit', settings.STDOUT_SEARCH_MAX_MATCHES)), 1), settings.STDOUT_SEARCH_MAX_MATCHES)
+        except ValueError:
+            raise ParseError(_('context and limit must be integers.'))
+        functions = [redact_ansi]
+        if type(unified_job) == models.ProjectUpdate:
+            functions.append(UriCleaner.remove_sensitive)
+
+        # lines are matched once cleaned, so a search can not tell whether redacted text is there
+        def clean(line):
+            for func in functions:
+                line = func(line)
+            return line
+
+        return StreamingHttpResponse(self.render_matches(unified_job.search_stdout(pattern, context, clean), limit), content_type='application/json')
+
+    def render_matches(self, matches, limit):
+        # stream the JSON document, matches are written as they are found
+        yield '{"results": ['
+        truncated = False
+        for i, match in enumerate(matches):
+            if i == limit:
+                truncated = True
+                break
+            yield (', ' if i else '') + json.dumps(match)
+        yield '], "truncated": %s}' % json.dumps(truncated)
+
+
+class ProjectUpdateStdoutSearch(UnifiedJobStdoutSearch):
+    model = models.ProjectUpdate
+
+
+class InventoryUpdateStdoutSearch(UnifiedJobStdoutSearch):
+    model = models.InventoryUpdate
+
+
+class JobStdoutSearch(UnifiedJobStdoutSearch):
+    model = models.Job
+
+
+class AdHocCommandStdoutSearch(UnifiedJobStdoutSearch):
+    model = models.AdHocCommand
+
+
 class ProjectUpdateStdout(UnifiedJobStdout):
     model = models.ProjectUpdate
 
@@ -39,7 +39,7 @@ from awx.api.serializers import (
     InventoryUpdateEventSerializer,
     JobTemplateSerializer,
 )
-from awx.api.views.mixin import RelatedJobsPreventDeleteMixin
+from awx.api.views.mixin import ArchivedEventsMixin, RelatedJobsPreventDeleteMixin
 
 from awx.api.pagination import UnifiedJobEventPagination
 
@@ -47,7 +47,7 @@ from awx.api.pagination import UnifiedJobEventPagination
 logger = logging.getLogger('awx.api.views.organization')
 
 
-class InventoryUpdateEventsList(SubListAPIView):
+class InventoryUpdateEventsList(ArchivedEventsMixin, SubListAPIView):
     model = InventoryUpdateEvent
     serializer_class = InventoryUpdateEventSerializer
     parent_model = InventoryUpdate
@@ -2,15 +2,20 @@
 # All Rights Reserved.
 
 import dateutil
+import functools
+import heapq
+import itertools
 import logging
+import operator
 
+from django.conf import settings
 from django.db.models import Count
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.response import Response
 from rest_framework import status
 
@@ -196,3 +201,131 @@ class NoTruncateMixin(object):
         if self.request.query_params.get('no_truncate'):
             context.update(no_truncate=True)
         return context
+
+
+class ArchivedEventList(object):
+    """
+    The archived events of a job that pass some tests, in some order.
+
+    Like a queryset, it is evaluated when counted or sliced, which streams the
+    archive of the job again; only the events of the requested slice (and,
+    when ordered by something else than the archive order, the ones before
+    it) are held in memory.
+    """
+
+    def __init__(self, job, tests=(), ordering=()):
+        self.job = job
+        self.model = job.event_class
+        self.tests = tuple(tests)
+        self.ordering = tuple(ordering)  # (attname, descending) pairs
+        self._count = None
+
+    def filter(self, test):
+        return ArchivedEventList(self.job, self.tests + (test,), self.ordering)
+
+    def order_by(self, *names):
+        ordering = tuple((self.model._meta.get_field(name.lstrip('-')).attname, name.startswith('-')) for name in names)
+        return ArchivedEventList(self.job, self.tests, ordering)
+
+    def __iter__(self):
+        for event in self.job.get_archived_events():
+            if all(test(event) for test in self.tests):
+                yield event
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(1 for event in self)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            events = self[key : key + 1]
+            if not events:
+                raise IndexError(key)
+            return events[0]
+        start, stop = key.start or 0, key.stop
+        if not self.ordering:
+            return list(itertools.islice(self, start, stop))
+        sort_key = functools.cmp_to_key(self.compare)
+        if stop is None:
+            return sorted(self, key=sort_key)[start:]
+        return heapq.nsmallest(stop, self, key=sort_key)[start:]
+
+    def compare(self, a, b):
+        # like postgres, NULLs come last in ascending order and first in descending order
+        for attname, descending in self.ordering:
+            x, y = getattr(a, attname), getattr(b, attname)
+            if x == y:
+                continue
+            if x is None or y is None:
+                result = 1 if x is None else -1
+            else:
+                result = -1 if x < y else 1
+            return -result if descending else result
+        return 0
+
+
+class ArchivedEventsMixin(object):
+    """
+    Serve the events of a job that were moved out of the database by
+    UnifiedJob.archive_events, as an ArchivedEventList.
+
+    Archived events are read from a file rather than queried, so only the
+    query parameters needed to page through the output of a job are
+    supported, anything else is a 400:
+
+    * `counter`, `start_line` and `end_line`, with the `exact`, `gt`, `gte`,
+      `lt` and `lte` lookups
+    * `not__stdout=` to leave out the events with no output
+    * `search`, which matches stdout
+    * `order_by` on `id`, `created`, `counter`, `start_line` or `end_line`
+    """
+
+    archived_event_filter_fields = ('counter', 'start_line', 'end_line')
+    archived_event_order_fields = ('id', 'created', 'counter', 'start_line', 'end_line')
+    archived_event_lookups = {
+        'exact': operator.eq,
+        'gt': operator.gt,
+        'gte': operator.ge,
+        'lt': operator.lt,
+        'lte': operator.le,
+    }
+
+    def filter_queryset(self, queryset):
+        parent = self.get_parent_object()
+        if not parent.events_archived:
+            return super().filter_queryset(queryset)
+        events = ArchivedEventList(parent)
+        params = self.request.query_params
+        for key, values in params.lists():
+            if key in settings.ANSIBLE_BASE_REST_FILTERS_RESERVED_NAMES:
+                continue
+            for value in values:
+                events = events.filter(self.archived_event_filter(key, value))
+        for term in params.getlist('search'):
+            events = events.filter(lambda event, term=term.lower(): term in event.stdout.lower())
+        order_by = params.get('order_by') or params.get('order')
+        if order_by:
+            names = order_by.split(',')
+            for name in names:
+                if name.lstrip('-') not in self.archived_event_order_fields:
+                    raise ParseError(_('Can not order archived events by {}').format(name))
+            events = events.order_by(*names)
+        return events
+
+    def archived_event_filter(self, key, value):
+        if key == 'not__stdout':
+            return lambda event: event.stdout != value
+        name, _sep, lookup = key.partition('__')
+        lookup = lookup or 'exact'
+        if name not in self.archived_event_filter_fields or lookup not in self.archived_event_lookups:
+            raise ParseError(_('Can not filter archived events on {}').format(key))
+        try:
+            arg = int(value)
+        except ValueError:
+            raise ParseError(_('{} must be an integer').format(key))
+        compare = self.archived_event_lookups[lookup]
+        return lambda event: compare(getattr(event, name), arg)
@@ -52,6 +52,7 @@ from awx.main.models import (
     UnpartitionedJobEvent,
     JobHostSummary,
     JobLaunchConfig,
+    JobTaskStats,
     JobTemplate,
     Label,
     Notification,
@@ -2400,6 +2401,27 @@ class JobHostSummaryAccess(BaseAccess):
         return False
 
 
+class JobTaskStatsAccess(BaseAccess):
+    """
+    I can see the task stats of a job whenever I can read the job.
+    """
+
+    model = JobTaskStats
+    select_related = ('job',)
+
+    def filtered_queryset(self):
+        return self.model.objects.filter(job__in=self.user.get_queryset(Job))
+
+    def can_add(self, data):
+        return False
+
+    def can_change(self, obj, data):
+        return False
+
+    def can_delete(self, obj):
+        return False
+
+
 class JobEventAccess(BaseAccess):
     """
     I can see job event records whenever I can read both job and host.
@@ -354,7 +354,9 @@ class Metrics(MetricsNamespace):
 class DispatcherMetrics(Metrics):
     METRICSLIST = [
         SetFloatM('task_manager_get_tasks_seconds', 'Time spent in loading tasks from db'),
+        SetFloatM('task_manager_get_tasks_incremental_seconds', 'Time spent in deciding which tasks to load from db, with TASK_MANAGER_INCREMENTAL'),
         SetFloatM('task_manager_start_task_seconds', 'Time spent starting task'),
+        SetFloatM('task_manager_dispatch_started_tasks_seconds', 'Time spent saving and publishing started tasks, with TASK_MANAGER_BATCH_DISPATCH'),
         SetFloatM('task_manager_process_running_tasks_seconds', 'Time spent processing running tasks'),
         SetFloatM('task_manager_process_pending_tasks_seconds', 'Time spent processing pending tasks'),
         SetFloatM('task_manager__schedule_seconds', 'Time spent in running the entire _schedule'),
@@ -363,7 +365,13 @@ class DispatcherMetrics(Metrics):
         SetIntM('task_manager_tasks_started', 'Number of tasks started'),
         SetIntM('task_manager_running_processed', 'Number of running tasks processed'),
         SetIntM('task_manager_pending_processed', 'Number of pending tasks processed'),
+        SetIntM('task_manager_pending_skipped', 'Number of pending tasks not looked at, because what kept them from starting has not changed'),
         SetIntM('task_manager_tasks_blocked', 'Number of tasks blocked from running'),
+        SetIntM('task_manager_placement_most_remaining_capacity', 'Number of tasks placed by the most_remaining_capacity placement policy'),
+        SetIntM('task_manager_placement_best_fit', 'Number of tasks placed by the best_fit placement policy'),
+        SetIntM('task_manager_placement_spread', 'Number of tasks placed by the spread placement policy'),
+        SetIntM('task_manager_placement_project_affinity', 'Number of tasks placed by the project_affinity placement policy'),
+        SetIntM('task_manager_placement_project_affinity_hits', 'Number of tasks placed on the instance that last ran their project revision'),
         SetFloatM('task_manager_commit_seconds', 'Time spent in db transaction, including on_commit calls'),
         SetFloatM('dependency_manager_get_tasks_seconds', 'Time spent loading pending tasks from db'),
         SetFloatM('dependency_manager_generate_dependencies_seconds', 'Time spent generating dependencies for pending tasks'),
@@ -45,6 +45,8 @@ CAN_CANCEL = ('new', 'pending', 'waiting', 'running')
 ACTIVE_STATES = CAN_CANCEL
 ERROR_STATES = ('error',)
 MINIMAL_EVENTS = set(['playbook_on_play_start', 'playbook_on_task_start', 'playbook_on_stats', 'EOF'])
+# events that may be dropped, when they have no output, while the callback receiver applies backpressure
+BACKPRESSURE_DROPPABLE_EVENTS = set(['verbose', 'debug', 'runner_on_start'])
 CENSOR_VALUE = '************'
 ENV_BLOCKLIST = frozenset(
     (
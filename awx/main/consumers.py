@@ -1,5 +1,9 @@
+import atexit
+import concurrent.futures
 import json
 import logging
+import os
+import threading
 import time
 import hmac
 import asyncio
@@ -118,6 +122,10 @@ class RelayConsumer(AsyncJsonWebsocketConsumer):
 
 
 class EventConsumer(AsyncJsonWebsocketConsumer):
+    # clients that subscribe with "coalesce": true get the events of a job that
+    # the callback receiver batched together as one frame, see internal_batch
+    coalesce = False
+
     async def connect(self):
         user = self.scope['user']
         if user and not user.is_anonymous:
@@ -170,6 +178,9 @@ class EventConsumer(AsyncJsonWebsocketConsumer):
             await self.send_json({"error": "access denied to channel"})
             return
 
+        if 'coalesce' in data:
+            self.coalesce = bool(data['coalesce'])
+
         if 'groups' in data:
             groups = data['groups']
             new_groups = set()
@@ -217,11 +228,110 @@ class EventConsumer(AsyncJsonWebsocketConsumer):
     async def internal_message(self, event):
         await self.send(event['text'])
 
+    async def internal_batch(self, event):
+        if self.coalesce:
+            await self.send('{"group_name": %s, "events": [%s]}' % (json.dumps(event['group_name']), ', '.join(event['texts'])))
+        else:
+            for text in event['texts']:
+                await self.send(text)
+
+
+class ChannelNotificationPublisher:
+    """
+    Sends channel layer messages on behalf of sync code through one event
+    loop per process, run by a daemon thread, so that a notification does not
+    pay for a new event loop and new redis connections every time.
+
+    send() queues the message and returns a future for its delivery; the loop
+    sends queued messages back to back, in order, over the connections of the
+    channel layer. At most CHANNEL_NOTIFICATION_QUEUE_SIZE messages wait at a
+    time; past that send() blocks, as a direct send would, and raises
+    ConnectionError if no room frees up within put_timeout seconds.
+
+    Queued messages are not pipelined into one redis round trip: channels_redis
+    has no bulk group_send, every call looks up the channels of its group and
+    runs its own script. Job events are already batched into one message per
+    group by the callback receiver, see emit_channel_notifications.
+    """
+
+    def __init__(self, maxsize=None, put_timeout=5):
+        self.pid = os.getpid()
+        self.put_timeout = put_timeout
+        self.slots = threading.BoundedSemaphore(maxsize or settings.CHANNEL_NOTIFICATION_QUEUE_SIZE)
+        self.loop = asyncio.new_event_loop()
+        self.queue = asyncio.Queue()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='channel_notification_publisher', daemon=True)
+        self.thread.start()
+        self.publishing = asyncio.run_coroutine_threadsafe(self.publish(), self.loop)
+
+    def send(self, group, message):
+        if not self.slots.acquire(timeout=self.put_timeout):
+            raise ConnectionError(f'Too many channel layer messages queued, could not send message to group {group}')
+        delivered = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (group, message, delivered))
+        return delivered
+
+    def flush(self, timeout=5):
+        """Wait for the queued messages to be sent"""
+        try:
+            asyncio.run_coroutine_threadsafe(self.queue.join(), self.loop).result(timeout)
+        except Exception:
+            logger.warning('Timed out sending queued channel layer messages')
+
+    def close(self, timeout=5):
+        """Send the queued messages, then stop the loop"""
+        if self.pid != os.getpid() or self.loop.is_closed():
+            # a forked process did not inherit the thread running the loop
+            return
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+        try:
+            self.publishing.result(timeout)
+        except Exception:
+            logger.warning('Timed out sending queued channel layer messages')
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=1)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+    async def publish(self):
+        channel_layer = get_channel_layer()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            group, message, delivered = item
+            try:
+                await channel_layer.group_send(group, message)
+            except Exception as e:
+                logger.exception(f'Failed to send channel layer message to group {group}')
+                delivered.set_exception(e)
+            else:
+                delivered.set_result(None)
+            finally:
+                self.slots.release()
+                self.queue.task_done()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_channel_notification_publisher():
+    global _publisher
+    # a forked process (e.g. a dispatcher worker) does not inherit the thread
+    if _publisher is None or _publisher.pid != os.getpid():
+        with _publisher_lock:
+            if _publisher is None or _publisher.pid != os.getpid():
+                _publisher = ChannelNotificationPublisher()
+    return _publisher
+
+
+def close_channel_notification_publisher():
+    if _publisher is not None:
+        _publisher.close()
 
-def run_sync(func):
-    event_loop = asyncio.new_event_loop()
-    event_loop.run_until_complete(func)
-    event_loop.close()
+
+atexit.register(close_channel_notification_publisher)
 
 
 def _dump_payload(payload):
@@ -237,15 +347,23 @@ def unwrap_broadcast_msg(payload: dict):
 
 
 def emit_channel_notification(group, payload):
+    """Queue payload for group, returns a future for its delivery, see ChannelNotificationPublisher"""
     payload_dumped = _dump_payload(payload)
     if payload_dumped is None:
         return
 
-    channel_layer = get_channel_layer()
+    return get_channel_notification_publisher().send(group, {"type": "internal.message", "text": payload_dumped, "needs_relay": True})
 
-    run_sync(
-        channel_layer.group_send(
-            group,
-            {"type": "internal.message", "text": payload_dumped, "needs_relay": True},
-        )
+
+def emit_channel_notifications(group, payloads):
+    """
+    Send several payloads to group as a single channel layer message; clients
+    get them as one frame or, unless they asked for coalescing, one frame each.
+    """
+    payloads_dumped = [dumped for dumped in map(_dump_payload, payloads) if dumped is not None]
+    if not payloads_dumped:
+        return
+
+    return get_channel_notification_publisher().send(
+        group, {"type": "internal.batch", "group_name": payloads[0].get('group_name', group), "texts": payloads_dumped, "needs_relay": True}
     )
@@ -11,11 +11,46 @@ from awx.main.utils import is_testing
 
 logger = logging.getLogger('awx.main.dispatch')
 
+# postgres requires pg_notify payloads to be shorter than 8000 bytes
+PG_NOTIFY_MAX_PAYLOAD = 7999
+
 
 def serialize_task(f):
     return '.'.join([f.__module__, f.__name__])
 
 
+def batch_payloads(bodies, max_payload=PG_NOTIFY_MAX_PAYLOAD):
+    """
+    Pack the given task bodies, see get_async_body, into as few JSON list
+    payloads as fit in a pg_notify message each.
+    """
+    batch, size = [], 1
+    for body in bodies:
+        data = json.dumps(body)
+        # the json module escapes non-ascii characters, so one character is one byte
+        if batch and size + len(data) + 1 > max_payload:
+            yield '[' + ','.join(batch) + ']'
+            batch, size = [], 1
+        batch.append(data)
+        size += len(data) + 1
+    if batch:
+        yield '[' + ','.join(batch) + ']'
+
+
+def publish_batch(queue, bodies):
+    """
+    Publish several tasks to queue with as few pg_notify messages as possible,
+    the dispatcher runs each of the bodies as if sent by its own apply_async.
+    Returns the payloads sent.
+    """
+    payloads = list(batch_payloads(bodies))
+    if not is_testing():
+        with pg_bus_conn() as conn:
+            for payload in payloads:
+                conn.notify(queue, payload)
+    return payloads
+
+
 class task:
     """
     Used to decorate a function or class so that it can be run asynchronously
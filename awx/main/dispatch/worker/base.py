@@ -118,6 +118,11 @@ class AWXConsumerBase(object):
 
     def process_task(self, body):
         """Routes the task details in body as either a control task or a task-task"""
+        if isinstance(body, list):
+            # several tasks published in one message, see publish_batch
+            for item in body:
+                self.process_task(item)
+            return
         if 'control' in body:
             try:
                 return self.control(body)
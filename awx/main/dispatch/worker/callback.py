@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import signal
@@ -6,6 +5,7 @@ import time
 import datetime
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.functional import cached_property
 from django.utils.timezone import now as tz_now
 from django.db import transaction, connection as django_connection
@@ -15,10 +15,11 @@ import psutil
 
 import redis
 
-from awx.main.consumers import emit_channel_notification
-from awx.main.models import JobEvent, AdHocCommandEvent, ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent, UnifiedJob
+from awx.main.consumers import emit_channel_notification, emit_channel_notifications
+from awx.main.models import JobEvent, JobTaskStats, AdHocCommandEvent, ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent, UnifiedJob
 from awx.main.constants import ACTIVE_STATES
-from awx.main.models.events import emit_event_detail
+from awx.main.models.events import emit_event_detail, event_detail_message, EventRecord
+from awx.main.queue import CALLBACK_RECEIVER_LOAD_INTERVAL, callback_queue_names, decode_callback_event, publish_callback_receiver_load
 from awx.main.utils.profiling import AWXProfiler
 import awx.main.analytics.subsystem_metrics as s_metrics
 from .base import BaseWorker
@@ -52,6 +53,266 @@ def job_stats_wrapup(job_identifier, event=None):
         logger.exception('Worker failed to save stats or emit notifications: Job {}'.format(job_identifier))
 
 
+# cache of the sequence that generates the primary keys of each event table
+_event_id_sequences = {}
+
+
+def event_id_sequence(table):
+    if table not in _event_id_sequences:
+        with django_connection.cursor() as cursor:
+            # the sequence of a serial or an identity column alike
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+        if sequence is None:
+            raise RuntimeError(f'{table}.id is not generated by a sequence')
+        _event_id_sequences[table] = sequence
+    return _event_id_sequences[table]
+
+
+def copy_events(cls, events):
+    """
+    Persist events with COPY FROM STDIN.  Postgres routes each row to the
+    hourly partition for its job.  Primary keys are reserved from the table
+    sequence up front, because unlike bulk_create, COPY can not return them
+    and they are needed for the websocket messages sent on flush.
+
+    The events are written in one transaction, so on any error nothing is
+    saved and the caller may safely retry the events another way.
+    """
+    table = cls._meta.db_table
+    fields = [f for f in cls._meta.concrete_fields if not f.primary_key]
+    columns = ', '.join(['id'] + [f.column for f in fields])
+
+    try:
+        with transaction.atomic():
+            with django_connection.cursor() as cursor:
+                cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [event_id_sequence(table), len(events)])
+                for e, (pk,) in zip(events, cursor.fetchall()):
+                    e.id = pk
+                with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for e in events:
+                        copy.write_row([e.id] + [f.get_db_prep_save(getattr(e, f.attname), django_connection) for f in fields])
+    except Exception:
+        for e in events:
+            e.id = None
+        raise
+
+    for e in events:
+        if not isinstance(e, EventRecord):
+            e._state.adding = False
+            e._state.db = django_connection.alias
+
+
+class ParentEventPropagation:
+    """
+    Propagates changed=True and failed=True from saved job events to their
+    parent events as events stream through the callback receiver, instead of
+    scanning every event of the job when its playbook_on_stats event arrives.
+
+    The parent of an event may be saved by a later flush, or by another worker,
+    so parents that are not found yet stay pending and are retried on every
+    flush.  State for a job is dropped once it has sent no events for
+    JOB_EVENT_PARENT_PROPAGATION_TIMEOUT seconds.
+
+    The events of a job are counted, so that a worker that saw every event of
+    a job can tell the playbook_on_stats wrap-up which parents are left to
+    update, see pending_parents.
+    """
+
+    FLAGS = ('changed', 'failed')
+
+    def __init__(self):
+        # job id -> {'job_created', 'last_seen', 'seen', 'last_counter', 'pending': {flag: uuids}, 'done': {flag: uuids}}
+        self.jobs = {}
+
+    def add(self, event):
+        state = self.jobs.get(event.job_id)
+        if state is None:
+            state = self.jobs[event.job_id] = {
+                'job_created': event.job_created,
+                'seen': 0,
+                'last_counter': 0,
+                'pending': {flag: set() for flag in self.FLAGS},
+                'done': {flag: set() for flag in self.FLAGS},
+            }
+        state['last_seen'] = time.monotonic()
+        state['seen'] += 1
+        state['last_counter'] = max(state['last_counter'], event.counter or 0)
+        if not event.parent_uuid or not (event.changed or event.failed) or event.event == JobEvent.WRAPUP_EVENT:
+            return
+        for flag in self.FLAGS:
+            if getattr(event, flag) and event.parent_uuid not in state['done'][flag]:
+                state['pending'][flag].add(event.parent_uuid)
+
+    def propagate(self):
+        """Mark the pending parents that have been saved, returns the number of events updated"""
+        updated = 0
+        timeout = getattr(settings, 'JOB_EVENT_PARENT_PROPAGATION_TIMEOUT', 600)
+        for job_id, state in list(self.jobs.items()):
+            events = JobEvent.objects.filter(job_id=job_id)
+            if state['job_created']:
+                events = events.filter(job_created=state['job_created'])
+            for flag in self.FLAGS:
+                pending = state['pending'][flag]
+                if not pending:
+                    continue
+                found = set(events.filter(uuid__in=pending).values_list('uuid', flat=True))
+                if found:
+                    updated += events.filter(uuid__in=found, **{flag: False}).update(**{flag: True})
+                    state['done'][flag] |= found
+                    pending -= found
+            if time.monotonic() - state['last_seen'] > timeout:
+                missing = sum(len(state['pending'][flag]) for flag in self.FLAGS)
+                if missing:
+                    logger.warning(f'Gave up propagating changed/failed to {missing} parent events of job {job_id} that were never saved')
+                del self.jobs[job_id]
+        return updated
+
+    def pending_parents(self, job_id):
+        """
+        Return the parents of job_id that are still left to update, as
+        {flag: uuids}, or None if this worker did not see every event of the
+        job so far (it was restarted, or the job is not sharded to it) and the
+        events of the job have to be scanned instead; call after propagate()
+        """
+        state = self.jobs.get(job_id)
+        # event counters of a job start at 1 and have no gaps
+        if state is None or state['seen'] != state['last_counter']:
+            return None
+        return {flag: set(state['pending'][flag]) for flag in self.FLAGS}
+
+
+class WebsocketEventCoalescer:
+    """
+    Sends the websocket messages of the events saved by a flush as one channel
+    layer message per group (e.g. job_events-<id>), rather than one message per
+    event, and no more than JOB_EVENT_WEBSOCKET_MAX_BATCHES_PER_SECOND times a
+    second per group.
+
+    Messages held back by the rate cap are sent by a later flush; the callback
+    receiver flushes at least every time its read of the queue times out.
+    """
+
+    def __init__(self, max_rate=0):
+        self.interval = 1.0 / max_rate if max_rate else 0
+        self.pending = {}  # group -> payloads
+        self.last_sent = {}  # group -> time.monotonic() of its last batch
+
+    def add(self, event):
+        message = event_detail_message(event)
+        if message is not None:
+            group, payload = message
+            self.pending.setdefault(group, []).append(payload)
+
+    def send(self):
+        """Send the pending batches that the rate cap allows, returns the number of events sent"""
+        sent = 0
+        now = time.monotonic()
+        for group in list(self.pending):
+            if now - self.last_sent.get(group, 0) < self.interval:
+                continue
+            payloads = self.pending.pop(group)
+            emit_channel_notifications(group, payloads)
+            self.last_sent[group] = now
+            sent += len(payloads)
+        for group in [group for group, last in self.last_sent.items() if now - last >= self.interval and group not in self.pending]:
+            del self.last_sent[group]
+        return sent
+
+
+class JobTaskStatsAggregator:
+    """
+    Rolls the job events saved by a flush up into per-task counts, and adds
+    them to the JobTaskStats of each task in one transaction, so that task
+    level statistics never need a scan of the events of a job.
+
+    Task start events are counted for their own uuid, and the runner_* events
+    of each host for the task they belong to, i.e. their parent_uuid.
+    """
+
+    TASK_START_EVENTS = ('playbook_on_task_start', 'playbook_on_handler_task_start')
+    MAX_RETRIES = 2
+
+    def __init__(self):
+        self.tasks = {}  # (job id, task uuid) -> pending counts
+        self.retries = 0
+
+    def add(self, event):
+        if event.event in self.TASK_START_EVENTS:
+            task_uuid = event.uuid
+        elif event.event.startswith('runner_') and event.parent_uuid:
+            task_uuid = event.parent_uuid
+        else:
+            return
+        key = (event.job_id, task_uuid)
+        task = self.tasks.get(key)
+        if task is None:
+            task = self.tasks[key] = {
+                'names': {},
+                'event_counts': {},
+                'counters': dict.fromkeys(JobTaskStats.COUNTERS, 0),
+                'host_seconds': 0.0,
+                'started': None,
+                'finished': None,
+            }
+        for name in ('play', 'role', 'task'):
+            if getattr(event, name, ''):
+                task['names'][name] = getattr(event, name)
+        task['event_counts'][event.event] = task['event_counts'].get(event.event, 0) + 1
+        result = JobTaskStats.HOST_RESULTS.get(event.event)
+        if result is not None:
+            if result == 'failed' and not event.failed:
+                result = 'ignored'
+            task['counters'][result] += 1
+            if event.changed:
+                task['counters']['changed'] += 1
+            try:
+                task['host_seconds'] += float((event.event_data or {}).get('duration') or 0)
+            except (TypeError, ValueError):
+                pass
+        if event.created:
+            if task['started'] is None or event.created < task['started']:
+                task['started'] = event.created
+            if task['finished'] is None or event.created > task['finished']:
+                task['finished'] = event.created
+
+    def save(self):
+        """Add the pending counts to the stats of their tasks, returns the number of tasks updated"""
+        if not self.tasks:
+            return 0
+        tasks, self.tasks = self.tasks, {}
+        try:
+            with transaction.atomic():
+                # lock the rows in the same order in every worker, so that two flushes can not deadlock
+                for (job_id, task_uuid), task in sorted(tasks.items()):
+                    stats, _ = JobTaskStats.objects.select_for_update().get_or_create(job_id=job_id, task_uuid=task_uuid)
+                    for name, value in task['names'].items():
+                        setattr(stats, name, value)
+                    for event, count in task['event_counts'].items():
+                        stats.event_counts[event] = stats.event_counts.get(event, 0) + count
+                    for counter, count in task['counters'].items():
+                        setattr(stats, counter, getattr(stats, counter) + count)
+                    stats.host_seconds += task['host_seconds']
+                    if task['started'] and (stats.started is None or task['started'] < stats.started):
+                        stats.started = task['started']
+                    if task['finished'] and (stats.finished is None or task['finished'] > stats.finished):
+                        stats.finished = task['finished']
+                    stats.save()
+        except Exception:
+            django_connection.ensure_connection()
+            if self.retries < self.MAX_RETRIES:
+                # nothing was added since the swap above, keep the counts for the next flush
+                self.retries += 1
+                self.tasks = tasks
+                logger.exception(f'Failed to update the task stats of {len(tasks)} tasks, retrying with the next flush')
+            else:
+                self.retries = 0
+                logger.exception(f'Failed to update the task stats of {len(tasks)} tasks, their counts are lost')
+            return 0
+        self.retries = 0
+        return len(tasks)
+
+
 class CallbackBrokerWorker(BaseWorker):
     """
     A worker implementation that deserializes callback event data and persists
@@ -65,6 +326,7 @@ class CallbackBrokerWorker(BaseWorker):
     INDIVIDUAL_EVENT_RETRIES = 3
     last_stats = time.time()
     last_flush = time.time()
+    last_load_published = 0
     total = 0
     last_event = ''
     prof = None
@@ -75,7 +337,16 @@ class CallbackBrokerWorker(BaseWorker):
         self.subsystem_metrics = s_metrics.CallbackReceiverMetrics(auto_pipe_execute=False)
         self.queue_pop = 0
         self.queue_name = settings.CALLBACK_QUEUE
+        self.queue_names = callback_queue_names()
+        self.read_batch_size = max(int(getattr(settings, 'JOB_EVENT_READ_BATCH_SIZE', 1)), 1)
+        self.use_copy = getattr(settings, 'JOB_EVENT_BULK_COPY', False) and django_connection.vendor == 'postgresql'
         self.prof = AWXProfiler("CallbackBrokerWorker")
+        self.lag = 0
+        self.parent_propagation = ParentEventPropagation() if getattr(settings, 'JOB_EVENT_STREAMING_PARENT_PROPAGATION', False) else None
+        self.websocket_coalescer = None
+        if getattr(settings, 'JOB_EVENT_WEBSOCKET_COALESCE', False):
+            self.websocket_coalescer = WebsocketEventCoalescer(getattr(settings, 'JOB_EVENT_WEBSOCKET_MAX_BATCHES_PER_SECOND', 0))
+        self.task_stats = JobTaskStatsAggregator() if getattr(settings, 'JOB_EVENT_TASK_STATS', False) else None
         for key in self.redis.keys('awx_callback_receiver_statistics_*'):
             self.redis.delete(key)
 
@@ -84,32 +355,108 @@ class CallbackBrokerWorker(BaseWorker):
         """This needs to be obtained after forking, or else it will give the parent process"""
         return os.getpid()
 
+    def own_shards(self, idx, workers):
+        """
+        With a sharded callback queue, each worker reads only its own shards so
+        that all events of a job are processed, in order, by a single worker.
+        """
+        shards = callback_queue_names()
+        if len(shards) == 1:
+            self.queue_names = shards
+            return
+        if len(shards) < workers:
+            raise ImproperlyConfigured(f'{workers} callback receiver workers can not share {len(shards)} callback queue shards')
+        self.queue_names = [shard for i, shard in enumerate(shards) if i % workers == idx % workers]
+        if idx % workers == 0:
+            # the first worker also drains the events pushed before sharding was turned on
+            self.queue_names.append(settings.CALLBACK_QUEUE)
+            if settings.CALLBACK_QUEUE_SHARDS < len(shards):
+                logger.warning(f'CALLBACK_QUEUE_SHARDS ({settings.CALLBACK_QUEUE_SHARDS}) is lower than JOB_EVENT_WORKERS, using {len(shards)} shards')
+
+    def pop_batch(self):
+        if len(self.queue_names) == 1:
+            return self.redis.lpop(self.queue_names[0], count=self.read_batch_size)
+        # take up to read_batch_size messages from every owned shard in one
+        # round trip, so a busy job can not starve the jobs on other shards
+        pipe = self.redis.pipeline(transaction=False)
+        for queue_name in self.queue_names:
+            pipe.lpop(queue_name, count=self.read_batch_size)
+        res = [message for messages in pipe.execute() if messages for message in messages]
+        return res or None
+
     def read(self, queue):
         try:
-            res = self.redis.blpop(self.queue_name, timeout=1)
+            if self.read_batch_size > 1:
+                # drain up to read_batch_size messages in one round trip, only
+                # blocking when the queue is empty
+                try:
+                    res = self.pop_batch()
+                except redis.exceptions.ResponseError:
+                    # LPOP with a count needs redis 6.2
+                    logger.warning('Redis does not support LPOP with a count, reading events one at a time with BLPOP instead')
+                    self.read_batch_size = 1
+                    return {'event': 'FLUSH'}
+                if res is None:
+                    res = self.redis.blpop(self.queue_names, timeout=1)
+                    if res is None:
+                        return {'event': 'FLUSH'}
+                    res = [res[1]]
+                return self.decode_messages(res)
+            res = self.redis.blpop(self.queue_names, timeout=1)
             if res is None:
                 return {'event': 'FLUSH'}
             self.total += 1
             self.queue_pop += 1
             self.subsystem_metrics.inc('callback_receiver_events_popped_redis', 1)
             self.subsystem_metrics.inc('callback_receiver_events_in_memory', 1)
-            return json.loads(res[1])
+            return decode_callback_event(res[1])
         except redis.exceptions.RedisError:
             logger.exception("encountered an error communicating with redis")
             time.sleep(1)
-        except (json.JSONDecodeError, KeyError):
-            logger.exception("failed to decode JSON message from redis")
+        except (ValueError, KeyError):
+            logger.exception("failed to decode message from redis")
         finally:
             self.record_statistics()
             self.record_read_metrics()
 
         return {'event': 'FLUSH'}
 
+    def decode_messages(self, raw_messages):
+        messages = []
+        for raw in raw_messages:
+            try:
+                messages.append(decode_callback_event(raw))
+            except ValueError:
+                logger.exception("failed to decode message from redis")
+        self.total += len(messages)
+        self.queue_pop += len(messages)
+        self.subsystem_metrics.inc('callback_receiver_events_popped_redis', len(messages))
+        self.subsystem_metrics.inc('callback_receiver_events_in_memory', len(messages))
+        return messages
+
     def record_read_metrics(self):
-        if self.queue_pop == 0:
+        # the load is published on a timer, whether or not anything was read, so
+        # that producers can tell a stalled receiver from an idle one
+        publish_load = time.time() - self.last_load_published >= CALLBACK_RECEIVER_LOAD_INTERVAL
+        pipe_metrics = self.queue_pop != 0 and self.subsystem_metrics.should_pipe_execute() is True
+        if not (publish_load or pipe_metrics):
             return
-        if self.subsystem_metrics.should_pipe_execute() is True:
-            queue_size = self.redis.llen(self.queue_name)
+        queue_names = callback_queue_names()
+        if len(queue_names) == 1:
+            queue_size = self.redis.llen(queue_names[0])
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            for queue_name in queue_names:
+                pipe.llen(queue_name)
+            queue_size = sum(pipe.execute())
+        if publish_load:
+            # lets running jobs apply backpressure, see CallbackQueueDispatcher.backpressure
+            try:
+                publish_callback_receiver_load(self.redis, self.pid, queue_size, self.lag)
+            except Exception:
+                logger.exception("failed to publish callback receiver load to redis")
+            self.last_load_published = time.time()
+        if pipe_metrics:
             self.subsystem_metrics.set('callback_receiver_events_queue_size_redis', queue_size)
             self.subsystem_metrics.pipe_execute()
             self.queue_pop = 0
@@ -139,10 +486,11 @@ class CallbackBrokerWorker(BaseWorker):
             filepath = self.prof.stop()
             logger.error(f'profiling is disabled, wrote {filepath}')
 
-    def work_loop(self, *args, **kw):
+    def work_loop(self, queue, finished, idx, *args, **kw):
+        self.own_shards(idx, settings.JOB_EVENT_WORKERS)
         if settings.AWX_CALLBACK_PROFILE:
             signal.signal(signal.SIGUSR1, self.toggle_profiling)
-        return super(CallbackBrokerWorker, self).work_loop(*args, **kw)
+        return super(CallbackBrokerWorker, self).work_loop(queue, finished, idx, *args, **kw)
 
     def flush(self, force=False):
         now = tz_now()
@@ -153,6 +501,7 @@ class CallbackBrokerWorker(BaseWorker):
             metrics_events_broadcast = 0
             metrics_events_missing_created = 0
             metrics_total_job_event_processing_seconds = datetime.timedelta(seconds=0)
+            deferred_wrapups = []
             for cls, events in self.buff.items():
                 if not events:
                     continue
@@ -167,7 +516,11 @@ class CallbackBrokerWorker(BaseWorker):
                 metrics_duration_to_save = time.perf_counter()
                 saved_events = []
                 try:
-                    cls.objects.bulk_create(events)
+                    if self.use_copy:
+                        copy_events(cls, events)
+                    else:
+                        events[:] = [e.to_model() if isinstance(e, EventRecord) else e for e in events]
+                        cls.objects.bulk_create(events)
                     metrics_bulk_events_saved += len(events)
                     saved_events = events
                     self.buff[cls] = []
@@ -175,11 +528,12 @@ class CallbackBrokerWorker(BaseWorker):
                     # If the database is flaking, let ensure_connection throw a general exception
                     # will be caught by the outer loop, which goes into a proper sleep and retry loop
                     django_connection.ensure_connection()
-                    logger.warning(f'Error in events bulk_create, will try indiviually, error: {str(exc)}')
+                    logger.warning(f'Error in events bulk insert, will try indiviually, error: {str(exc)}')
                     # if an exception occurs, we should re-attempt to save the
                     # events one-by-one, because something in the list is
                     # broken/stale
                     metrics_events_batch_save_errors += 1
+                    events[:] = [e.to_model() if isinstance(e, EventRecord) else e for e in events]
                     for e in events.copy():
                         try:
                             e.save()
@@ -204,11 +558,27 @@ class CallbackBrokerWorker(BaseWorker):
 
                 metrics_duration_to_save = time.perf_counter() - metrics_duration_to_save
                 for e in saved_events:
+                    if self.parent_propagation is not None and cls is JobEvent:
+                        self.parent_propagation.add(e)
+                    if self.task_stats is not None and cls is JobEvent:
+                        self.task_stats.add(e)
                     if not getattr(e, '_skip_websocket_message', False):
                         metrics_events_broadcast += 1
-                        emit_event_detail(e)
+                        if self.websocket_coalescer is not None:
+                            self.websocket_coalescer.add(e)
+                        else:
+                            emit_event_detail(e)
                     if getattr(e, '_notification_trigger_event', False):
-                        job_stats_wrapup(getattr(e, e.JOB_REFERENCE), event=e)
+                        if getattr(e, '_deferred_stats_wrapup', False):
+                            deferred_wrapups.append(e)
+                        else:
+                            job_stats_wrapup(getattr(e, e.JOB_REFERENCE), event=e)
+            if self.parent_propagation is not None:
+                self.parent_propagation.propagate()
+            for e in deferred_wrapups:
+                self.stats_wrapup(e)
+            if self.task_stats is not None:
+                self.task_stats.save()
             self.last_flush = time.time()
             # only update metrics if we saved events
             if (metrics_bulk_events_saved + metrics_singular_events_saved) > 0:
@@ -218,15 +588,43 @@ class CallbackBrokerWorker(BaseWorker):
                 self.subsystem_metrics.observe('callback_receiver_batch_events_insert_db', metrics_bulk_events_saved)
                 self.subsystem_metrics.inc('callback_receiver_events_in_memory', -(metrics_bulk_events_saved + metrics_singular_events_saved))
                 self.subsystem_metrics.inc('callback_receiver_events_broadcast', metrics_events_broadcast)
-                self.subsystem_metrics.set(
-                    'callback_receiver_event_processing_avg_seconds',
-                    metrics_total_job_event_processing_seconds.total_seconds()
-                    / (metrics_bulk_events_saved + metrics_singular_events_saved - metrics_events_missing_created),
+                self.lag = metrics_total_job_event_processing_seconds.total_seconds() / (
+                    metrics_bulk_events_saved + metrics_singular_events_saved - metrics_events_missing_created
                 )
+                self.subsystem_metrics.set('callback_receiver_event_processing_avg_seconds', self.lag)
             if self.subsystem_metrics.should_pipe_execute() is True:
                 self.subsystem_metrics.pipe_execute()
+        if self.websocket_coalescer is not None:
+            # also sends the batches an earlier flush held back for the rate cap
+            self.websocket_coalescer.send()
+
+    def stats_wrapup(self, event):
+        """
+        Apply a saved playbook_on_stats event to its job, in a dispatcher task
+        with JOB_EVENT_ASYNC_STATS_WRAPUP; called once the parents of the
+        events saved by the same flush were propagated
+        """
+        job_id = getattr(event, event.JOB_REFERENCE)
+        pending_parents = self.parent_propagation.pending_parents(job_id) if self.parent_propagation is not None else None
+        if settings.JOB_EVENT_ASYNC_STATS_WRAPUP:
+            from awx.main.tasks.system import job_event_stats_wrapup  # avoid importing every task module in the receiver
+
+            if pending_parents is not None:
+                pending_parents = {flag: sorted(uuids) for flag, uuids in pending_parents.items()}
+            job_event_stats_wrapup.apply_async([job_id, event.id, pending_parents])
+            return
+        try:
+            event.update_job_from_stats(pending_parents=pending_parents)
+        except Exception:
+            logger.exception(f'Worker failed to apply playbook stats of job {job_id}')
+        job_stats_wrapup(job_id, event=event)
 
     def perform_work(self, body):
+        if isinstance(body, list):
+            # a batch read from redis, see read()
+            for message in body:
+                self.perform_work(message)
+            return
         try:
             flush = body.get('event') == 'FLUSH'
             if flush:
@@ -265,7 +663,7 @@ class CallbackBrokerWorker(BaseWorker):
 
                 skip_websocket_message = body.pop('skip_websocket_message', False)
 
-                event = cls.create_from_data(**body)
+                event = cls.create_record_from_data(**body)
 
                 if skip_websocket_message:  # if this event sends websocket messages, fire them off on flush
                     event._skip_websocket_message = True
@@ -0,0 +1,82 @@
+# Python
+import datetime
+import logging
+
+# Django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+# AWX
+from awx.main.constants import ACTIVE_STATES
+from awx.main.management.commands.cleanup_jobs import DeleteMeta, partition_table_name
+from awx.main.models import Job, AdHocCommand, ProjectUpdate, InventoryUpdate, SystemJob
+
+
+class Command(BaseCommand):
+    """
+    Management command to move the events of old jobs out of the database,
+    into compressed files under JOB_EVENT_ARCHIVE_ROOT, and drop the event
+    partitions left empty.  Archived events are still served by the API.
+    """
+
+    help = 'Archive the events of old jobs, project and inventory updates to compressed files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', dest='days', type=int, default=30, metavar='N', help='Archive events of jobs/updates executed more than N days ago. Defaults to 30.'
+        )
+        parser.add_argument('--dry-run', dest='dry_run', action='store_true', default=False, help='Dry run mode (show items that would be archived)')
+
+    def init_logging(self):
+        log_levels = dict(enumerate([logging.ERROR, logging.INFO, logging.DEBUG, 0]))
+        self.logger = logging.getLogger('awx.main.commands.archive_job_events')
+        self.logger.setLevel(log_levels.get(self.verbosity, 0))
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self.logger.propagate = False
+
+    def archive(self, job_class):
+        # DeleteMeta knows which partitions are older than the cutoff, and
+        # which of them still hold events of active jobs
+        meta = DeleteMeta(self.logger, job_class, self.cutoff, self.dry_run)
+        meta.find_jobs_to_delete()
+        meta.identify_excluded_partitions()
+
+        archived, failed = 0, 0
+        for job in job_class.objects.filter(created__lt=self.cutoff, events_archived=False).exclude(status__in=ACTIVE_STATES).iterator():
+            if self.dry_run:
+                self.logger.debug(f'Would archive events of {job.log_format}')
+                archived += 1
+                continue
+            try:
+                count = job.archive_events()
+            except (OSError, RuntimeError):
+                self.logger.exception(f'Failed to archive events of {job.log_format}')
+                meta.parts_no_drop.add(partition_table_name(job_class, job.created))
+                failed += 1
+                continue
+            self.logger.debug(f'Archived {count} events of {job.log_format}')
+            archived += 1
+
+        # jobs that are still active keep their partition, see DeleteMeta
+        meta.find_partitions_to_drop()
+        meta.drop_partitions()
+        return archived, failed
+
+    def handle(self, *args, **options):
+        self.verbosity = int(options.get('verbosity', 1))
+        self.init_logging()
+        if not settings.JOB_EVENT_ARCHIVE_ROOT:
+            raise CommandError('JOB_EVENT_ARCHIVE_ROOT is not set; it must be a directory shared by every web and control node')
+        self.days = int(options.get('days', 30))
+        self.cutoff = now() - datetime.timedelta(days=self.days)
+        self.dry_run = bool(options.get('dry_run', False))
+
+        for job_class in (Job, AdHocCommand, ProjectUpdate, InventoryUpdate, SystemJob):
+            archived, failed = self.archive(job_class)
+            if self.dry_run:
+                self.logger.log(99, '%s: %d would be archived.', job_class._meta.verbose_name_plural, archived)
+            else:
+                self.logger.log(99, '%s: %d archived, %d failed.', job_class._meta.verbose_name_plural, archived, failed)
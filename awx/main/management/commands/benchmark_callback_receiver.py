@@ -0,0 +1,237 @@
+import json
+import random
+import re
+import threading
+import time
+from uuid import uuid4
+
+import psutil
+import redis
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.utils.timezone import now
+
+from awx.main.dispatch.worker.callback import CallbackBrokerWorker
+from awx.main.models import Host, Inventory, Job, JobEvent
+from awx.main.queue import callback_queue_names
+from awx.main.tasks.callback import RunnerCallback
+
+
+class SyntheticPlaybook:
+    """
+    Generates the events ansible-runner emits for a playbook run, with one
+    play of `tasks` tasks against `hosts` hosts.
+
+    stdout_bytes is the size of the stdout of each host result, and every task
+    emits `verbose` extra verbose events, as if run with -vvv.
+    """
+
+    def __init__(self, hosts=10, tasks=10, stdout_bytes=128, verbose=0, changed=0.2, failed=0.0, seed=0):
+        self.hosts = [f'benchmark-host-{i}' for i in range(hosts)]
+        self.tasks = tasks
+        self.stdout_bytes = stdout_bytes
+        self.verbose = verbose
+        self.changed = changed
+        self.failed = failed
+        self.random = random.Random(seed)
+        self.counter = 0
+        self.line = 0
+
+    def event(self, event, parent_uuid='', stdout='', **event_data):
+        self.counter += 1
+        lines = stdout.count('\n') + 1 if stdout else 0
+        data = {
+            'event': event,
+            'uuid': str(uuid4()),
+            'parent_uuid': parent_uuid,
+            'counter': self.counter,
+            'stdout': stdout,
+            'start_line': self.line,
+            'end_line': self.line + lines,
+            'verbosity': 3 if self.verbose else 0,
+            'event_data': dict(event_data, playbook='benchmark.yml'),
+        }
+        self.line += lines
+        return data
+
+    def stdout(self, prefix):
+        return (prefix + ' ' + 'x' * max(self.stdout_bytes - len(prefix) - 1, 0))[: max(self.stdout_bytes, len(prefix))]
+
+    def __iter__(self):
+        stats = {stat: {} for stat in ('changed', 'dark', 'failures', 'ignored', 'ok', 'processed', 'rescued', 'skipped')}
+        playbook = self.event('playbook_on_start')
+        yield playbook
+        play = self.event('playbook_on_play_start', parent_uuid=playbook['uuid'], stdout='PLAY [benchmark]', play='benchmark')
+        yield play
+        for t in range(self.tasks):
+            task_name = f'benchmark task {t}'
+            task = self.event('playbook_on_task_start', parent_uuid=play['uuid'], stdout=f'TASK [{task_name}]', play='benchmark', task=task_name)
+            yield task
+            for v in range(self.verbose):
+                yield self.event('verbose', stdout=f'<benchmark> verbose output {v} for {task_name}')
+            for host in self.hosts:
+                yield self.event('runner_on_start', parent_uuid=task['uuid'], host=host, play='benchmark', task=task_name)
+                roll = self.random.random()
+                if roll < self.failed:
+                    event, res = 'runner_on_failed', {'failed': True, 'msg': 'benchmark failure'}
+                    stats['failures'][host] = stats['failures'].get(host, 0) + 1
+                else:
+                    event, res = 'runner_on_ok', {'changed': roll < self.failed + self.changed}
+                    stats['ok'][host] = stats['ok'].get(host, 0) + 1
+                    if res['changed']:
+                        stats['changed'][host] = stats['changed'].get(host, 0) + 1
+                stats['processed'][host] = 1
+                yield self.event(event, parent_uuid=task['uuid'], stdout=self.stdout(f'ok: [{host}]'), host=host, play='benchmark', task=task_name, res=res)
+        yield self.event('playbook_on_stats', parent_uuid=playbook['uuid'], stdout='PLAY RECAP', **stats)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(round(pct / 100.0 * (len(values) - 1))), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """
+    Measure the throughput and latency of the job event ingest path,
+    RunnerCallback.event_handler -> redis -> CallbackBrokerWorker -> postgres,
+    by running synthetic playbooks through it.
+
+    By default the events are processed by the running callback receiver; use
+    --inline to process them with a receiver worker inside this command.
+
+    Do *not* run this against a production install, it creates an inventory
+    and jobs (deleted afterwards unless --keep is given) and can put
+    considerable load on redis and the database.
+    """
+
+    help = 'Benchmark the callback receiver with synthetic job event streams.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=1, help='Number of jobs emitting events concurrently')
+        parser.add_argument('--hosts', type=int, default=50, help='Number of hosts in each job')
+        parser.add_argument('--tasks', type=int, default=20, help='Number of tasks in each job')
+        parser.add_argument('--stdout-bytes', type=int, default=128, help='Size of the stdout of each host result')
+        parser.add_argument('--verbose-events', type=int, default=0, help='Number of verbose events emitted per task')
+        parser.add_argument('--changed', type=float, default=0.2, help='Fraction of host results that are changed')
+        parser.add_argument('--failed', type=float, default=0.0, help='Fraction of host results that are failed')
+        parser.add_argument('--rate', type=float, default=0, help='Events per second emitted by each job, 0 for as fast as possible')
+        parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for all events to be saved')
+        parser.add_argument('--inline', action='store_true', help='Process events with a callback receiver worker in this process')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark inventory, jobs and events')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        self.redis = redis.Redis.from_url(settings.BROKER_URL)
+        inventory = Inventory.objects.create(name=f'callback receiver benchmark {uuid4()}')
+        Host.objects.bulk_create([Host(name=f'benchmark-host-{i}', inventory=inventory) for i in range(options['hosts'])])
+        host_map = dict(inventory.hosts.values_list('name', 'id'))
+        jobs = [Job.objects.create(name='callback receiver benchmark', status='running', inventory=inventory) for i in range(options['jobs'])]
+        try:
+            results = self.run(jobs, host_map, options)
+        finally:
+            if not options['keep']:
+                for job in jobs:
+                    job.get_event_queryset().delete()
+                    job.delete()
+                inventory.delete()
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=4))
+        else:
+            for key, value in results.items():
+                self.stdout.write(f'{key:<28} {value}')
+
+    def run(self, jobs, host_map, options):
+        stop = threading.Event()
+        samples = {'depth': [], 'rss': []}
+        sampler = threading.Thread(target=self.sample, args=(stop, samples, options['inline']), daemon=True)
+        sampler.start()
+        if options['inline']:
+            receiver = threading.Thread(target=self.receive, args=(stop,), daemon=True)
+            receiver.start()
+
+        emitted = []
+        start = time.monotonic()
+        producers = [threading.Thread(target=self.produce, args=(job, host_map, options, emitted, seed)) for seed, job in enumerate(jobs)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        produced = time.monotonic() - start
+
+        total = sum(emitted)
+        events = JobEvent.objects.filter(job_id__in=[job.id for job in jobs])
+        saved = events.count()
+        while saved < total and time.monotonic() - start < options['timeout']:
+            time.sleep(0.25)
+            saved = events.count()
+        elapsed = time.monotonic() - start
+        stop.set()
+        sampler.join()
+        if options['inline']:
+            receiver.join()
+
+        latencies = [latency.total_seconds() for latency in events.annotate(latency=F('modified') - F('created')).values_list('latency', flat=True)]
+        return {
+            'events emitted': total,
+            'events saved': saved,
+            'emit seconds': round(produced, 3),
+            'total seconds': round(elapsed, 3),
+            'events/s': round(saved / elapsed, 1) if elapsed else 0,
+            'p50 latency seconds': round(percentile(latencies, 50), 3),
+            'p99 latency seconds': round(percentile(latencies, 99), 3),
+            'max redis depth': max(samples['depth'], default=0),
+            'avg redis depth': round(sum(samples['depth']) / len(samples['depth']), 1) if samples['depth'] else 0,
+            'max receiver rss MB': max(samples['rss'], default=0),
+        }
+
+    def produce(self, job, host_map, options, emitted, seed):
+        callback = RunnerCallback(Job)
+        callback.instance = job
+        callback.job_created = str(job.created)
+        callback.host_map = host_map
+        playbook = SyntheticPlaybook(
+            hosts=options['hosts'],
+            tasks=options['tasks'],
+            stdout_bytes=options['stdout_bytes'],
+            verbose=options['verbose_events'],
+            changed=options['changed'],
+            failed=options['failed'],
+            seed=seed,
+        )
+        interval = 1.0 / options['rate'] if options['rate'] else 0
+        for event_data in playbook:
+            event_data['created'] = now().isoformat()
+            callback.event_handler(event_data)
+            if interval:
+                time.sleep(interval)
+        callback.finished_callback(None)
+        # event_ct does not count events shed under backpressure
+        emitted.append(callback.event_ct)
+
+    def sample(self, stop, samples, inline):
+        queue_names = callback_queue_names()
+        while not stop.is_set():
+            samples['depth'].append(sum(self.redis.llen(queue_name) for queue_name in queue_names))
+            if inline:
+                samples['rss'].append(round(psutil.Process().memory_info().rss / 1024.0 / 1024.0, 3))
+            else:
+                for key in self.redis.keys('awx_callback_receiver_statistics_*'):
+                    match = re.search(r'rss=([\d.]+)MB', (self.redis.get(key) or b'').decode())
+                    if match:
+                        samples['rss'].append(float(match.group(1)))
+            stop.wait(0.25)
+
+    def receive(self, stop):
+        worker = CallbackBrokerWorker()
+        worker.own_shards(0, 1)
+        try:
+            while not stop.is_set():
+                worker.perform_work(worker.read(None))
+            worker.flush(force=True)
+        finally:
+            connection.close()
@@ -4,12 +4,14 @@
 # Python
 import datetime
 import logging
+import os
 import pytz
 import re
 
 
 # Django
 from django.apps import apps
+from django.core.cache import cache
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction, connection
 from django.db.models import Min, Max
@@ -17,7 +19,7 @@ from django.db.models.signals import pre_save, post_save, pre_delete, post_delet
 from django.utils.timezone import now
 
 # AWX
-from awx.main.models import Job, AdHocCommand, ProjectUpdate, InventoryUpdate, SystemJob, WorkflowJob, Notification
+from awx.main.models import Job, AdHocCommand, ProjectUpdate, InventoryUpdate, SystemJob, WorkflowJob, Notification, UnifiedJob
 from awx.main.utils import unified_job_class_to_event_table_name
 
 
@@ -51,6 +53,24 @@ def dt_to_partition_name(tbl_name, dt):
     return f"{tbl_name}_{dt.strftime('%Y%m%d_%H')}"
 
 
+def clear_stdout_caches(pk_list):
+    # signal handlers are disconnected, so UnifiedJob.clear_stdout_cache is not run on delete
+    cache.delete_many([key for pk in pk_list for key in UnifiedJob(pk=pk).stdout_cache_keys])
+
+
+def find_event_archives(jobs):
+    """Map the pk of each job in jobs, a queryset, whose events were archived to its archive file; call before deleting them"""
+    return {pk: UnifiedJob(pk=pk).event_archive_path for pk in jobs.filter(events_archived=True).values_list('pk', flat=True)}
+
+
+def remove_event_archives(archives, pk_list):
+    # signal handlers are disconnected, so the archives of deleted jobs are not removed on delete either
+    for pk in pk_list:
+        path = archives.get(pk)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
 class DeleteMeta:
     def __init__(self, logger, job_class, cutoff, dry_run):
         self.logger = logger
@@ -93,7 +113,10 @@ class DeleteMeta:
 
     def delete_jobs(self):
         if not self.dry_run:
+            archives = find_event_archives(self.job_class.objects.filter(pk__in=self.jobs_pk_list))
             self.job_class.objects.filter(pk__in=self.jobs_pk_list).delete()
+            clear_stdout_caches(self.jobs_pk_list)
+            remove_event_archives(archives, self.jobs_pk_list)
 
     def find_partitions_to_drop(self):
         tbl_name = unified_job_class_to_event_table_name(self.job_class)
@@ -267,10 +290,13 @@ class Command(BaseCommand):
         if info['min'] is not None:
             for start in range(info['min'], info['max'] + 1, self.batch_size):
                 qs_batch = qs.filter(id__gte=start, id__lte=start + self.batch_size)
-                pk_list = qs_batch.values_list('id', flat=True)
+                pk_list = list(qs_batch.values_list('id', flat=True))
+                archives = find_event_archives(qs_batch)
 
                 _, results = qs_batch.delete()
                 deleted += results['main.Job']
+                clear_stdout_caches(pk_list)
+                remove_event_archives(archives, pk_list)
                 # Avoid dropping the job event table in case we have interacted with it already
                 self._delete_unpartitioned_events(Job, pk_list)
 
@@ -279,6 +305,7 @@ class Command(BaseCommand):
     def cleanup_ad_hoc_commands(self):
         skipped, deleted = 0, 0
         ad_hoc_commands = AdHocCommand.objects.filter(created__lt=self.cutoff)
+        archives = {} if self.dry_run else find_event_archives(ad_hoc_commands)
         pk_list = []
         for ad_hoc_command in ad_hoc_commands.iterator():
             ad_hoc_command_display = '"%s" (%d events)' % (str(ad_hoc_command), ad_hoc_command.ad_hoc_command_events.count())
@@ -295,6 +322,8 @@ class Command(BaseCommand):
                 deleted += 1
 
         if not self.dry_run:
+            clear_stdout_caches(pk_list)
+            remove_event_archives(archives, pk_list)
             self._delete_unpartitioned_events(AdHocCommand, pk_list)
 
         skipped += AdHocCommand.objects.filter(created__gte=self.cutoff).count()
@@ -303,6 +332,7 @@ class Command(BaseCommand):
     def cleanup_project_updates(self):
         skipped, deleted = 0, 0
         project_updates = ProjectUpdate.objects.filter(created__lt=self.cutoff)
+        archives = {} if self.dry_run else find_event_archives(project_updates)
         pk_list = []
         for pu in project_updates.iterator():
             pu_display = '"%s" (type %s)' % (str(pu), str(pu.launch_type))
@@ -323,6 +353,8 @@ class Command(BaseCommand):
                 deleted += 1
 
         if not self.dry_run:
+            clear_stdout_caches(pk_list)
+            remove_event_archives(archives, pk_list)
             self._delete_unpartitioned_events(ProjectUpdate, pk_list)
 
         skipped += ProjectUpdate.objects.filter(created__gte=self.cutoff).count()
@@ -331,6 +363,7 @@ class Command(BaseCommand):
     def cleanup_inventory_updates(self):
         skipped, deleted = 0, 0
         inventory_updates = InventoryUpdate.objects.filter(created__lt=self.cutoff)
+        archives = {} if self.dry_run else find_event_archives(inventory_updates)
         pk_list = []
         for iu in inventory_updates.iterator():
             iu_display = '"%s" (source %s)' % (str(iu), str(iu.source))
@@ -351,6 +384,8 @@ class Command(BaseCommand):
                 deleted += 1
 
         if not self.dry_run:
+            clear_stdout_caches(pk_list)
+            remove_event_archives(archives, pk_list)
             self._delete_unpartitioned_events(InventoryUpdate, pk_list)
 
         skipped += InventoryUpdate.objects.filter(created__gte=self.cutoff).count()
@@ -359,6 +394,7 @@ class Command(BaseCommand):
     def cleanup_management_jobs(self):
         skipped, deleted = 0, 0
         system_jobs = SystemJob.objects.filter(created__lt=self.cutoff)
+        archives = {} if self.dry_run else find_event_archives(system_jobs)
         pk_list = []
         for sj in system_jobs.iterator():
             sj_display = '"%s" (type %s)' % (str(sj), str(sj.job_type))
@@ -375,6 +411,8 @@ class Command(BaseCommand):
                 deleted += 1
 
         if not self.dry_run:
+            clear_stdout_caches(pk_list)
+            remove_event_archives(archives, pk_list)
             self._delete_unpartitioned_events(SystemJob, pk_list)
 
         skipped += SystemJob.objects.filter(created__gte=self.cutoff).count()
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0195_EE_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobEventsChildrenSummary',
+            fields=[
+                (
+                    'job',
+                    models.OneToOneField(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='events_children_summary',
+                        serialize=False,
+                        to='main.job',
+                    ),
+                ),
+                ('summary', models.JSONField(default=dict, editable=False)),
+            ],
+        ),
+    ]
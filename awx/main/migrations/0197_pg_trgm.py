@@ -0,0 +1,28 @@
+import logging
+
+from django.db import migrations, transaction, DatabaseError
+
+logger = logging.getLogger('awx.main.migrations')
+
+
+def create_pg_trgm_extension(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # pg_trgm is a trusted extension, but the database may not offer it; event
+    # partitions are then simply created without a stdout trigram index
+    try:
+        with transaction.atomic():
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    except DatabaseError:
+        logger.warning('Could not create the pg_trgm extension, job event stdout will not be indexed for search.')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0196_jobeventschildrensummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pg_trgm_extension, migrations.RunPython.noop),
+    ]
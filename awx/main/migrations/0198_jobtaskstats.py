@@ -0,0 +1,45 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0197_pg_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobTaskStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=None, editable=False)),
+                ('modified', models.DateTimeField(default=None, editable=False)),
+                ('task_uuid', models.CharField(editable=False, max_length=1024)),
+                ('play', models.CharField(default='', editable=False, max_length=1024)),
+                ('role', models.CharField(default='', editable=False, max_length=1024)),
+                ('task', models.CharField(default='', editable=False, max_length=1024)),
+                ('event_counts', models.JSONField(default=dict, editable=False, help_text='The number of events of the task by event type.')),
+                ('ok', models.PositiveIntegerField(default=0, editable=False)),
+                ('changed', models.PositiveIntegerField(default=0, editable=False)),
+                ('failed', models.PositiveIntegerField(default=0, editable=False)),
+                ('ignored', models.PositiveIntegerField(default=0, editable=False)),
+                ('skipped', models.PositiveIntegerField(default=0, editable=False)),
+                ('unreachable', models.PositiveIntegerField(default=0, editable=False)),
+                ('host_seconds', models.FloatField(default=0, editable=False, help_text='The time spent running the task, summed over all hosts.')),
+                ('started', models.DateTimeField(default=None, editable=False, null=True)),
+                ('finished', models.DateTimeField(default=None, editable=False, null=True)),
+                (
+                    'job',
+                    models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='main.job'),
+                ),
+            ],
+            options={
+                'verbose_name_plural': 'job task stats',
+                'ordering': ('started', 'pk'),
+                'unique_together': {('job', 'task_uuid')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0198_jobtaskstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unifiedjob',
+            name='events_archived',
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text='If the events of this job were moved out of the database, to a file under JOB_EVENT_ARCHIVE_ROOT.',
+            ),
+        ),
+    ]
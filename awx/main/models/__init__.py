@@ -36,8 +36,10 @@ from awx.main.models.inventory import (  # noqa
 )
 from awx.main.models.jobs import (  # noqa
     Job,
+    JobEventsChildrenSummary,
     JobHostSummary,
     JobLaunchConfig,
+    JobTaskStats,
     JobTemplate,
     SystemJob,
     SystemJobTemplate,
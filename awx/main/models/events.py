@@ -9,7 +9,7 @@ import time
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models, DatabaseError, transaction
+from django.db import connection, models, DatabaseError, transaction
 from django.db.models.functions import Cast
 from django.utils.dateparse import parse_datetime
 from django.utils.text import Truncator
@@ -61,10 +61,105 @@ def create_host_status_counts(event_data):
     return dict(host_status_counts)
 
 
+def playbook_event_fields(event_cls, event, event_data):
+    """
+    Return the failed and changed flags and the playbook/play/task/role values
+    that a playbook event derives from its event_data.
+    """
+    res = event_data.get('res', None)
+    failed = event in event_cls.FAILED_EVENTS and not event_data.get('ignore_errors', False)
+    changed = isinstance(res, dict) and bool(res.get('changed', False))
+    values = dict((field, force_str(event_data.get(field, '')).strip()) for field in ('playbook', 'play', 'task', 'role'))
+    return failed, changed, values
+
+
+class EventRecord(object):
+    """
+    A lightweight, slotted stand-in for a playbook event model instance.
+
+    The callback receiver builds these for events that are only inserted, so
+    that it does not pay for full Django model instantiation on every event.
+    Use to_model() where a real model instance is needed.
+    """
+
+    __slots__ = (
+        'event_class',
+        'id',
+        'created',
+        'modified',
+        'event',
+        'event_data',
+        'failed',
+        'changed',
+        'uuid',
+        'playbook',
+        'play',
+        'role',
+        'task',
+        'counter',
+        'stdout',
+        'verbosity',
+        'start_line',
+        'end_line',
+        'job_id',
+        'project_update_id',
+        'host_id',
+        'host_name',
+        'parent_uuid',
+        'job_created',
+        'workflow_job_id',
+        'host_map',
+        '_skip_websocket_message',
+        '_notification_trigger_event',
+    )
+
+    # attname -> field for each event class, in the order the model __init__ expects them
+    _class_fields = {}
+
+    def __init__(self, event_class, **kwargs):
+        self.event_class = event_class
+        for field in self.fields(event_class):
+            if field.attname in kwargs:
+                setattr(self, field.attname, kwargs[field.attname])
+            else:
+                setattr(self, field.attname, field.get_default())
+        self.workflow_job_id = kwargs.get('workflow_job_id')
+        self.host_map = kwargs.get('host_map', {})
+        self._skip_websocket_message = False
+        self._notification_trigger_event = False
+
+    @classmethod
+    def fields(cls, event_class):
+        if event_class not in cls._class_fields:
+            cls._class_fields[event_class] = event_class._meta.concrete_fields
+        return cls._class_fields[event_class]
+
+    @property
+    def event_level(self):
+        return self.event_class.LEVEL_FOR_EVENT.get(self.event, 0)
+
+    def to_model(self):
+        # positional arguments take the fast path through Model.__init__
+        event = self.event_class(*[getattr(self, field.attname) for field in self.fields(self.event_class)])
+        if self.workflow_job_id:
+            event.workflow_job_id = self.workflow_job_id
+        event.host_map = self.host_map
+        event._skip_websocket_message = self._skip_websocket_message
+        event._notification_trigger_event = self._notification_trigger_event
+        return event
+
+
 def emit_event_detail(event):
+    message = event_detail_message(event)
+    if message is not None:
+        consumers.emit_channel_notification(*message)
+
+
+def event_detail_message(event):
+    """Return the (group, payload) websocket message announcing a saved event, or None if none is sent"""
     if settings.UI_LIVE_UPDATES_ENABLED is False and event.event not in MINIMAL_EVENTS:
-        return
-    cls = event.__class__
+        return None
+    cls = event.event_class if isinstance(event, EventRecord) else event.__class__
     relation = {
         JobEvent: 'job_id',
         AdHocCommandEvent: 'ad_hoc_command_id',
@@ -73,13 +168,13 @@ def emit_event_detail(event):
         SystemJobEvent: 'system_job_id',
     }[cls]
     url = ''
-    if isinstance(event, JobEvent):
+    if issubclass(cls, JobEvent):
         url = '/api/v2/job_events/{}'.format(event.id)
-    if isinstance(event, AdHocCommandEvent):
+    if issubclass(cls, AdHocCommandEvent):
         url = '/api/v2/ad_hoc_command_events/{}'.format(event.id)
     group = camelcase_to_underscore(cls.__name__) + 's'
     timestamp = event.created.isoformat()
-    consumers.emit_channel_notification(
+    return (
         '-'.join([group, str(getattr(event, relation))]),
         {
             'id': event.id,
@@ -206,6 +301,9 @@ class BasePlaybookEvent(CreatedModifiedModel):
     FAILED_EVENTS = [x[1] for x in EVENT_TYPES if x[3]]
     EVENT_CHOICES = [(x[1], x[2]) for x in EVENT_TYPES]
     LEVEL_FOR_EVENT = dict([(x[1], x[0]) for x in EVENT_TYPES])
+    # events without a level of their own, nested under their neighbours by
+    # the job output view
+    META_EVENTS = ('debug', 'verbose', 'warning', 'error', 'system_warning', 'deprecated')
 
     event = models.CharField(
         max_length=100,
@@ -332,15 +430,14 @@ class BasePlaybookEvent(CreatedModifiedModel):
                 pass
         return msg
 
-    def _update_from_event_data(self):
+    def _update_from_event_data(self, defer_stats_wrapup=False):
         # Update event model fields from event data.
         event_data = self.event_data
-        res = event_data.get('res', None)
-        if self.event in self.FAILED_EVENTS and not event_data.get('ignore_errors', False):
+        failed, changed, field_values = playbook_event_fields(self.__class__, self.event, event_data)
+        if failed:
             self.failed = True
-        if isinstance(res, dict):
-            if res.get('changed', False):
-                self.changed = True
+        if changed:
+            self.changed = True
         if self.event == 'playbook_on_stats':
             try:
                 failures_dict = event_data.get('failures', {})
@@ -352,58 +449,20 @@ class BasePlaybookEvent(CreatedModifiedModel):
                 pass
 
             if isinstance(self, JobEvent):
-                try:
-                    job = self.job
-                except ObjectDoesNotExist:
-                    job = None
-                if job:
-                    hostnames = self._hostnames()
-                    self._update_host_summary_from_stats(set(hostnames))
-                    if job.inventory:
-                        try:
-                            job.inventory.update_computed_fields()
-                        except DatabaseError:
-                            logger.exception('Computed fields database error saving event {}'.format(self.pk))
-
-                    # find parent links and progagate changed=T and failed=T
-                    changed = (
-                        job.get_event_queryset()
-                        .filter(changed=True)
-                        .exclude(parent_uuid=None)
-                        .only('parent_uuid')
-                        .values_list('parent_uuid', flat=True)
-                        .distinct()
-                    )  # noqa
-                    failed = (
-                        job.get_event_queryset()
-                        .filter(failed=True)
-                        .exclude(parent_uuid=None)
-                        .only('parent_uuid')
-                        .values_list('parent_uuid', flat=True)
-                        .distinct()
-                    )  # noqa
-
-                    # NOTE: we take a set of changed and failed parent uuids because the subquery
-                    # complicates the plan with large event tables causing very long query execution time
-                    changed_start = time.time()
-                    changed_res = job.get_event_queryset().filter(uuid__in=set(changed)).update(changed=True)
-                    failed_start = time.time()
-                    failed_res = job.get_event_queryset().filter(uuid__in=set(failed)).update(failed=True)
-                    logger.debug(
-                        f'Event propagation for job {job.id}: '
-                        f'marked {changed_res} as changed in {failed_start - changed_start:.4f}s, '
-                        f'{failed_res} as failed in {time.time() - failed_start:.4f}s'
-                    )
-
-        for field in ('playbook', 'play', 'task', 'role'):
-            value = force_str(event_data.get(field, '')).strip()
+                if defer_stats_wrapup:
+                    # done later by the job_event_stats_wrapup task, see JobEvent.update_job_from_stats
+                    self._deferred_stats_wrapup = True
+                else:
+                    self.update_job_from_stats()
+
+        for field, value in field_values.items():
             if value != getattr(self, field):
                 setattr(self, field, value)
         if settings.LOG_AGGREGATOR_ENABLED:
             analytics_logger.info('Event data saved.', extra=dict(python_objects=dict(job_event=self)))
 
     @classmethod
-    def create_from_data(cls, **kwargs):
+    def create_from_data(cls, defer_stats_wrapup=False, **kwargs):
         #
         # ⚠️  D-D-D-DANGER ZONE ⚠️
         # This function is called by the callback receiver *once* for *every
@@ -415,13 +474,37 @@ class BasePlaybookEvent(CreatedModifiedModel):
         #
         # Proceed with caution!
         #
+        kwargs = cls._parse_event_kwargs(kwargs)
+        if kwargs is None:
+            return
+        host_map = kwargs.pop('host_map', {})
+        workflow_job_id = kwargs.pop('workflow_job_id', None)
+        event = cls(**kwargs)
+        if workflow_job_id:
+            setattr(event, 'workflow_job_id', workflow_job_id)
+        # shouldn't job_created _always_ be present?
+        # if it's not, how could we save the event to the db?
+        job_created = kwargs.pop('job_created', None)
+        if job_created:
+            setattr(event, 'job_created', job_created)
+        setattr(event, 'host_map', host_map)
+        event._update_from_event_data(defer_stats_wrapup=defer_stats_wrapup)
+        return event
+
+    @classmethod
+    def _parse_event_kwargs(cls, kwargs):
+        """
+        Normalize the callback payload of an event, returning the kwargs to
+        build the event with (plus its host_map), or None if the payload does
+        not reference a job.
+        """
         pk = None
         for key in ('job_id', 'project_update_id'):
             if key in kwargs:
                 pk = key
         if pk is None:
             # payload must contain either a job_id or a project_update_id
-            return
+            return None
 
         # Convert the datetime for the job event's creation appropriately,
         # and include a time zone for it.
@@ -447,20 +530,30 @@ class BasePlaybookEvent(CreatedModifiedModel):
             kwargs.pop('job_created', None)
 
         host_map = kwargs.pop('host_map', {})
-
         sanitize_event_keys(kwargs, cls.VALID_KEYS)
-        workflow_job_id = kwargs.pop('workflow_job_id', None)
-        event = cls(**kwargs)
-        if workflow_job_id:
-            setattr(event, 'workflow_job_id', workflow_job_id)
-        # shouldn't job_created _always_ be present?
-        # if it's not, how could we save the event to the db?
-        job_created = kwargs.pop('job_created', None)
-        if job_created:
-            setattr(event, 'job_created', job_created)
-        setattr(event, 'host_map', host_map)
-        event._update_from_event_data()
-        return event
+        kwargs['host_map'] = host_map
+        return kwargs
+
+    @classmethod
+    def create_record_from_data(cls, **kwargs):
+        """
+        Build a lightweight EventRecord for an event that only needs to be
+        inserted.  Events with side effects when saved or logged still
+        become full model instances via create_from_data.
+        """
+        # ⚠️  D-D-D-DANGER ZONE ⚠️ - called for every event, see create_from_data
+        if kwargs.get('event') == 'playbook_on_stats' or settings.LOG_AGGREGATOR_ENABLED:
+            # with streaming parent propagation, the receiver applies the stats once the events before them are propagated
+            defer_stats_wrapup = settings.JOB_EVENT_ASYNC_STATS_WRAPUP or settings.JOB_EVENT_STREAMING_PARENT_PROPAGATION
+            return cls.create_from_data(defer_stats_wrapup=defer_stats_wrapup, **kwargs)
+        kwargs = cls._parse_event_kwargs(kwargs)
+        if kwargs is None:
+            return
+        record = EventRecord(cls, **kwargs)
+        record.failed, record.changed, field_values = playbook_event_fields(cls, record.event, record.event_data)
+        for field, value in field_values.items():
+            setattr(record, field, value)
+        return record
 
     @property
     def job_verbosity(self):
@@ -527,6 +620,67 @@ class JobEvent(BasePlaybookEvent):
     def __str__(self):
         return u'%s @ %s' % (self.get_event_display2(), self.created.isoformat())
 
+    def update_job_from_stats(self, pending_parents=None):
+        """
+        Apply a playbook_on_stats event to its job: create the host summaries,
+        update the inventory computed fields and propagate changed/failed to
+        parent events.
+
+        pending_parents, {'changed': uuids, 'failed': uuids}, is passed by a
+        callback receiver that propagated every event of the job as it was
+        saved (see JOB_EVENT_STREAMING_PARENT_PROPAGATION): only those parents
+        are left to update, instead of scanning all of the events of the job.
+        """
+        try:
+            job = self.job
+        except ObjectDoesNotExist:
+            job = None
+        if job:
+            hostnames = self._hostnames()
+            self._update_host_summary_from_stats(set(hostnames))
+            if job.inventory:
+                try:
+                    job.inventory.update_computed_fields()
+                except DatabaseError:
+                    logger.exception('Computed fields database error saving event {}'.format(self.pk))
+
+            if pending_parents is not None:
+                changed, failed = pending_parents.get('changed', ()), pending_parents.get('failed', ())
+            else:
+                # find parent links and progagate changed=T and failed=T
+                # (excluding this event, which is already saved when the wrap-up is deferred)
+                changed = (
+                    job.get_event_queryset()
+                    .filter(changed=True)
+                    .exclude(pk=self.pk)
+                    .exclude(parent_uuid=None)
+                    .only('parent_uuid')
+                    .values_list('parent_uuid', flat=True)
+                    .distinct()
+                )  # noqa
+                failed = (
+                    job.get_event_queryset()
+                    .filter(failed=True)
+                    .exclude(pk=self.pk)
+                    .exclude(parent_uuid=None)
+                    .only('parent_uuid')
+                    .values_list('parent_uuid', flat=True)
+                    .distinct()
+                )  # noqa
+
+            # NOTE: we take a set of changed and failed parent uuids because the subquery
+            # complicates the plan with large event tables causing very long query execution time
+            changed, failed = set(changed), set(failed)
+            changed_start = time.time()
+            changed_res = job.get_event_queryset().filter(uuid__in=changed, changed=False).update(changed=True) if changed else 0
+            failed_start = time.time()
+            failed_res = job.get_event_queryset().filter(uuid__in=failed, failed=False).update(failed=True) if failed else 0
+            logger.debug(
+                f'Event propagation for job {job.id}: '
+                f'marked {changed_res} as changed in {failed_start - changed_start:.4f}s, '
+                f'{failed_res} as failed in {time.time() - failed_start:.4f}s'
+            )
+
     def _hostnames(self):
         hostnames = set()
         try:
@@ -584,20 +738,15 @@ class JobEvent(BasePlaybookEvent):
 
             JobHostSummary.objects.bulk_create(summaries.values())
 
-            # update the last_job_id and last_job_host_summary_id
-            # in single queries
-            host_mapping = dict((summary['host_id'], summary['id']) for summary in JobHostSummary.objects.filter(job_id=job.id).values('id', 'host_id'))
-            updated_hosts = set()
-            for h in all_hosts:
-                # if the hostname *shows up* in the playbook_on_stats event
-                if h.name in hostnames:
-                    h.last_job_id = job.id
-                    updated_hosts.add(h)
-                if h.id in host_mapping:
-                    h.last_job_host_summary_id = host_mapping[h.id]
-                    updated_hosts.add(h)
-
-            Host.objects.bulk_update(list(updated_hosts), ['last_job_id', 'last_job_host_summary_id'], batch_size=100)
+            # update the last_job_id and last_job_host_summary_id of the hosts
+            # summarized by this event in a single UPDATE ... WHERE id IN (...)
+            summarized_host_ids = set(host_id for host_id, _ in summaries if host_id is not None)
+            Host.objects.filter(pk__in=summarized_host_ids).update(
+                last_job_id=job.id,
+                last_job_host_summary_id=models.Subquery(
+                    JobHostSummary.objects.filter(job_id=job.id, host_id=models.OuterRef('pk')).order_by('-id').values('id')[:1]
+                ),
+            )
 
             # Create/update Host Metrics
             self._update_host_metrics(updated_hosts_list)
@@ -608,6 +757,18 @@ class JobEvent(BasePlaybookEvent):
 
         current_time = now()
 
+        if connection.vendor == 'postgresql':
+            # one set-based upsert for every host, sorted so concurrent jobs lock the rows in the same order
+            table = HostMetric._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (hostname, first_automation, last_automation, automated_counter, deleted_counter, deleted) '
+                    'SELECT hostname, %(now)s, %(now)s, 1, 0, false FROM unnest(%(hostnames)s::varchar[]) AS hostname '
+                    f'ON CONFLICT (hostname) DO UPDATE SET last_automation = EXCLUDED.last_automation, automated_counter = {table}.automated_counter + 1, deleted = false',
+                    {'now': current_time, 'hostnames': sorted(set(updated_hosts_list))},
+                )
+            return
+
         # FUTURE:
         #   - Hand-rolled implementation of itertools.batched(), introduced in Python 3.12.  Replace.
         #   - Ability to do ORM upserts *may* have been introduced in Django 5.0.
@@ -758,6 +919,11 @@ class BaseCommandEvent(CreatedModifiedModel):
         event._update_from_event_data()
         return event
 
+    @classmethod
+    def create_record_from_data(cls, **kwargs):
+        # command events are not numerous enough to warrant an EventRecord
+        return cls.create_from_data(**kwargs)
+
     def get_event_display(self):
         """
         Needed for __unicode__
@@ -57,7 +57,7 @@ from awx.main.constants import JOB_VARIABLE_PREFIXES
 
 logger = logging.getLogger('awx.main.models.jobs')
 
-__all__ = ['JobTemplate', 'JobLaunchConfig', 'Job', 'JobHostSummary', 'SystemJobTemplate', 'SystemJob']
+__all__ = ['JobTemplate', 'JobLaunchConfig', 'Job', 'JobHostSummary', 'JobTaskStats', 'SystemJobTemplate', 'SystemJob']
 
 
 class JobOptions(BaseModel):
@@ -649,6 +649,126 @@ class Job(UnifiedJob, JobOptions, SurveyJobMixin, JobNotificationMixin, TaskMana
             return UnpartitionedJobEvent
         return JobEvent
 
+    def get_events_children_summary(self):
+        """
+        Return the summary of the event tree shown by the job output view: the
+        row number and number of descendants of every event with children, the
+        parent assigned to meta events such as verbose output, and whether the
+        events form a tree at all.
+
+        Only call this once event processing is finished; the summary is then
+        computed once and stored in JobEventsChildrenSummary.
+        """
+        try:
+            summary = JobEventsChildrenSummary.objects.get(job=self).summary
+        except JobEventsChildrenSummary.DoesNotExist:
+            summary = self._compute_events_children_summary()
+            JobEventsChildrenSummary.objects.get_or_create(job=self, defaults={'summary': summary})
+        return dict(
+            children_summary={counter: {'rowNumber': row, 'numChildren': children} for counter, row, children in summary['children']},
+            meta_event_nested_uuid=dict(summary['meta_event_nested_uuid']),
+            is_tree=summary['is_tree'],
+        )
+
+    def _compute_events_children_summary(self):
+        summary = dict(children=[], meta_event_nested_uuid=[], is_tree=True)
+        if self.events_archived:
+            events = sorted(
+                (dict(counter=e.counter, uuid=e.uuid, parent_uuid=e.parent_uuid, event=e.event) for e in self.get_archived_events()), key=lambda e: e['counter']
+            )
+        else:
+            events = list(self.get_event_queryset().values('counter', 'uuid', 'parent_uuid', 'event').order_by('counter'))
+        if len(events) == 0:
+            return summary
+
+        # key is counter, value is number of total children (including children of children, etc.)
+        map_counter_children_tally = {i['counter']: {"rowNumber": 0, "numChildren": 0} for i in events}
+        # key is uuid, value is counter
+        map_uuid_counter = {i['uuid']: i['counter'] for i in events}
+        # key is uuid, value is parent uuid. Used as a quick lookup
+        map_uuid_puuid = {i['uuid']: i['parent_uuid'] for i in events}
+        # key is counter of meta events (i.e. verbose), value is uuid of the assigned parent
+        map_meta_counter_nested_uuid = {}
+
+        # collapsible tree view in the UI only makes sense for tree-like
+        # hierarchy. If ansible is ran with a strategy like free or host_pinned, then
+        # events can be out of sequential order, and no longer follow a tree structure
+        # E1
+        #  E2
+        # E3
+        #  E4  <- parent is E3
+        #  E5  <- parent is E1
+        # in the above, there is no clear way to collapse E1, because E5 comes after
+        # E3, which occurs after E1. Thus the tree view should be disabled.
+
+        # mark the last seen uuid at a given level (0-3)
+        # if a parent uuid is not in this list, then we know the events are not tree-like
+        # and return a summary with is_tree: False
+        level_current_uuid = [None, None, None, None]
+
+        prev_non_meta_event = events[0]
+        for i, e in enumerate(events):
+            if not e['event'] in JobEvent.META_EVENTS:
+                prev_non_meta_event = e
+            if not e['uuid']:
+                continue
+
+            if not e['event'] in JobEvent.META_EVENTS:
+                level = JobEvent.LEVEL_FOR_EVENT[e['event']]
+                level_current_uuid[level] = e['uuid']
+                # if setting level 1, for example, set levels 2 and 3 back to None
+                for u in range(level + 1, len(level_current_uuid)):
+                    level_current_uuid[u] = None
+
+            puuid = e['parent_uuid']
+            if puuid and puuid not in level_current_uuid:
+                # improper tree detected, so bail out early
+                summary['is_tree'] = False
+                return summary
+
+            # if event is verbose (or debug, etc), we need to "assign" it a
+            # parent. This code looks at the event level of the previous
+            # non-verbose event, and the level of the next (by looking ahead)
+            # non-verbose event. The verbose event is assigned the same parent
+            # uuid of the higher level event.
+            # e.g.
+            # E1
+            #  E2
+            # verbose
+            # verbose <- we are on this event currently
+            #    E4
+            # We'll compare E2 and E4, and the verbose event
+            # will be assigned the parent uuid of E4 (higher event level)
+            if e['event'] in JobEvent.META_EVENTS:
+                event_level_before = JobEvent.LEVEL_FOR_EVENT[prev_non_meta_event['event']]
+                # find next non meta event
+                z = i
+                next_non_meta_event = events[-1]
+                while z < len(events):
+                    if events[z]['event'] not in JobEvent.META_EVENTS:
+                        next_non_meta_event = events[z]
+                        break
+                    z += 1
+                event_level_after = JobEvent.LEVEL_FOR_EVENT[next_non_meta_event['event']]
+                if event_level_after and event_level_after > event_level_before:
+                    puuid = next_non_meta_event['parent_uuid']
+                else:
+                    puuid = prev_non_meta_event['parent_uuid']
+                if puuid:
+                    map_meta_counter_nested_uuid[e['counter']] = puuid
+            map_counter_children_tally[e['counter']]['rowNumber'] = i
+            if not puuid:
+                continue
+            # now traverse up the parent, grandparent, etc. events and tally those
+            while puuid:
+                map_counter_children_tally[map_uuid_counter[puuid]]['numChildren'] += 1
+                puuid = map_uuid_puuid.get(puuid, None)
+
+        # stored as lists, JSON objects can't have integer keys; drop events with 0 children
+        summary['children'] = [[k, v['rowNumber'], v['numChildren']] for k, v in map_counter_children_tally.items() if v['numChildren'] != 0]
+        summary['meta_event_nested_uuid'] = list(map_meta_counter_nested_uuid.items())
+        return summary
+
     def copy_unified_job(self, **new_prompts):
         # Needed for job slice relaunch consistency, do no re-spawn workflow job
         # target same slice as original job
@@ -1008,6 +1128,25 @@ class LaunchTimeConfig(LaunchTimeConfigBase):
         return self.display_extra_vars()
 
 
+class JobEventsChildrenSummary(models.Model):
+    """
+    The event tree summary of a finished job, see Job.get_events_children_summary
+    Not exposed in the API
+    """
+
+    class Meta:
+        app_label = 'main'
+
+    job = models.OneToOneField(
+        'Job',
+        related_name='events_children_summary',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        editable=False,
+    )
+    summary = models.JSONField(default=dict, editable=False)
+
+
 class JobLaunchConfig(LaunchTimeConfig):
     """
     Historical record of user launch-time overrides for a job
@@ -1136,6 +1275,68 @@ class JobHostSummary(CreatedModifiedModel):
         super(JobHostSummary, self).save(*args, **kwargs)
 
 
+class JobTaskStats(CreatedModifiedModel):
+    """
+    Per-task statistics for each job, kept up to date by the callback receiver
+    as the events of the job are saved, see JOB_EVENT_TASK_STATS.
+    """
+
+    # the counter incremented for each host result event
+    HOST_RESULTS = {
+        'runner_on_ok': 'ok',
+        'runner_on_async_ok': 'ok',
+        'runner_on_failed': 'failed',
+        'runner_on_async_failed': 'failed',
+        'runner_on_skipped': 'skipped',
+        'runner_on_unreachable': 'unreachable',
+    }
+    COUNTERS = ('ok', 'changed', 'failed', 'ignored', 'skipped', 'unreachable')
+
+    class Meta:
+        app_label = 'main'
+        unique_together = [('job', 'task_uuid')]
+        verbose_name_plural = _('job task stats')
+        ordering = ('started', 'pk')
+
+    job = models.ForeignKey(
+        'Job',
+        related_name='task_stats',
+        on_delete=models.CASCADE,
+        editable=False,
+    )
+    task_uuid = models.CharField(max_length=1024, editable=False)
+    play = models.CharField(max_length=1024, default='', editable=False)
+    role = models.CharField(max_length=1024, default='', editable=False)
+    task = models.CharField(max_length=1024, default='', editable=False)
+    event_counts = models.JSONField(default=dict, editable=False, help_text=_('The number of events of the task by event type.'))
+    ok = models.PositiveIntegerField(default=0, editable=False)
+    changed = models.PositiveIntegerField(default=0, editable=False)
+    failed = models.PositiveIntegerField(default=0, editable=False)
+    ignored = models.PositiveIntegerField(default=0, editable=False)
+    skipped = models.PositiveIntegerField(default=0, editable=False)
+    unreachable = models.PositiveIntegerField(default=0, editable=False)
+    host_seconds = models.FloatField(default=0, editable=False, help_text=_('The time spent running the task, summed over all hosts.'))
+    started = models.DateTimeField(null=True, default=None, editable=False)
+    finished = models.DateTimeField(null=True, default=None, editable=False)
+
+    def __str__(self):
+        return '%s ok=%d changed=%d failed=%d ignored=%d skipped=%d unreachable=%d' % (
+            self.task or self.task_uuid,
+            self.ok,
+            self.changed,
+            self.failed,
+            self.ignored,
+            self.skipped,
+            self.unreachable,
+        )
+
+    @property
+    def elapsed(self):
+        if self.started is None or self.finished is None:
+            return 0
+        return (self.finished - self.started).total_seconds()
+
+
 class SystemJobOptions(BaseModel):
     """
     Common fields for SystemJobTemplate and SystemJob.
@@ -3,8 +3,10 @@
 
 # Python
 from io import StringIO
+import bisect
 import datetime
 import decimal
+import hashlib
 import codecs
 import json
 import logging
@@ -13,10 +15,15 @@ import re
 import socket
 import subprocess
 import tempfile
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from uuid import uuid4
+
+import pyzstd
 
 # Django
 from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, connection, transaction
 from django.core.exceptions import NON_FIELD_ERRORS
 from django.utils.translation import gettext_lazy as _
@@ -66,6 +73,9 @@ logger = logging.getLogger('awx.main.models.unified_jobs')
 logger_job_lifecycle = logging.getLogger('awx.analytics.job_lifecycle')
 # NOTE: ACTIVE_STATES moved to constants because it is used by parent modules
 
+# how COPY ... TO STDOUT escapes text columns
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\b': '\\b', '\f': '\\f', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\v': '\\v'})
+
 
 class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, ExecutionEnvironmentMixin, NotificationFieldsModel):
     """
@@ -589,6 +599,11 @@ class UnifiedJob(
         default=0,
         editable=False,
     )
+    events_archived = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text=_("If the events of this job were moved out of the database, to a file under JOB_EVENT_ARCHIVE_ROOT."),
+    )
     unified_job_template = models.ForeignKey(
         'UnifiedJobTemplate',
         null=True,  # Some jobs can be run without a template.
@@ -1097,6 +1112,8 @@ class UnifiedJob(
             event_qs = self.get_event_queryset()
         except NotImplementedError:
             return True  # Model without events, such as WFJT
+        if self.events_archived:
+            return True  # only finished jobs are archived
         return self.emitted_events == event_qs.count()
 
     def result_stdout_raw_handle(self, enforce_max_bytes=True):
@@ -1159,24 +1176,25 @@ class UnifiedJob(
                     # detect the length of all stdout for this UnifiedJob, and
                     # if it exceeds settings.STDOUT_MAX_BYTES_DISPLAY bytes,
                     # don't bother actually fetching the data
-                    total = self.get_event_queryset().aggregate(total=models.Sum(models.Func(models.F('stdout'), function='LENGTH')))['total'] or 0
+                    if self.events_archived:
+                        total = sum(len(event.stdout) for event in self.get_archived_events())
+                    else:
+                        total = self.get_event_queryset().aggregate(total=models.Sum(models.Func(models.F('stdout'), function='LENGTH')))['total'] or 0
                     if total > max_supported:
                         raise StdoutMaxBytesExceeded(total, max_supported)
 
-                tbl = self._meta.db_table + 'event'
-                created_by_cond = ''
-                if self.has_unpartitioned_events:
-                    tbl = f'_unpartitioned_{tbl}'
+                if self.events_archived:
+                    for data in self._archived_stdout_rows():
+                        fd.write(data)
                 else:
-                    created_by_cond = f"job_created='{self.created.isoformat()}' AND "
-
-                sql = f"copy (select stdout from {tbl} where {created_by_cond}{self.event_parent_key}={self.id} and stdout != '' order by start_line) to stdout"  # nosql
-                # psycopg3's copy writes bytes, but callers of this
-                # function assume a str-based fd will be returned; decode
-                # .write() calls on the fly to maintain this interface
-                with cursor.copy(sql) as copy:
-                    while data := copy.read():
-                        fd.write(smart_str(bytes(data)))
+                    tbl, created_by_cond = self._stdout_event_table()
+                    sql = f"copy (select stdout from {tbl} where {created_by_cond}{self.event_parent_key}={self.id} and stdout != '' order by start_line, counter) to stdout"  # nosql
+                    # psycopg3's copy writes bytes, but callers of this
+                    # function assume a str-based fd will be returned; decode
+                    # .write() calls on the fly to maintain this interface
+                    with cursor.copy(sql) as copy:
+                        while data := copy.read():
+                            fd.write(smart_str(bytes(data)))
 
                 if hasattr(fd, 'name'):
                     # If we're dealing with a physical file, use `sed` to clean
@@ -1190,6 +1208,355 @@ class UnifiedJob(
                     fd = StringIO(fd.getvalue().replace('\\r\\n', '\n'))
                     return fd
 
+    def result_stdout_raw_stream(self, chunk_size=65536):
+        """
+        Generate all stdout for the UnifiedJob as str chunks of whole lines of
+        about chunk_size characters, streamed straight from the COPY cursor so
+        that memory use does not depend on the size of the output.
+
+        The content is the same as what result_stdout_raw_handle(enforce_max_bytes=False) returns.
+        """
+        legacy_stdout_text = self.result_stdout_text
+        if legacy_stdout_text:
+            for i in range(0, len(legacy_stdout_text), chunk_size):
+                yield legacy_stdout_text[i : i + chunk_size]
+            return
+
+        buffer = ''
+        for data in self._stdout_copy_data():
+            buffer += data
+            if len(buffer) >= chunk_size:
+                # newlines in the COPY output only ever end a row, so
+                # cutting after one never splits an escaped \r\n
+                cut = buffer.rfind('\n') + 1
+                if cut:
+                    yield buffer[:cut].replace('\\r\\n', '\n')
+                    buffer = buffer[cut:]
+        if buffer:
+            yield buffer.replace('\\r\\n', '\n')
+
+    def _stdout_copy_data(self):
+        """Generate the COPY TO STDOUT text of the stdout column of this job's events"""
+        if self.events_archived:
+            yield from self._archived_stdout_rows()
+            return
+        tbl, created_by_cond = self._stdout_event_table()
+        sql = f"copy (select stdout from {tbl} where {created_by_cond}{self.event_parent_key}={self.id} and stdout != '' order by start_line, counter) to stdout"  # nosql
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with connection.cursor() as cursor:
+            with cursor.copy(sql) as copy:
+                while data := copy.read():
+                    yield decoder.decode(bytes(data))
+        yield decoder.decode(b'', final=True)
+
+    @property
+    def event_archive_path(self):
+        if not settings.JOB_EVENT_ARCHIVE_ROOT:
+            return None
+        return os.path.join(settings.JOB_EVENT_ARCHIVE_ROOT, f'unified_job_{self.pk}.jsonl.zst')
+
+    def archive_events(self):
+        """
+        Move the events of this job out of the database, into a zstd compressed
+        JSON lines file under JOB_EVENT_ARCHIVE_ROOT, and return how many were
+        archived.  Once archived, the events are read from the file by
+        get_archived_events, the stdout methods and the event list endpoints.
+        """
+        if self.status in ACTIVE_STATES:
+            raise RuntimeError(f'{self.log_format} is still active, its events can not be archived')
+        if not settings.JOB_EVENT_ARCHIVE_ROOT:
+            raise RuntimeError('JOB_EVENT_ARCHIVE_ROOT is not set')
+        attnames = [f.attname for f in self.event_class._meta.concrete_fields]
+        os.makedirs(settings.JOB_EVENT_ARCHIVE_ROOT, exist_ok=True)
+        path = self.event_archive_path
+        count = 0
+        with pyzstd.ZstdFile(f'{path}.tmp', 'wb') as f:
+            for values in self.get_event_queryset().order_by('start_line', 'counter').values_list(*attnames).iterator(chunk_size=1000):
+                f.write(json.dumps(dict(zip(attnames, values)), cls=DjangoJSONEncoder).encode('utf-8') + b'\n')
+                count += 1
+        os.replace(f'{path}.tmp', path)
+        with transaction.atomic():
+            UnifiedJob.objects.filter(pk=self.pk).update(events_archived=True)
+            self.get_event_queryset().delete()
+        self.events_archived = True
+        self.clear_stdout_cache()
+        return count
+
+    def get_archived_events(self):
+        """Generate the archived events of this job as (unsaved) event instances, ordered by start_line"""
+        path = self.event_archive_path
+        if path is None:
+            raise RuntimeError(f'The events of {self.log_format} are archived, but JOB_EVENT_ARCHIVE_ROOT is not set')
+        fields = {f.attname: f for f in self.event_class._meta.concrete_fields}
+        with pyzstd.ZstdFile(path, 'rb') as f:
+            for line in f:
+                row = json.loads(line)
+                event = self.event_class(**{name: fields[name].to_python(value) for name, value in row.items() if name in fields})
+                event._state.adding = False
+                yield event
+
+    def _archived_stdout_rows(self):
+        # the same text as COPY TO STDOUT produces, see result_stdout_raw_handle
+        for event in self.get_archived_events():
+            if event.stdout:
+                yield event.stdout.translate(COPY_TEXT_ESCAPES) + '\n'
+
+    @property
+    def _stdout_cache_prefix(self):
+        # not model_to_str(), the base UnifiedJob must find the same keys, see clear_stdout_cache
+        return f'unified_job-{self.pk}-stdout'
+
+    @property
+    def _stdout_cache_version_key(self):
+        return f'{self._stdout_cache_prefix}-cache-version'
+
+    def _stdout_cache_key(self, params, create_version=False):
+        # content addressed: the stdout of a finished job never changes, so
+        # the job, the per-job version and the render parameters identify it
+        version = cache.get(self._stdout_cache_version_key)
+        if version is None:
+            if not create_version:
+                return None
+            version = uuid4().hex
+            if not cache.add(self._stdout_cache_version_key, version, settings.STDOUT_CACHE_TIMEOUT):
+                version = cache.get(self._stdout_cache_version_key)
+        digest = hashlib.sha256(json.dumps([self.pk, self.created.isoformat() if self.created else None, version, *params]).encode('utf-8')).hexdigest()
+        return f'{self._stdout_cache_prefix}-{digest}'
+
+    def get_cached_stdout(self, *params):
+        """Return stdout rendered with params by a previous cache_stdout call, or None"""
+        key = self._stdout_cache_key(params)
+        if key is None:
+            return None
+        value = cache.get(key)
+        if value is None:
+            return None
+        return json.loads(pyzstd.decompress(value))
+
+    def cache_stdout(self, value, *params):
+        """
+        Cache the stdout rendered with params, compressed, if this job is
+        finished and all of its events have been saved.  Renders larger than
+        STDOUT_CACHE_MAX_BYTES once compressed are not cached, and the cache
+        backend evicts the rest as it fills up.
+        """
+        if not settings.STDOUT_CACHE_TIMEOUT or not self.event_processing_finished:
+            return
+        value = pyzstd.compress(json.dumps(value).encode('utf-8'))
+        if len(value) > settings.STDOUT_CACHE_MAX_BYTES:
+            return
+        cache.set(self._stdout_cache_key(params, create_version=True), value, settings.STDOUT_CACHE_TIMEOUT)
+        # the version must outlive every render cached under it
+        cache.touch(self._stdout_cache_version_key, settings.STDOUT_CACHE_TIMEOUT)
+
+    @property
+    def stdout_cache_keys(self):
+        """The keys that clear_stdout_cache deletes, renders expire on their own once the version is gone"""
+        return [self._stdout_cache_version_key, f'{self._stdout_cache_prefix}-line-index']
+
+    def clear_stdout_cache(self):
+        """Forget all cached stdout renders, and the line index, of this job"""
+        cache.delete_many(self.stdout_cache_keys)
+
+    def _stdout_event_table(self):
+        tbl = self._meta.db_table + 'event'
+        created_by_cond = ''
+        if self.has_unpartitioned_events:
+            tbl = f'_unpartitioned_{tbl}'
+        else:
+            created_by_cond = f"job_created='{self.created.isoformat()}' AND "
+        return tbl, created_by_cond
+
+    def stdout_line_index(self):
+        """
+        Return a (lines, counters, total_lines, total_bytes) tuple describing
+        where each event's stdout appears in the output of this job: the event
+        with counter counters[i] starts at line lines[i].
+
+        The index is built from the start_line and end_line the event emitter
+        recorded for each event, so no stdout is fetched to build it.  It is
+        cached, and while the job is running it is extended with only the
+        events after the highest counter already indexed; events are not saved
+        in counter order, so the cached index stops before the first counter
+        that has not been saved yet.
+        """
+        cache_key = f'{self._stdout_cache_prefix}-line-index'
+        cached = cache.get(cache_key)
+        if cached is not None and cached[1] is None:
+            return cached[0]
+        finished = self.event_processing_finished
+
+        # through is the highest counter up to which every event is indexed, last_start_line the start_line of that event
+        (lines, counters, total_lines, total_bytes), through, last_start_line = cached or (([], [], 0, 0), 0, 0)
+        rows = self._stdout_line_index_rows(after=through or None)
+        start_lines = [last_start_line] + [row[1] for row in rows]
+        in_order = all(a <= b for a, b in zip(start_lines, start_lines[1:]))
+        if not in_order:
+            # the lines of this job were not numbered in counter order, order all of its events by line
+            (lines, counters, total_lines, total_bytes), through = ([], [], 0, 0), 0
+            rows = sorted(self._stdout_line_index_rows(after=None), key=lambda row: (row[1], row[0]))
+        indexed = (len(lines), total_lines, total_bytes)
+        gap = False
+        for counter, start_line, row_lines, row_bytes in rows:
+            if row_lines is not None:
+                lines.append(total_lines)
+                counters.append(counter)
+                total_lines += row_lines
+                total_bytes += row_bytes
+            if counter > through + 1:
+                gap = True
+            elif counter == through + 1 and not gap:
+                through, last_start_line = counter, start_line
+                indexed = (len(lines), total_lines, total_bytes)
+        index = (lines, counters, total_lines, total_bytes)
+        if finished:
+            cache.set(cache_key, (index, None, None), settings.STDOUT_LINE_INDEX_CACHE_TIMEOUT)
+        elif in_order:
+            n, indexed_lines, indexed_bytes = indexed
+            cache.set(cache_key, ((lines[:n], counters[:n], indexed_lines, indexed_bytes), through, last_start_line), settings.STDOUT_LINE_INDEX_CACHE_TIMEOUT)
+        return index
+
+    def _stdout_line_index_rows(self, after=None):
+        """
+        Return the (counter, start_line, lines, bytes) of the events of this
+        job, in counter order, after the counter after; lines is None for the
+        events with no stdout
+        """
+        # octet_length() reads the size of a toasted value without detoasting it
+        size = 'octet_length' if connection.vendor == 'postgresql' else 'length'
+        tbl, created_by_cond = self._stdout_event_table()
+        counter_cond = '' if after is None else f' and counter > {int(after)}'
+        with connection.cursor() as cursor:
+            # the output has one line per row, plus one for every \r\n in the row, see result_stdout_raw_handle;
+            # the lines are only counted in the stdout of events without a line range, from older emitters
+            cursor.execute(
+                f"select counter, start_line, case when stdout = '' then null when end_line > start_line then end_line - start_line "  # nosql
+                f"else (length(stdout) - length(replace(stdout, %s, ''))) / 2 + 1 end, {size}(stdout) "
+                f"from {tbl} where {created_by_cond}{self.event_parent_key}={self.id}{counter_cond} order by counter",
+                ['\r\n'],
+            )
+            return cursor.fetchall()
+
+    def _result_stdout_lines(self, start_line, end_line):
+        """
+        Return the stdout lines in [start_line:end_line], reading only the
+        events that cover them, and the total number of lines; returns None
+        when the range can not be served from the line index
+        """
+        lines, counters, total_lines, total_bytes = self.stdout_line_index()
+        if total_bytes > settings.STDOUT_MAX_BYTES_DISPLAY:
+            raise StdoutMaxBytesExceeded(total_bytes, settings.STDOUT_MAX_BYTES_DISPLAY)
+        start, end, _ = slice(start_line, end_line).indices(total_lines)
+        if start >= end:
+            return [], total_lines
+        first = bisect.bisect_right(lines, start) - 1
+        last = bisect.bisect_left(lines, end)
+        wanted = counters[first:last]
+
+        tbl, created_by_cond = self._stdout_event_table()
+        fd = StringIO()
+        with connection.cursor() as cursor:
+            sql = (
+                f"copy (select stdout from {tbl} where {created_by_cond}{self.event_parent_key}={self.id} and stdout != '' "  # nosql
+                f"and counter in ({', '.join(str(int(c)) for c in wanted)}) order by start_line, counter) to stdout"
+            )
+            with cursor.copy(sql) as copy:
+                while data := copy.read():
+                    fd.write(smart_str(bytes(data)))
+        content = fd.getvalue()
+        if content.count('\n') != len(wanted):
+            # e.g. duplicate counters, or events saved since the index was built
+            return None
+        stdout_lines = StringIO(content.replace('\\r\\n', '\n')).readlines()
+        if len(stdout_lines) != (lines[last] if last < len(lines) else total_lines) - lines[first]:
+            # start_line and end_line of some event do not match its stdout
+            return None
+        return stdout_lines[start - lines[first] : end - lines[first]], total_lines
+
+    def search_stdout(self, pattern, context=0, clean=None):
+        """
+        Generate a dict for each line of stdout that contains `pattern`, case
+        insensitively, with its line number (as used by the start_line and
+        end_line of the stdout endpoint) and `context` lines on either side.
+
+        Every line goes through `clean`, if given, before it is matched or
+        returned, so that what it redacts can not be found by searching.
+
+        Only the events whose stdout matches are read, found by an icontains
+        lookup that the trigram index of the event partition serves, if there
+        is one (see JOB_EVENT_STDOUT_TRIGRAM_INDEX); plus the events holding
+        the context lines.  The lookup runs on the raw stdout, so it is only a
+        prefilter: matches are confirmed on the cleaned lines.
+        """
+        if clean is None:
+            clean = str
+        if self.result_stdout_text or self.events_archived:
+            yield from self._search_stdout_stream(pattern, context, clean)
+            return
+
+        lines, counters, total_lines, _ = self.stdout_line_index()
+        first_line = dict(zip(counters, lines))
+        needle = pattern.lower()
+        matches = self.get_event_queryset().exclude(stdout='').filter(stdout__icontains=pattern).order_by('start_line', 'counter')
+        batch = []
+        for counter, stdout in matches.values_list('counter', 'stdout').iterator():
+            if counter not in first_line:
+                continue  # saved since the line index was built
+            for offset, text in enumerate(stdout.split('\r\n')):
+                text = clean(text)
+                if needle in text.lower():
+                    batch.append((first_line[counter] + offset, text))
+            if len(batch) >= 100:
+                yield from self._stdout_search_results(batch, context, lines, counters, total_lines, clean)
+                batch = []
+        yield from self._stdout_search_results(batch, context, lines, counters, total_lines, clean)
+
+    def _stdout_search_results(self, batch, context, lines, counters, total_lines, clean):
+        # fetch the events holding the context lines of a batch of matches at once
+        text_of_line = {}
+        if context and batch:
+            wanted = set()
+            for line, text in batch:
+                first = bisect.bisect_right(lines, max(line - context, 0)) - 1
+                last = bisect.bisect_left(lines, min(line + context + 1, total_lines))
+                wanted.update(counters[first:last])
+            for counter, stdout in self.get_event_queryset().filter(counter__in=wanted).exclude(stdout='').values_list('counter', 'stdout'):
+                index = bisect.bisect_left(counters, counter)
+                if index < len(counters) and counters[index] == counter:
+                    for offset, text in enumerate(stdout.split('\r\n')):
+                        text_of_line[lines[index] + offset] = clean(text)
+        for line, text in batch:
+            yield dict(
+                line=line,
+                stdout=text,
+                before=[text_of_line.get(n, '') for n in range(max(line - context, 0), line)],
+                after=[text_of_line.get(n, '') for n in range(line + 1, min(line + context + 1, total_lines))],
+            )
+
+    def _search_stdout_stream(self, pattern, context, clean):
+        # legacy and archived stdout is searched line by line
+        needle = pattern.lower()
+        before = deque(maxlen=context)
+        pending = deque()  # matches still collecting their trailing context
+        for line, text in enumerate(self._result_stdout_raw_lines()):
+            text = clean(text)
+            for match in pending:
+                match['after'].append(text)
+            if needle in text.lower():
+                pending.append(dict(line=line, stdout=text, before=list(before), after=[]))
+            while pending and len(pending[0]['after']) >= context:
+                yield pending.popleft()
+            before.append(text)
+        yield from pending
+
+    def _result_stdout_raw_lines(self):
+        remainder = ''
+        for chunk in self.result_stdout_raw_stream():
+            *lines, remainder = (remainder + chunk).split('\n')
+            yield from lines
+        if remainder:
+            yield remainder
+
     def _escape_ascii(self, content):
         # Remove ANSI escape sequences used to embed event data.
         content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
@@ -1217,19 +1584,26 @@ class UnifiedJob(
         return_buffer = StringIO()
         if end_line is not None:
             end_line = int(end_line)
-        stdout_lines = self.result_stdout_raw_handle().readlines()
-        absolute_end = len(stdout_lines)
-        for line in stdout_lines[int(start_line) : end_line]:
+        result = None
+        if not self.result_stdout_text and not self.events_archived:
+            result = self._result_stdout_lines(int(start_line), end_line)
+        if result is None:
+            stdout_lines = self.result_stdout_raw_handle().readlines()
+            absolute_end = len(stdout_lines)
+            stdout_lines = stdout_lines[int(start_line) : end_line]
+        else:
+            stdout_lines, absolute_end = result
+        for line in stdout_lines:
             return_buffer.write(line)
         if int(start_line) < 0:
-            start_actual = len(stdout_lines) + int(start_line)
-            end_actual = len(stdout_lines)
+            start_actual = absolute_end + int(start_line)
+            end_actual = absolute_end
         else:
             start_actual = int(start_line)
             if end_line is not None:
-                end_actual = min(int(end_line), len(stdout_lines))
+                end_actual = min(int(end_line), absolute_end)
             else:
-                end_actual = len(stdout_lines)
+                end_actual = absolute_end
 
         return_buffer = return_buffer.getvalue()
         if redact_sensitive:
@@ -4,12 +4,86 @@
 # Python
 import json
 import logging
+import threading
+import time
+
+import msgpack
+import pyzstd
 import redis
 
 # Django
 from django.conf import settings
 
-__all__ = ['CallbackQueueDispatcher']
+__all__ = [
+    'CallbackQueueDispatcher',
+    'callback_queue_names',
+    'callback_queue_for_job',
+    'publish_callback_receiver_load',
+    'encode_callback_event',
+    'decode_callback_event',
+]
+
+# redis hash where each callback receiver worker publishes its view of the queue depth and lag
+CALLBACK_RECEIVER_LOAD_KEY = 'awx_callback_receiver_load'
+# how often each worker publishes its load, whether or not it read any events
+CALLBACK_RECEIVER_LOAD_INTERVAL = 5
+# when no load was published for this long, the receiver is assumed to be stuck
+CALLBACK_RECEIVER_LOAD_MAX_AGE = 30
+# the load of a worker that stopped publishing is removed after this long, e.g. once its process went away
+CALLBACK_RECEIVER_LOAD_PRUNE_AGE = 3600
+
+BACKPRESSURE_NONE = 0
+BACKPRESSURE_SOFT = 1
+BACKPRESSURE_HARD = 2
+
+# the keys that identify the unified job an event belongs to, see JOB_REFERENCE on the event models
+JOB_REFERENCES = ('job_id', 'ad_hoc_command_id', 'project_update_id', 'inventory_update_id', 'system_job_id')
+
+
+def callback_queue_names():
+    """
+    Return the redis lists that callback events are pushed to.
+
+    With CALLBACK_QUEUE_SHARDS greater than 1, events are spread across that
+    many lists by job id so that all events for a job land on the same shard.
+    There are at least as many shards as callback receiver workers, so that no
+    two workers read the same shard.
+    """
+    shards = getattr(settings, 'CALLBACK_QUEUE_SHARDS', 1)
+    if shards <= 1:
+        return [settings.CALLBACK_QUEUE]
+    shards = max(shards, getattr(settings, 'JOB_EVENT_WORKERS', 1))
+    return [f'{settings.CALLBACK_QUEUE}_{i}' for i in range(shards)]
+
+
+def callback_queue_for_job(job_id):
+    names = callback_queue_names()
+    if len(names) == 1 or job_id is None:
+        return names[0]
+    return names[int(job_id) % len(names)]
+
+
+def publish_callback_receiver_load(connection, worker, depth, lag):
+    """
+    Record the callback receiver queue depth and event lag (in seconds) seen by
+    a worker, and remove the load of workers that stopped publishing long ago
+    """
+    now = time.time()
+    stopped = []
+    for key, value in connection.hgetall(CALLBACK_RECEIVER_LOAD_KEY).items():
+        try:
+            published = json.loads(value).get('time', 0)
+        except (TypeError, ValueError, AttributeError):
+            published = 0
+        if now - published > CALLBACK_RECEIVER_LOAD_PRUNE_AGE:
+            stopped.append(key)
+    pipe = connection.pipeline(transaction=False)
+    if stopped:
+        pipe.hdel(CALLBACK_RECEIVER_LOAD_KEY, *stopped)
+    pipe.hset(CALLBACK_RECEIVER_LOAD_KEY, str(worker), json.dumps({'depth': depth, 'lag': lag, 'time': now}))
+    # the whole hash goes away when no worker publishes anymore
+    pipe.expire(CALLBACK_RECEIVER_LOAD_KEY, CALLBACK_RECEIVER_LOAD_PRUNE_AGE)
+    pipe.execute()
 
 
 # use a custom JSON serializer so we can properly handle !unsafe and !vault
@@ -22,11 +96,232 @@ class AnsibleJSONEncoder(json.JSONEncoder):
         return super(AnsibleJSONEncoder, self).default(o)
 
 
+class JSONCodec:
+    """The original wire format, a bare JSON document, which is what a receiver gets when there is no header byte"""
+
+    header = None
+
+    def encode(self, obj):
+        return json.dumps(obj, cls=AnsibleJSONEncoder)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+def _msgpack_default(o):
+    # same handling of !vault objects as AnsibleJSONEncoder
+    if getattr(o, 'yaml_tag', None) == '!vault':
+        return o.data
+    raise TypeError(f'Object of type {o.__class__.__name__} is not msgpack serializable')
+
+
+class MsgpackCodec:
+    header = b'\x01'
+
+    def encode(self, obj):
+        return self.header + msgpack.packb(obj, default=_msgpack_default)
+
+    def decode(self, data):
+        # module results often have non-str keys, e.g. {0: ...}, which json.dumps stringifies
+        return msgpack.unpackb(data[1:], strict_map_key=False)
+
+
+class ZstdMsgpackCodec(MsgpackCodec):
+    """msgpack compressed with zstd, used for events of at least CALLBACK_QUEUE_COMPRESSION_THRESHOLD bytes"""
+
+    header = b'\x02'
+
+    def encode(self, obj):
+        return self.header + pyzstd.compress(msgpack.packb(obj, default=_msgpack_default))
+
+    def decode(self, data):
+        try:
+            return msgpack.unpackb(pyzstd.decompress(data[1:]), strict_map_key=False)
+        except pyzstd.ZstdError as e:
+            raise ValueError(str(e)) from e
+
+
+CALLBACK_EVENT_CODECS = {'json': JSONCodec(), 'msgpack': MsgpackCodec(), 'msgpack+zstd': ZstdMsgpackCodec()}
+_codecs_by_header = {codec.header: codec for codec in CALLBACK_EVENT_CODECS.values() if codec.header}
+
+
+def encode_callback_event(obj, codec='json', compression_threshold=0):
+    """
+    Serialize a callback event for the callback queue.
+
+    Every codec except json prefixes its output with a header byte, which lets
+    decode_callback_event read messages written by producers with any
+    CALLBACK_QUEUE_CODEC setting.  With msgpack, encoded events of at least
+    compression_threshold bytes are compressed with zstd.
+    """
+    data = CALLBACK_EVENT_CODECS[codec].encode(obj)
+    if codec == 'msgpack' and compression_threshold and len(data) >= compression_threshold:
+        data = CALLBACK_EVENT_CODECS['msgpack+zstd'].encode(obj)
+    return data
+
+
+def decode_callback_event(data):
+    """Deserialize a message read from the callback queue, raises ValueError for a malformed message"""
+    codec = _codecs_by_header.get(data[:1] if isinstance(data, bytes) else None, CALLBACK_EVENT_CODECS['json'])
+    return codec.decode(data)
+
+
 class CallbackQueueDispatcher(object):
+    """
+    Pushes serialized callback events onto the callback receiver redis queue.
+
+    When CALLBACK_QUEUE_BATCH_SIZE is greater than 1, events are buffered in
+    memory and pushed with one pipelined multi-value RPUSH per shard once the
+    batch is full or the oldest buffered event is CALLBACK_QUEUE_BATCH_MAX_DELAY
+    seconds old, whichever comes first.  Ordering is preserved because all
+    events of a job go to the same shard, and batches are pushed in the order
+    they fill.
+    """
+
     def __init__(self):
         self.queue = getattr(settings, 'CALLBACK_QUEUE', '')
+        self.sharded = len(callback_queue_names()) > 1
         self.logger = logging.getLogger('awx.main.queue.CallbackQueueDispatcher')
         self.connection = redis.Redis.from_url(settings.BROKER_URL)
+        self.batch_size = max(int(getattr(settings, 'CALLBACK_QUEUE_BATCH_SIZE', 1)), 1)
+        self.batch_max_delay = float(getattr(settings, 'CALLBACK_QUEUE_BATCH_MAX_DELAY', 0.25))
+        self.buffer = []  # (queue, message) pairs
+        self.buffer_started = None
+        self.lock = threading.RLock()
+        self.timer = None
+        self.pressure = BACKPRESSURE_NONE
+        self.pressure_checked = 0
+        self.codec = getattr(settings, 'CALLBACK_QUEUE_CODEC', 'json')
+        self.compression_threshold = getattr(settings, 'CALLBACK_QUEUE_COMPRESSION_THRESHOLD', 0)
+
+    def backpressure(self):
+        """
+        Return how hard the callback receiver is pushing back on producers.
+
+        The published receiver load is read at most once per
+        CALLBACK_BACKPRESSURE_CHECK_INTERVAL.  At BACKPRESSURE_HARD this blocks,
+        for up to CALLBACK_BACKPRESSURE_MAX_BLOCK seconds, while the receiver
+        catches up.
+        """
+        soft_depth = getattr(settings, 'CALLBACK_BACKPRESSURE_SOFT_QUEUE_DEPTH', 0)
+        hard_depth = getattr(settings, 'CALLBACK_BACKPRESSURE_HARD_QUEUE_DEPTH', 0)
+        soft_lag = getattr(settings, 'CALLBACK_BACKPRESSURE_SOFT_LAG', 0)
+        if not (soft_depth or hard_depth or soft_lag):
+            return BACKPRESSURE_NONE
+        if time.monotonic() - self.pressure_checked < getattr(settings, 'CALLBACK_BACKPRESSURE_CHECK_INTERVAL', 1):
+            return self.pressure
+
+        blocked = 0
+        max_block = getattr(settings, 'CALLBACK_BACKPRESSURE_MAX_BLOCK', 5)
+        while True:
+            depth, lag = self.receiver_load()
+            if depth is None:
+                # the receiver stopped publishing its load, it is likely stuck; assume the worst
+                self.pressure = BACKPRESSURE_HARD if hard_depth else BACKPRESSURE_SOFT
+            elif hard_depth and depth >= hard_depth:
+                self.pressure = BACKPRESSURE_HARD
+            elif (soft_depth and depth >= soft_depth) or (soft_lag and lag >= soft_lag):
+                self.pressure = BACKPRESSURE_SOFT
+            else:
+                self.pressure = BACKPRESSURE_NONE
+            if self.pressure != BACKPRESSURE_HARD or blocked >= max_block:
+                break
+            # push what we have so the receiver sees it, then give it a chance to catch up
+            self.flush()
+            time.sleep(0.5)
+            blocked += 0.5
+        if blocked:
+            self.logger.warning(f'Blocked {blocked}s waiting on the callback receiver, queue depth is {"unknown" if depth is None else depth}')
+        self.pressure_checked = time.monotonic()
+        return self.pressure
+
+    def receiver_load(self):
+        """
+        Return the highest (queue depth, lag) recently published by the callback
+        receiver, or (None, None) when no worker published its load recently
+        """
+        depth, lag = None, None
+        try:
+            loads = self.connection.hgetall(CALLBACK_RECEIVER_LOAD_KEY)
+        except redis.exceptions.RedisError:
+            self.logger.exception('failed to read callback receiver load from redis')
+            return 0, 0
+        now = time.time()
+        for value in loads.values():
+            try:
+                load = json.loads(value)
+            except (TypeError, ValueError):
+                continue
+            if now - load.get('time', 0) > CALLBACK_RECEIVER_LOAD_MAX_AGE:
+                continue
+            depth = max(depth or 0, load.get('depth', 0))
+            lag = max(lag or 0, load.get('lag', 0))
+        return depth, lag
+
+    def queue_for(self, obj):
+        if not self.sharded:
+            return self.queue
+        for key in JOB_REFERENCES:
+            if key in obj:
+                return callback_queue_for_job(obj[key])
+        return callback_queue_for_job(None)
 
     def dispatch(self, obj):
-        self.connection.rpush(self.queue, json.dumps(obj, cls=AnsibleJSONEncoder))
+        queue = self.queue_for(obj)
+        message = encode_callback_event(obj, codec=self.codec, compression_threshold=self.compression_threshold)
+        if self.batch_size == 1:
+            self.connection.rpush(queue, message)
+            return
+
+        with self.lock:
+            if not self.buffer:
+                self.buffer_started = time.monotonic()
+                self.start_timer()
+            self.buffer.append((queue, message))
+            if len(self.buffer) >= self.batch_size or (time.monotonic() - self.buffer_started) >= self.batch_max_delay:
+                self.flush()
+
+    def flush(self):
+        """Push all buffered events to redis in one round trip"""
+        with self.lock:
+            self.cancel_timer()
+            if not self.buffer:
+                return
+            messages, self.buffer = self.buffer, []
+            self.buffer_started = None
+            by_queue = {}
+            for queue, message in messages:
+                by_queue.setdefault(queue, []).append(message)
+            try:
+                if len(by_queue) == 1:
+                    self.connection.rpush(queue, *by_queue[queue])
+                else:
+                    pipe = self.connection.pipeline(transaction=False)
+                    for queue, queue_messages in by_queue.items():
+                        pipe.rpush(queue, *queue_messages)
+                    pipe.execute()
+            except redis.exceptions.RedisError:
+                # keep the events so a later flush can retry them in order
+                self.buffer = messages + self.buffer
+                self.buffer_started = time.monotonic()
+                self.start_timer()
+                raise
+
+    def start_timer(self):
+        # guarantees buffered events are pushed within batch_max_delay even if
+        # the playbook goes quiet (e.g. a long running task) before the batch fills
+        self.timer = threading.Timer(self.batch_max_delay, self._timed_flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            if self.timer is not threading.current_thread():
+                self.timer.cancel()
+            self.timer = None
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        except redis.exceptions.RedisError:
+            self.logger.exception('failed to flush buffered callback events to redis')
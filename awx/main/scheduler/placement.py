@@ -0,0 +1,152 @@
+# Python
+import logging
+
+# Django
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+# AWX
+from awx.main.models import Job
+
+logger = logging.getLogger('awx.main.scheduler')
+
+
+class PlacementPolicy:
+    """
+    Picks the instance of an instance group that a task runs on.
+
+    Subclasses implement select(), which returns the instance the task fits
+    on, or None.  When no instance fits, the task goes to the largest idle
+    instance, if any, as it always has.  The policy of each instance group is
+    set by TASK_MANAGER_PLACEMENT_POLICIES, by the name of a registered policy
+    or the import path of a PlacementPolicy subclass.
+    """
+
+    name = None
+
+    def __init__(self, instance_groups):
+        # the TaskManagerInstanceGroups this policy places tasks for, one task manager run long
+        self.instance_groups = instance_groups
+        self.placed = 0
+
+    def get_metrics(self):
+        """The counts to add to the task_manager_placement_<name> subsystem metrics, when such metrics exist"""
+        return {self.name: self.placed}
+
+    def candidates(self, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        """Yields (instance, remaining capacity once the task runs on it) for each instance the task fits on, in group order"""
+        for instance in self.instance_groups.get_instances(instance_group_name):
+            if instance.node_type not in (capacity_type, 'hybrid'):
+                continue
+            would_be_remaining = instance.remaining_capacity - impact
+            # hybrid nodes _always_ control their own tasks
+            if add_hybrid_control_cost and instance.node_type == 'hybrid':
+                would_be_remaining -= self.instance_groups.control_task_impact
+            if would_be_remaining >= 0:
+                yield instance, would_be_remaining
+
+    def select(self, task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        raise NotImplementedError()
+
+    def place(self, task, instance_group_name):
+        instance = self.select(task, instance_group_name, task.task_impact, task.capacity_type, add_hybrid_control_cost=True)
+        instance = instance or self.instance_groups.find_largest_idle_instance(instance_group_name, capacity_type=task.capacity_type)
+        if instance is not None:
+            self.placed += 1
+        return instance
+
+
+class MostRemainingCapacityPolicy(PlacementPolicy):
+    """The instance with the most capacity left, the default"""
+
+    name = 'most_remaining_capacity'
+
+    def select(self, task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        return self.instance_groups.fit_task_to_most_remaining_capacity_instance(
+            task, instance_group_name, impact=impact, capacity_type=capacity_type, add_hybrid_control_cost=add_hybrid_control_cost
+        )
+
+
+class BestFitPolicy(PlacementPolicy):
+    """The instance with the least capacity left that the task fits on, which keeps others free for large tasks"""
+
+    name = 'best_fit'
+
+    def select(self, task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        best = None
+        for instance, would_be_remaining in self.candidates(instance_group_name, impact, capacity_type, add_hybrid_control_cost):
+            if best is None or would_be_remaining < best[1]:
+                best = (instance, would_be_remaining)
+        return best[0] if best else None
+
+
+class SpreadPolicy(PlacementPolicy):
+    """The instance the task fits on with the smallest share of its capacity consumed, then with the fewest jobs running"""
+
+    name = 'spread'
+
+    def select(self, task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        best = None
+        for instance, _ in self.candidates(instance_group_name, impact, capacity_type, add_hybrid_control_cost):
+            load = (instance.consumed_capacity / instance.capacity if instance.capacity else 1, instance.jobs_running)
+            if best is None or load < best[1]:
+                best = (instance, load)
+        return best[0] if best else None
+
+
+class ProjectAffinityPolicy(MostRemainingCapacityPolicy):
+    """
+    The instance that last ran a job with the current revision of the project
+    of the task, when the task fits on it, so that the project is likely
+    still in its cache.  Otherwise the instance with the most capacity left.
+    """
+
+    name = 'project_affinity'
+
+    def __init__(self, instance_groups):
+        super().__init__(instance_groups)
+        self.affinity = {}  # project id -> hostname of the instance that last ran the current revision, or None
+        self.hits = 0
+
+    def get_metrics(self):
+        return {self.name: self.placed, f'{self.name}_hits': self.hits}
+
+    def get_affinity(self, project_id):
+        if project_id not in self.affinity:
+            self.affinity[project_id] = (
+                Job.objects.filter(project_id=project_id, scm_revision=F('project__scm_revision'))
+                .exclude(scm_revision='')
+                .exclude(execution_node='')
+                .order_by('-pk')
+                .values_list('execution_node', flat=True)
+                .first()
+            )
+        return self.affinity[project_id]
+
+    def select(self, task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=False):
+        project_id = getattr(task, 'project_id', None)
+        hostname = self.get_affinity(project_id) if project_id else None
+        if hostname:
+            for instance, _ in self.candidates(instance_group_name, impact, capacity_type, add_hybrid_control_cost):
+                if instance.hostname == hostname:
+                    self.hits += 1
+                    return instance
+        return super().select(task, instance_group_name, impact, capacity_type, add_hybrid_control_cost=add_hybrid_control_cost)
+
+
+PLACEMENT_POLICIES = {policy.name: policy for policy in (MostRemainingCapacityPolicy, BestFitPolicy, SpreadPolicy, ProjectAffinityPolicy)}
+DEFAULT_PLACEMENT_POLICY = MostRemainingCapacityPolicy.name
+
+
+def get_placement_policy_class(name):
+    if name in PLACEMENT_POLICIES:
+        return PLACEMENT_POLICIES[name]
+    try:
+        policy_class = import_string(name)
+    except ImportError:
+        logger.error(f'Unknown placement policy {name}, using {DEFAULT_PLACEMENT_POLICY}')
+        return PLACEMENT_POLICIES[DEFAULT_PLACEMENT_POLICY]
+    if not (isinstance(policy_class, type) and issubclass(policy_class, PlacementPolicy)):
+        logger.error(f'{name} is not a PlacementPolicy, using {DEFAULT_PLACEMENT_POLICY}')
+        return PLACEMENT_POLICIES[DEFAULT_PLACEMENT_POLICY]
+    return policy_class
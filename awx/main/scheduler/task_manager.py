@@ -20,6 +20,7 @@ from django.contrib.contenttypes.models import ContentType
 from ansible_base.lib.utils.models import get_type_for_model
 
 # AWX
+from awx.main.dispatch.publish import publish_batch
 from awx.main.dispatch.reaper import reap_job
 from awx.main.models import (
     Instance,
@@ -51,6 +52,43 @@ from awx.main.utils import decrypt_field
 logger = logging.getLogger('awx.main.scheduler')
 
 
+class TaskManagerState:
+    """
+    What the task manager learned in its last run about the pending tasks it
+    could not start, so that with TASK_MANAGER_INCREMENTAL the next run only
+    loads and looks at the pending tasks for which something changed.
+
+    A task blocked by another task stays blocked as long as the status of that
+    task is unchanged, so blocked tasks are indexed by the task blocking them,
+    and only the tasks of a blocker that changed are woken up.  Whatever holds
+    a key of the DependencyGraph (a project, inventory, job template, workflow
+    job template or the system job slot) is such a blocker, as is a dependency
+    still being run.  A task that did not fit stays that way as long as none
+    of the tasks that were waiting or running have finished, and the capacity of
+    the instances and instance groups is unchanged.  Both are checked against
+    the database on every run, so the state of any earlier run is safe to use,
+    and it is dropped every TASK_MANAGER_RECONCILE_INTERVAL seconds so that
+    every pending task is looked at again.
+    """
+
+    def __init__(self, reconciled=None):
+        self.reconciled = time.monotonic() if reconciled is None else reconciled
+        self.blockers = {}  # id of a task blocking others -> (status of that task, ids of the pending tasks it blocks)
+        self.needs_capacity = set()  # ids of the pending tasks that did not fit
+        self.running = frozenset()  # ids of the tasks that were waiting or running
+        self.capacity_fingerprint = None
+
+    def add_blocked(self, task_id, blocker):
+        status, blocked = self.blockers.setdefault(blocker.id, (blocker.status, set()))
+        # the same blocker may be seen through objects loaded at different times, trust none of them if they disagree
+        if status == blocker.status:
+            blocked.add(task_id)
+
+
+# the state of the last task manager run in this process
+task_manager_state = None
+
+
 def timeit(func):
     def inner(*args, **kwargs):
         t_now = time.perf_counter()
@@ -425,7 +463,10 @@ class TaskManager(TaskBase):
         # 5 minutes to start pending jobs. If this limit is reached, pending jobs
         # will no longer be started and will be started on the next task manager cycle.
         self.time_delta_job_explanation = timedelta(seconds=30)
+        # with TASK_MANAGER_INCREMENTAL, the TaskManagerState this run passes on to the next one
+        self.next_state = None
         super().__init__(prefix="task_manager")
+        self.batch_dispatch = settings.TASK_MANAGER_BATCH_DISPATCH
 
     def after_lock_init(self):
         """
@@ -435,6 +476,55 @@ class TaskManager(TaskBase):
         self.tm_models = TaskManagerModels()
         self.controlplane_ig = self.tm_models.instance_groups.controlplane_ig
 
+    @timeit
+    def get_tasks_incremental(self):
+        """
+        Load the waiting and running tasks, and only the pending tasks that
+        the state of the last run can not tell are still unable to start.
+        """
+        state = task_manager_state
+        active = {
+            pk: (status, dependencies_processed)
+            for pk, status, dependencies_processed in UnifiedJob.objects.filter(status__in=ACTIVE_STATES).values_list('id', 'status', 'dependencies_processed')
+        }
+        running = frozenset(pk for pk, (status, _) in active.items() if status in ('waiting', 'running'))
+        capacity_fingerprint = self.tm_models.capacity_fingerprint()
+
+        if state is None or time.monotonic() - state.reconciled >= settings.TASK_MANAGER_RECONCILE_INTERVAL:
+            logger.debug("Task manager state is missing or expired, looking at all pending tasks")
+            state = TaskManagerState()
+        elif capacity_fingerprint != state.capacity_fingerprint or not state.running <= running:
+            # capacity was freed up, or instances changed, any pending task may fit now
+            state.needs_capacity = set()
+
+        self.next_state = TaskManagerState(reconciled=state.reconciled)
+        self.next_state.capacity_fingerprint = capacity_fingerprint
+        task_ids = []
+        pending = set()
+        for pk, (status, dependencies_processed) in active.items():
+            if not dependencies_processed:
+                continue
+            if status == 'pending':
+                pending.add(pk)
+            else:
+                task_ids.append(pk)
+
+        blocked = set()
+        for blocker_id, (status, blocker_blocked) in state.blockers.items():
+            if active.get(blocker_id, (None,))[0] != status:
+                # the blocker finished or moved on, which wakes up the tasks it blocked
+                continue
+            blocker_blocked &= pending
+            if blocker_blocked:
+                self.next_state.blockers[blocker_id] = (status, blocker_blocked)
+                blocked |= blocker_blocked
+        self.next_state.needs_capacity = (state.needs_capacity & pending) - blocked
+        skipped = blocked | self.next_state.needs_capacity
+
+        task_ids.extend(pending - skipped)
+        self.subsystem_metrics.inc(f"{self.prefix}_pending_skipped", len(skipped))
+        self.get_tasks(dict(id__in=task_ids))
+
     def process_job_dep_failures(self, task):
         """If job depends on a job that has failed, mark as failed and handle misc stuff."""
         for dep in task.dependent_jobs.all():
@@ -510,25 +600,54 @@ class TaskManager(TaskBase):
                 )
             with disable_activity_stream():
                 task.celery_task_id = str(uuid.uuid4())
-                task.save()
+                if self.batch_dispatch and type(task) is not WorkflowJob:
+                    # saved along with the other tasks started by this run, see dispatch_started_tasks
+                    self.started_tasks.append(task)
+                else:
+                    task.save()
                 task.log_lifecycle("waiting")
 
         # apply_async does a NOTIFY to the channel dispatcher is listening to
         # postgres will treat this as part of the transaction, which is what we want
         if task.status != 'failed' and type(task) is not WorkflowJob:
             task_cls = task._get_task_class()
-            task_cls.apply_async(
-                [task.pk],
-                opts,
-                queue=task.get_queue_name(),
-                uuid=task.celery_task_id,
-            )
+            if self.batch_dispatch:
+                body = task_cls.get_async_body(args=[task.pk], kwargs=opts, uuid=task.celery_task_id)
+                self.started_task_bodies.setdefault(task.get_queue_name(), []).append(body)
+            else:
+                task_cls.apply_async(
+                    [task.pk],
+                    opts,
+                    queue=task.get_queue_name(),
+                    uuid=task.celery_task_id,
+                )
 
         # In exception cases, like a job failing pre-start checks, we send the websocket status message.
         # For jobs going into waiting, we omit this because of performance issues, as it should go to running quickly
         if task.status != 'waiting':
             task.websocket_emit_status(task.status)  # adds to on_commit
 
+    @timeit
+    def dispatch_started_tasks(self):
+        """
+        With TASK_MANAGER_BATCH_DISPATCH, save the tasks started by this run with one
+        query, and publish them with as few messages as possible per queue.  Like
+        apply_async, the messages are part of the transaction, so the dispatcher
+        only gets them once the tasks are saved.
+        """
+        if self.started_tasks:
+            modified = tz_now()
+            for task in self.started_tasks:
+                task.modified = modified
+            # only the fields start_task sets, so that e.g. a cancel_flag set meanwhile is kept
+            UnifiedJob.objects.bulk_update(
+                self.started_tasks, ['status', 'celery_task_id', 'controller_node', 'execution_node', 'instance_group', 'job_explanation', 'modified']
+            )
+        for queue, bodies in self.started_task_bodies.items():
+            publish_batch(queue, bodies)
+        self.started_tasks = []
+        self.started_task_bodies = {}
+
     @timeit
     def process_running_tasks(self, running_tasks):
         for task in running_tasks:
@@ -560,6 +679,9 @@ class TaskManager(TaskBase):
                     if task.created < (tz_now() - self.time_delta_job_explanation):
                         task.job_explanation = job_explanation
                         tasks_to_update_job_explanation.append(task)
+                if self.next_state is not None and task.job_explanation == job_explanation:
+                    # only once its explanation is saved, the task can be left alone until its blocker changes
+                    self.next_state.add_blocked(task.id, blocked_by)
                 continue
 
             if isinstance(task, WorkflowJob):
@@ -607,9 +729,7 @@ class TaskManager(TaskBase):
 
                 # at this point we know the instance group is NOT a container group
                 # because if it was, it would have started the task and broke out of the loop.
-                execution_instance = self.tm_models.instance_groups.fit_task_to_most_remaining_capacity_instance(
-                    task, instance_group_name=instance_group.name, add_hybrid_control_cost=True
-                ) or self.tm_models.instance_groups.find_largest_idle_instance(instance_group_name=instance_group.name, capacity_type=task.capacity_type)
+                execution_instance = self.tm_models.instance_groups.place_task(task, instance_group.name)
 
                 if execution_instance:
                     task.execution_node = execution_instance.hostname
@@ -639,6 +759,13 @@ class TaskManager(TaskBase):
                 self.task_needs_capacity(task, tasks_to_update_job_explanation)
         UnifiedJob.objects.bulk_update(tasks_to_update_job_explanation, ['job_explanation'])
 
+    def record_placement_metrics(self):
+        for policy in self.tm_models.instance_groups.placement_policies.values():
+            for name, value in policy.get_metrics().items():
+                # only the built-in policies have metrics
+                if f"{self.prefix}_placement_{name}" in self.subsystem_metrics.METRICS:
+                    self.subsystem_metrics.inc(f"{self.prefix}_placement_{name}", value)
+
     def task_needs_capacity(self, task, tasks_to_update_job_explanation):
         task.log_lifecycle("needs_capacity")
         job_explanation = gettext_noop("This job is not ready to start because there is not enough available capacity.")
@@ -649,6 +776,8 @@ class TaskManager(TaskBase):
                 # prevent excessive task saves.
                 task.job_explanation = job_explanation
                 tasks_to_update_job_explanation.append(task)
+        if self.next_state is not None and task.job_explanation == job_explanation:
+            self.next_state.needs_capacity.add(task.id)
         logger.debug("{} couldn't be scheduled on graph, waiting for next cycle".format(task.log_format))
 
     def reap_jobs_from_orphaned_instances(self):
@@ -668,6 +797,9 @@ class TaskManager(TaskBase):
         # meaning the dispatcher never got these jobs,
         # that means we have to handle notifications for those
         self.pre_start_failed = []
+        # with TASK_MANAGER_BATCH_DISPATCH, the tasks started by this run, and their messages to the dispatcher by queue
+        self.started_tasks = []
+        self.started_task_bodies = {}
 
         running_tasks = [t for t in self.all_tasks if t.status in ['waiting', 'running']]
         self.process_running_tasks(running_tasks)
@@ -677,6 +809,8 @@ class TaskManager(TaskBase):
 
         self.process_pending_tasks(pending_tasks)
         self.subsystem_metrics.inc(f"{self.prefix}_pending_processed", len(pending_tasks))
+        self.dispatch_started_tasks()
+        self.record_placement_metrics()
 
         if self.pre_start_failed:
             from awx.main.tasks.system import handle_failure_notifications
@@ -705,13 +839,24 @@ class TaskManager(TaskBase):
 
     @timeit
     def _schedule(self):
-        self.get_tasks(dict(status__in=["pending", "waiting", "running"], dependencies_processed=True))
-
-        self.after_lock_init()
+        global task_manager_state
+        if settings.TASK_MANAGER_INCREMENTAL:
+            self.after_lock_init()
+            self.get_tasks_incremental()
+        else:
+            task_manager_state = None
+            self.get_tasks(dict(status__in=["pending", "waiting", "running"], dependencies_processed=True))
+            self.after_lock_init()
         self.reap_jobs_from_orphaned_instances()
 
         if len(self.all_tasks) > 0:
             self.process_tasks()
 
+        if self.next_state is not None:
+            # if this transaction does not commit, the tasks started by this run are not waiting, which the
+            # next run sees as capacity freed up, and the tasks blocked by them see as their blocker changing
+            self.next_state.running = frozenset(t.id for t in self.all_tasks if t.status in ('waiting', 'running'))
+            task_manager_state = self.next_state
+
         for workflow_approval in self.get_expired_workflow_approvals():
             self.timeout_approval_node(workflow_approval)
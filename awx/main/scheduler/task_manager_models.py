@@ -1,5 +1,6 @@
 # Copyright (c) 2022 Ansible by Red Hat
 # All Rights Reserved.
+import heapq
 import logging
 
 from django.conf import settings
@@ -8,6 +9,7 @@ from awx.main.models import (
     Instance,
     InstanceGroup,
 )
+from awx.main.scheduler.placement import DEFAULT_PLACEMENT_POLICY, get_placement_policy_class
 
 logger = logging.getLogger('awx.main.scheduler')
 
@@ -22,11 +24,20 @@ class TaskManagerInstance:
         self.capacity = obj.capacity
         self.hostname = obj.hostname
         self.jobs_running = 0
+        # the TaskManagerInstanceGroup objects this instance is a member of, which keep running totals of it
+        self.groups = []
 
     def consume_capacity(self, impact, job_impact=False):
+        remaining = self.remaining_capacity
         self.consumed_capacity += impact
         if job_impact:
             self.jobs_running += 1
+        for group in self.groups:
+            group.instance_consumed(self, remaining, impact, job_impact)
+
+    @property
+    def is_idle(self):
+        return self.jobs_running == 0 or self.remaining_capacity == self.capacity
 
     @property
     def remaining_capacity(self):
@@ -53,6 +64,60 @@ class TaskManagerInstanceGroup:
         self.max_forks = obj.max_forks
         self.control_task_impact = kwargs.get('control_task_impact', settings.AWX_CONTROL_NODE_TASK_IMPACT)
 
+        # Running totals over the instances, and per node type heaps of (-remaining_capacity, position, instance)
+        # and (-capacity, position, instance), all kept up to date by instance_consumed as the instances consume
+        # capacity, so that placing a task does not need to look at every instance in the group.
+        # The position in the group breaks ties in favor of the instance that comes first.
+        self.instance_capacity = 0
+        self.consumed_instance_capacity = 0
+        self.remaining_instance_capacity = 0
+        self.instance_jobs_running = 0
+        self.positions = dict()
+        self.capacity_heaps = dict()
+        self.idle_heaps = dict()
+        for position, instance in enumerate(self.instances):
+            instance.groups.append(self)
+            self.positions[instance.hostname] = position
+            self.instance_capacity += instance.capacity
+            self.consumed_instance_capacity += instance.consumed_capacity
+            self.remaining_instance_capacity += instance.remaining_capacity
+            self.instance_jobs_running += instance.jobs_running
+            heapq.heappush(self.capacity_heaps.setdefault(instance.node_type, []), (-instance.remaining_capacity, position, instance))
+            if instance.capacity > 0:
+                # We don't want to select an idle instance with 0 capacity
+                heapq.heappush(self.idle_heaps.setdefault(instance.node_type, []), (-instance.capacity, position, instance))
+
+    def instance_consumed(self, instance, previous_remaining_capacity, impact, job_impact):
+        """Called by a member instance after it consumed capacity, to update the totals and heaps of the group."""
+        self.consumed_instance_capacity += impact
+        self.remaining_instance_capacity += instance.remaining_capacity - previous_remaining_capacity
+        if job_impact:
+            self.instance_jobs_running += 1
+        if instance.remaining_capacity != previous_remaining_capacity:
+            # the entry with the previous remaining capacity is stale now, and is dropped once it reaches the top
+            heapq.heappush(self.capacity_heaps[instance.node_type], (-instance.remaining_capacity, self.positions[instance.hostname], instance))
+
+    def most_remaining_capacity_instance(self, node_type):
+        """Returns (remaining_capacity, position, instance) for the instance of node_type with the most remaining capacity, or None"""
+        heap = self.capacity_heaps.get(node_type)
+        while heap and -heap[0][0] != heap[0][2].remaining_capacity:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        remaining, position, instance = heap[0]
+        return -remaining, position, instance
+
+    def largest_idle_instance(self, node_type):
+        """Returns (capacity, position, instance) for the idle instance of node_type with the most capacity, or None"""
+        heap = self.idle_heaps.get(node_type)
+        # consuming capacity never makes an instance idle again, so busy instances are dropped for good
+        while heap and not heap[0][2].is_idle:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        capacity, position, instance = heap[0]
+        return -capacity, position, instance
+
     def consume_capacity(self, task):
         """We only consume capacity on an instance group level if it is a container group. Otherwise we consume capacity on an instance level."""
         if self.is_container_group:
@@ -62,21 +127,21 @@ class TaskManagerInstanceGroup:
             raise RuntimeError("We only track capacity for container groups at the instance group level. Otherwise, consume capacity on instances.")
 
     def get_remaining_instance_capacity(self):
-        return sum(inst.remaining_capacity for inst in self.instances)
+        return self.remaining_instance_capacity
 
     def get_instance_capacity(self):
-        return sum(inst.capacity for inst in self.instances)
+        return self.instance_capacity
 
     def get_consumed_instance_capacity(self):
-        return sum(inst.consumed_capacity for inst in self.instances)
+        return self.consumed_instance_capacity
 
     def get_instance_jobs_running(self):
-        return sum(inst.jobs_running for inst in self.instances)
+        return self.instance_jobs_running
 
     def get_jobs_running(self):
         if self.is_container_group:
             return self.container_group_jobs
-        return sum(inst.jobs_running for inst in self.instances)
+        return self.instance_jobs_running
 
     def get_capacity(self):
         """This reports any type of capacity, including that of container group jobs.
@@ -170,6 +235,11 @@ class TaskManagerInstanceGroups:
         self.pk_ig_map = dict()
         self.control_task_impact = kwargs.get('control_task_impact', settings.AWX_CONTROL_NODE_TASK_IMPACT)
         self.controlplane_ig_name = kwargs.get('controlplane_ig_name', settings.DEFAULT_CONTROL_PLANE_QUEUE_NAME)
+        # instance group name -> name of its placement policy, placement policy class -> its PlacementPolicy object,
+        # and instance group name -> the PlacementPolicy object of the group
+        self.placement_policy_names = kwargs.get('placement_policies', settings.TASK_MANAGER_PLACEMENT_POLICIES)
+        self.placement_policies = dict()
+        self.instance_group_placement_policies = dict()
 
         if instance_groups is not None:  # for testing
             self.instance_groups = {ig.name: TaskManagerInstanceGroup(ig, self.task_manager_instances, **kwargs) for ig in instance_groups}
@@ -209,37 +279,43 @@ class TaskManagerInstanceGroups:
     def fit_task_to_most_remaining_capacity_instance(self, task, instance_group_name, impact=None, capacity_type=None, add_hybrid_control_cost=False):
         impact = impact if impact else task.task_impact
         capacity_type = capacity_type if capacity_type else task.capacity_type
-        instance_most_capacity = None
-        most_remaining_capacity = -1
-        instances = self.instance_groups[instance_group_name].instances
+        instance_group = self.instance_groups[instance_group_name]
+        best = None
 
-        for i in instances:
-            if i.node_type not in (capacity_type, 'hybrid'):
+        # only the instance with the most remaining capacity of each node type is a candidate
+        for node_type in dict.fromkeys((capacity_type, 'hybrid')):
+            candidate = instance_group.most_remaining_capacity_instance(node_type)
+            if candidate is None:
                 continue
-            would_be_remaining = i.remaining_capacity - impact
+            remaining, position, instance = candidate
+            would_be_remaining = remaining - impact
             # hybrid nodes _always_ control their own tasks
-            if add_hybrid_control_cost and i.node_type == 'hybrid':
+            if add_hybrid_control_cost and node_type == 'hybrid':
                 would_be_remaining -= self.control_task_impact
-            if would_be_remaining >= 0 and (instance_most_capacity is None or would_be_remaining > most_remaining_capacity):
-                instance_most_capacity = i
-                most_remaining_capacity = would_be_remaining
-        return instance_most_capacity
+            if would_be_remaining >= 0 and (best is None or (would_be_remaining, -position) > (best[0], -best[1])):
+                best = (would_be_remaining, position, instance)
+        return best[2] if best else None
 
     def find_largest_idle_instance(self, instance_group_name, capacity_type='execution'):
-        largest_instance = None
-        instances = self.instance_groups[instance_group_name].instances
-        for i in instances:
-            if i.node_type not in (capacity_type, 'hybrid'):
-                continue
-            if i.capacity <= 0:
-                # We don't want to select an idle instance with 0 capacity
-                continue
-            if (hasattr(i, 'jobs_running') and i.jobs_running == 0) or i.remaining_capacity == i.capacity:
-                if largest_instance is None:
-                    largest_instance = i
-                elif i.capacity > largest_instance.capacity:
-                    largest_instance = i
-        return largest_instance
+        instance_group = self.instance_groups[instance_group_name]
+        best = None
+        for node_type in dict.fromkeys((capacity_type, 'hybrid')):
+            candidate = instance_group.largest_idle_instance(node_type)
+            if candidate is not None and (best is None or (candidate[0], -candidate[1]) > (best[0], -best[1])):
+                best = candidate
+        return best[2] if best else None
+
+    def get_placement_policy(self, instance_group_name):
+        if instance_group_name not in self.instance_group_placement_policies:
+            policy_class = get_placement_policy_class(self.placement_policy_names.get(instance_group_name, DEFAULT_PLACEMENT_POLICY))
+            if policy_class not in self.placement_policies:
+                self.placement_policies[policy_class] = policy_class(self)
+            self.instance_group_placement_policies[instance_group_name] = self.placement_policies[policy_class]
+        return self.instance_group_placement_policies[instance_group_name]
+
+    def place_task(self, task, instance_group_name):
+        """Returns the instance to run task on in the instance group, as picked by the placement policy of the group, or None"""
+        return self.get_placement_policy(instance_group_name).place(task, instance_group_name)
 
     def get_instance_groups_from_task_cache(self, task):
         igs = []
@@ -261,9 +337,22 @@ class TaskManagerModels:
         # We want to avoid calls to settings over and over in loops, so cache this information here
         kwargs['control_task_impact'] = kwargs.get('control_task_impact', settings.AWX_CONTROL_NODE_TASK_IMPACT)
         kwargs['controlplane_ig_name'] = kwargs.get('controlplane_ig_name', settings.DEFAULT_CONTROL_PLANE_QUEUE_NAME)
+        kwargs['placement_policies'] = kwargs.get('placement_policies', settings.TASK_MANAGER_PLACEMENT_POLICIES)
         self.instances = TaskManagerInstances(**kwargs)
         self.instance_groups = TaskManagerInstanceGroups(task_manager_instances=self.instances, **kwargs)
 
+    def capacity_fingerprint(self):
+        """Changes whenever the capacity of the instances or instance groups changes, consumed capacity aside"""
+        return (
+            tuple(sorted((i.hostname, i.node_type, i.capacity) for i in self.instances.instances_by_hostname.values())),
+            tuple(
+                sorted(
+                    (ig.name, ig.is_container_group, ig.max_concurrent_jobs, ig.max_forks, tuple(sorted(ig.instance_hostnames)))
+                    for ig in self.instance_groups.instance_groups.values()
+                )
+            ),
+        )
+
     @classmethod
     def init_with_consumed_capacity(cls, **kwargs):
         tmm = cls(**kwargs)
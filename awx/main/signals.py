@@ -6,6 +6,7 @@ import contextlib
 import logging
 import threading
 import json
+import os
 import sys
 
 # Django
@@ -325,6 +326,20 @@ def update_host_last_job_after_job_deleted(sender, **kwargs):
         _update_host_last_jhs(host)
 
 
+@receiver(post_delete, sender=UnifiedJob)
+def clear_stdout_cache_after_unified_job_deleted(sender, **kwargs):
+    kwargs['instance'].clear_stdout_cache()
+
+
+@receiver(post_delete, sender=UnifiedJob)
+def delete_event_archive_after_unified_job_deleted(sender, **kwargs):
+    if not kwargs['instance'].events_archived:
+        return
+    path = kwargs['instance'].event_archive_path
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
 # Set via ActivityStreamRegistrar to record activity stream events
 
 
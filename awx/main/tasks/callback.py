@@ -11,7 +11,7 @@ from django.db import connections
 
 # AWX
 from awx.main.redact import UriCleaner
-from awx.main.constants import MINIMAL_EVENTS, ANSIBLE_RUNNER_NEEDS_UPDATE_MESSAGE
+from awx.main.constants import MINIMAL_EVENTS, BACKPRESSURE_DROPPABLE_EVENTS, ANSIBLE_RUNNER_NEEDS_UPDATE_MESSAGE
 from awx.main.utils.update_model import update_model
 from awx.main.queue import CallbackQueueDispatcher
 
@@ -89,6 +89,12 @@ class RunnerCallback:
         if event_data.get('event') == 'keepalive':
             return
 
+        # when the callback receiver falls behind, shed events that carry no output
+        pressure = self.dispatcher.backpressure()
+        if pressure and event_data.get('event') in BACKPRESSURE_DROPPABLE_EVENTS:
+            if event_data.get('stdout') == '' and event_data.get('start_line') == event_data.get('end_line'):
+                return False
+
         if event_data.get(self.event_data_key, None):
             if self.event_data_key != 'job_id':
                 event_data.pop('parent_uuid', None)
@@ -137,6 +143,8 @@ class RunnerCallback:
 
             if event_data.get('event') in MINIMAL_EVENTS:
                 should_emit = True  # always send some types like playbook_on_stats
+            elif pressure:
+                should_emit = False  # the callback receiver is behind, only send the minimal events
             elif event_data.get('stdout') == '' and event_data['start_line'] == event_data['end_line']:
                 should_emit = False  # exclude events with no output
             else:
@@ -186,6 +194,8 @@ class RunnerCallback:
         }
         event_data.setdefault(self.event_data_key, self.instance.id)
         self.dispatcher.dispatch(event_data)
+        # push any buffered events along with EOF so the receiver sees them in order
+        self.dispatcher.flush()
         if self.wrapup_event_type == 'EOF':
             self.wrapup_event_dispatched = True
 
@@ -631,6 +631,11 @@ class BaseTask(object):
             self.runner_callback.delay_update(result_traceback=traceback.format_exc())
             logger.exception('%s Exception occurred while running task', self.instance.log_format)
         finally:
+            try:
+                # finished_callback normally flushes this, but it is not called if the run errored out early
+                self.runner_callback.dispatcher.flush()
+            except Exception:
+                logger.exception('%s Failed to flush buffered events to the callback receiver', self.instance.log_format)
             logger.debug('%s finished running, producing %s events.', self.instance.log_format, self.runner_callback.event_ct)
 
         try:
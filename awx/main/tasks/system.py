@@ -821,6 +821,29 @@ def update_inventory_computed_fields(inventory_id):
         logger.debug('Exiting duplicate update_inventory_computed_fields task.')
 
 
+@task(queue=get_task_queuename)
+def job_event_stats_wrapup(job_id, event_id, pending_parents=None):
+    """
+    Apply a saved playbook_on_stats event to its job outside of the callback
+    receiver, see JOB_EVENT_ASYNC_STATS_WRAPUP and
+    JobEvent.update_job_from_stats for pending_parents.
+    """
+    from awx.main.dispatch.worker.callback import job_stats_wrapup  # circular import
+
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        logger.error(f'Job {job_id} not found, could not wrap up playbook stats')
+        return
+    event = job.get_event_queryset().filter(pk=event_id).first()
+    if event is None:
+        logger.error(f'Stats event {event_id} for job {job_id} not found, host summaries not updated')
+        job_stats_wrapup(job_id)
+        return
+    event.host_map = dict(job.inventory.hosts.values_list('name', 'id')) if job.inventory else {}
+    event.update_job_from_stats(pending_parents=pending_parents)
+    job_stats_wrapup(job_id, event=event)
+
+
 def update_smart_memberships_for_inventory(smart_inventory):
     current = set(SmartInventoryMembership.objects.filter(inventory=smart_inventory).values_list('host_id', flat=True))
     new = set(smart_inventory.hosts.values_list('id', flat=True))
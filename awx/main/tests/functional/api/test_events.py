@@ -1,7 +1,14 @@
+import base64
+import json
+
 import pytest
 
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from awx.api.pagination import EventCursorPagination
 from awx.api.versioning import reverse
-from awx.main.models import AdHocCommand, AdHocCommandEvent, JobEvent
+from awx.main.models import AdHocCommand, AdHocCommandEvent, Job, JobEvent, JobEventsChildrenSummary
 
 
 @pytest.mark.django_db
@@ -86,6 +93,15 @@ def test_job_job_events_children_summary(get, organization_factory, job_template
     assert response.data["event_processing_finished"] == True
     assert response.data["is_tree"] == True
 
+    # the summary is computed once, then served from JobEventsChildrenSummary
+    assert JobEventsChildrenSummary.objects.filter(job=job).exists()
+    job.get_event_queryset().delete()
+    job.emitted_events = 0
+    job.save()
+    response = get(url, user=objs.superusers.admin, expect=200)
+    assert response.data["children_summary"] == {1: {"rowNumber": 0, "numChildren": 4}, 2: {"rowNumber": 1, "numChildren": 2}}
+    assert response.data["meta_event_nested_uuid"] == {4: "uuid2"}
+
 
 @pytest.mark.django_db
 def test_job_job_events_children_summary_is_tree(get, organization_factory, job_template_factory):
@@ -131,3 +147,67 @@ def test_job_job_events_children_summary_is_tree(get, organization_factory, job_
     assert response.data["meta_event_nested_uuid"] == {}
     assert response.data["event_processing_finished"] == True
     assert response.data["is_tree"] == False
+
+
+@pytest.mark.django_db
+def test_job_events_cursor_pagination(get, organization_factory, job_template_factory):
+    objs = organization_factory("org", superusers=['admin'])
+    jt = job_template_factory("jt", organization=objs.organization, inventory='test_inv', project='test_proj').job_template
+    job = jt.create_unified_job()
+    for counter in range(1, 6):
+        JobEvent.create_from_data(job_id=job.pk, uuid=f'uuid{counter}', event='verbose', counter=counter, start_line=counter, job_created=job.created).save()
+
+    url = reverse('api:job_job_events_list', kwargs={'pk': job.pk}) + '?page_size=2&cursor='
+    counters = []
+    while url:
+        response = get(url, user=objs.superusers.admin, expect=200)
+        assert 'count' not in response.data
+        assert len(response.data['results']) <= 2
+        counters.extend(e['counter'] for e in response.data['results'])
+        url = response.data['next']
+    assert counters == [1, 2, 3, 4, 5]
+
+    get(reverse('api:job_job_events_list', kwargs={'pk': job.pk}) + '?cursor=garbage', user=objs.superusers.admin, expect=400)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'position',
+    [
+        {},
+        [],
+        {'job_created': None, 'job_id': 1},
+        {'job_created': None, 'job_id': 1, 'counter': 1, 'uuid': 'abc123'},
+        {'job_created': None, 'job_id': 1, 'counter': '1 OR 1=1'},
+        {'job_created': None, 'job_id': True, 'counter': 1},
+        {'job_created': None, 'job_id': None, 'counter': 1},
+        {'job_created': 'yesterday', 'job_id': 1, 'counter': 1},
+        {'job_created': '2020-13-45T00:00:00', 'job_id': 1, 'counter': 1},
+        {'job_created': 1, 'job_id': 1, 'counter': 1},
+    ],
+)
+def test_event_cursor_pagination_rejects_malformed_cursors(get, admin, position):
+    job = Job()
+    job.save()
+    cursor = base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+    get(reverse('api:job_job_events_list', kwargs={'pk': job.pk}) + f'?cursor={cursor}', user=admin, expect=400)
+
+
+@pytest.mark.django_db
+def test_event_cursor_pagination_sorts_nulls_last():
+    job = Job()
+    job.save()
+    for counter in range(1, 4):
+        JobEvent.create_from_data(job_id=job.pk, uuid=f'uuid{counter}', event='verbose', counter=counter, job_created=job.created).save()
+    # legacy events have no job_created, postgres sorts them last
+    JobEvent.objects.filter(counter=2).update(job_created=None)
+
+    paginator = EventCursorPagination()
+    counters, cursor = [], ''
+    while cursor is not None:
+        request = Request(APIRequestFactory().get('/', {'page_size': 1, 'cursor': cursor}))
+        counters.extend(e.counter for e in paginator.paginate_queryset(JobEvent.objects.filter(job=job), request))
+        cursor = paginator.encode_cursor(paginator.next_position) if paginator.next_position else None
+    assert counters == [1, 3, 2]
+    # archived events are paged in python with the same order
+    assert [e.counter for e in sorted(JobEvent.objects.filter(job=job), key=paginator.sort_key)] == [1, 3, 2]
@@ -1,15 +1,26 @@
 import pytest
+import redis
 import time
 from unittest import mock
 from uuid import uuid4
 
-from django.test import TransactionTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, DatabaseError
+from django.test import TransactionTestCase, override_settings
 
-from awx.main.dispatch.worker.callback import job_stats_wrapup, CallbackBrokerWorker
+from awx.main.dispatch.worker.callback import (
+    job_stats_wrapup,
+    copy_events,
+    CallbackBrokerWorker,
+    JobTaskStatsAggregator,
+    ParentEventPropagation,
+    WebsocketEventCoalescer,
+)
 
-from awx.main.models.jobs import Job
+from awx.main.models.jobs import Job, JobTaskStats
 from awx.main.models.inventory import InventoryUpdate, InventorySource
-from awx.main.models.events import InventoryUpdateEvent
+from awx.main.models.events import InventoryUpdateEvent, JobEvent
+from awx.main.utils.common import create_partition
 
 
 @pytest.mark.django_db
@@ -34,6 +45,119 @@ def test_wrapup_does_send_notifications(mocker):
     mock.assert_called_once_with('succeeded')
 
 
+@pytest.mark.django_db
+def test_parent_propagation_retries_unsaved_parents():
+    job = Job.objects.create(status='running')
+    propagation = ParentEventPropagation()
+    child = JobEvent(job=job, job_created=job.created, uuid='child', parent_uuid='parent', event='runner_on_ok', changed=True)
+    child.save()
+    propagation.add(child)
+    assert propagation.propagate() == 0
+
+    parent = JobEvent(job=job, job_created=job.created, uuid='parent', event='playbook_on_task_start')
+    parent.save()
+    assert propagation.propagate() == 1
+    parent = JobEvent.objects.get(job=job, uuid='parent')
+    assert parent.changed is True
+    assert parent.failed is False
+
+    # a parent is only updated once per job
+    propagation.add(child)
+    assert propagation.jobs[job.id]['pending'] == {'changed': set(), 'failed': set()}
+
+
+@pytest.mark.django_db
+def test_parent_propagation_pending_parents():
+    job = Job.objects.create(status='running')
+    propagation = ParentEventPropagation()
+    assert propagation.pending_parents(job.id) is None
+
+    events = [
+        JobEvent(job=job, job_created=job.created, uuid='task', counter=1, event='playbook_on_task_start'),
+        JobEvent(job=job, job_created=job.created, uuid='ok', parent_uuid='task', counter=2, event='runner_on_ok', changed=True),
+        JobEvent(job=job, job_created=job.created, uuid='failed', parent_uuid='unsaved', counter=3, event='runner_on_failed', failed=True),
+    ]
+    for event in events:
+        event.save()
+        propagation.add(event)
+    assert propagation.propagate() == 1
+    assert propagation.pending_parents(job.id) == {'changed': set(), 'failed': {'unsaved'}}
+
+    # a worker that missed an event of the job can not tell which parents are left
+    propagation.add(JobEvent(job=job, job_created=job.created, uuid='stats', counter=5, event='playbook_on_stats'))
+    assert propagation.pending_parents(job.id) is None
+
+
+@pytest.mark.django_db
+def test_websocket_coalescer_batches_per_job():
+    jobs = [Job.objects.create(status='running') for i in range(2)]
+    coalescer = WebsocketEventCoalescer(max_rate=1)
+    with mock.patch('awx.main.dispatch.worker.callback.emit_channel_notifications') as emit:
+        for counter in range(3):
+            for job in jobs:
+                event = JobEvent(job=job, job_created=job.created, uuid=str(uuid4()), counter=counter, event='verbose')
+                event.save()
+                coalescer.add(event)
+        assert coalescer.send() == 6
+        assert {call.args[0]: [p['counter'] for p in call.args[1]] for call in emit.call_args_list} == {f'job_events-{job.id}': [0, 1, 2] for job in jobs}
+
+        # the next batch of a job waits for the rate cap
+        emit.reset_mock()
+        coalescer.add(event)
+        assert coalescer.send() == 0
+        emit.assert_not_called()
+        coalescer.last_sent[f'job_events-{event.job_id}'] -= 1
+        assert coalescer.send() == 1
+
+
+@pytest.mark.django_db
+def test_task_stats_are_added_up_across_flushes():
+    job = Job.objects.create(status='running')
+    aggregator = JobTaskStatsAggregator()
+    task_uuid = str(uuid4())
+
+    def event(event, **kwargs):
+        return JobEvent(job=job, job_created=job.created, uuid=str(uuid4()), event=event, task='ping', **kwargs)
+
+    aggregator.add(JobEvent(job=job, job_created=job.created, uuid=task_uuid, event='playbook_on_task_start', play='all', task='ping'))
+    aggregator.add(event('runner_on_start', parent_uuid=task_uuid))
+    aggregator.add(event('runner_on_ok', parent_uuid=task_uuid, changed=True, event_data={'duration': 1.5}))
+    # events outside of a task are not counted
+    aggregator.add(event('playbook_on_stats'))
+    assert aggregator.save() == 1
+
+    aggregator.add(event('runner_on_failed', parent_uuid=task_uuid, failed=True, event_data={'duration': 2}))
+    aggregator.add(event('runner_on_failed', parent_uuid=task_uuid, event_data={'ignore_errors': True}))
+    aggregator.add(event('runner_on_skipped', parent_uuid=task_uuid))
+    assert aggregator.save() == 1
+    assert aggregator.save() == 0
+
+    stats = JobTaskStats.objects.get(job=job)
+    assert (stats.task_uuid, stats.play, stats.task) == (task_uuid, 'all', 'ping')
+    assert stats.event_counts == {'playbook_on_task_start': 1, 'runner_on_start': 1, 'runner_on_ok': 1, 'runner_on_failed': 2, 'runner_on_skipped': 1}
+    assert (stats.ok, stats.changed, stats.failed, stats.ignored, stats.skipped, stats.unreachable) == (1, 1, 1, 1, 1, 0)
+    assert stats.host_seconds == 3.5
+
+
+@pytest.mark.django_db
+def test_task_stats_are_kept_when_saving_fails():
+    job = Job.objects.create(status='running')
+    aggregator = JobTaskStatsAggregator()
+    aggregator.add(JobEvent(job=job, job_created=job.created, uuid=str(uuid4()), event='playbook_on_task_start', task='ping'))
+    with mock.patch.object(JobTaskStats.objects, 'select_for_update', side_effect=DatabaseError):
+        for _ in range(JobTaskStatsAggregator.MAX_RETRIES):
+            assert aggregator.save() == 0
+    assert aggregator.save() == 1
+    assert JobTaskStats.objects.get(job=job).event_counts == {'playbook_on_task_start': 1}
+
+    # past MAX_RETRIES the counts are dropped
+    aggregator.add(JobEvent(job=job, job_created=job.created, uuid=str(uuid4()), event='playbook_on_task_start', task='ping'))
+    with mock.patch.object(JobTaskStats.objects, 'select_for_update', side_effect=DatabaseError):
+        for _ in range(JobTaskStatsAggregator.MAX_RETRIES + 1):
+            assert aggregator.save() == 0
+    assert aggregator.tasks == {}
+
+
 class FakeRedis:
     def keys(self, *args, **kwargs):
         return []
@@ -116,6 +240,24 @@ class TestCallbackBrokerWorker(TransactionTestCase):
         assert worker.buff.get(InventoryUpdateEvent, []) == []
         assert InventoryUpdateEvent.objects.filter(uuid=events[0].uuid).count() == 0  # sanity
 
+    @override_settings(JOB_EVENT_STREAMING_PARENT_PROPAGATION=True)
+    def test_stats_wrapup_only_updates_pending_parents(self):
+        worker = self.get_worker()
+        job = Job.objects.create(status='running')
+        kwargs = dict(job_id=job.id, job_created=job.created, created=job.created)
+        events = [
+            JobEvent.create_record_from_data(uuid='task', counter=1, event='playbook_on_task_start', **kwargs),
+            JobEvent.create_record_from_data(uuid='ok', parent_uuid='task', counter=2, event='runner_on_ok', event_data={'res': {'changed': True}}, **kwargs),
+            JobEvent.create_record_from_data(uuid='stats', counter=3, event='playbook_on_stats', event_data={}, **kwargs),
+        ]
+        events[-1]._notification_trigger_event = True
+        worker.buff = {JobEvent: events}
+        with mock.patch.object(JobEvent, 'update_job_from_stats') as update_job_from_stats:
+            worker.flush(force=True)
+        # the receiver saw every event of the job, so the events of the job are not scanned again
+        update_job_from_stats.assert_called_once_with(pending_parents={'changed': set(), 'failed': set()})
+        assert JobEvent.objects.get(job=job, uuid='task').changed is True
+
     def test_flush_with_empty_buffer(self):
         worker = self.get_worker()
         worker.buff = {InventoryUpdateEvent: []}
@@ -144,3 +286,90 @@ class TestCallbackBrokerWorker(TransactionTestCase):
 
             event = InventoryUpdateEvent.objects.get(uuid=events[0].uuid)
             assert "\x00" not in event.stdout
+
+    def test_read_drains_batch(self):
+        worker = self.get_worker()
+        worker.read_batch_size = 3
+        worker.redis = mock.MagicMock()
+        worker.subsystem_metrics = mock.MagicMock()
+        worker.redis.lpop.return_value = [b'{"counter": 1}', b'not json', b'{"counter": 2}']
+        worker.redis.llen.return_value = 0
+        assert worker.read(None) == [{'counter': 1}, {'counter': 2}]
+        worker.redis.lpop.assert_called_once_with(worker.queue_name, count=3)
+        worker.redis.blpop.assert_not_called()
+
+    def test_read_blocks_when_queue_is_empty(self):
+        worker = self.get_worker()
+        worker.read_batch_size = 3
+        worker.redis = mock.MagicMock()
+        worker.subsystem_metrics = mock.MagicMock()
+        worker.redis.lpop.return_value = None
+        worker.redis.blpop.return_value = None
+        worker.redis.llen.return_value = 0
+        with mock.patch('awx.main.dispatch.worker.callback.publish_callback_receiver_load') as publish:
+            assert worker.read(None) == {'event': 'FLUSH'}
+            # the load is published even though nothing was read
+            publish.assert_called_once_with(worker.redis, worker.pid, 0, 0)
+            worker.redis.blpop.return_value = (worker.queue_name, b'{"counter": 1}')
+            assert worker.read(None) == [{'counter': 1}]
+            # and then not again until CALLBACK_RECEIVER_LOAD_INTERVAL passed
+            publish.assert_called_once()
+
+    def test_read_falls_back_to_blpop_on_old_redis(self):
+        worker = self.get_worker()
+        worker.read_batch_size = 3
+        worker.redis = mock.MagicMock()
+        worker.subsystem_metrics = mock.MagicMock()
+        worker.redis.lpop.side_effect = redis.exceptions.ResponseError("wrong number of arguments for 'lpop' command")
+        worker.redis.llen.return_value = 0
+        assert worker.read(None) == {'event': 'FLUSH'}
+        assert worker.read_batch_size == 1
+        worker.redis.blpop.return_value = (worker.queue_name, b'{"counter": 1}')
+        assert worker.read(None) == {'counter': 1}
+        worker.redis.lpop.assert_called_once()
+
+    def test_copy_failure_falls_back_to_individual_saves(self):
+        worker = self.get_worker()
+        worker.use_copy = True
+        events = [InventoryUpdateEvent(uuid=str(uuid4()), **self.event_create_kwargs())]
+        worker.buff = {InventoryUpdateEvent: events.copy()}
+        with mock.patch('awx.main.dispatch.worker.callback.copy_events', side_effect=ValueError) as copy_mock:
+            worker.flush()
+        copy_mock.assert_called_once()
+        assert InventoryUpdateEvent.objects.filter(uuid=events[0].uuid).count() == 1
+        assert worker.buff.get(InventoryUpdateEvent, []) == []
+
+    def test_copy_events(self):
+        if connection.vendor != 'postgresql':
+            pytest.skip('COPY FROM STDIN is postgres-specific')
+        kwargs = self.event_create_kwargs()
+        create_partition(InventoryUpdateEvent._meta.db_table, start=kwargs['created'])
+        events = [InventoryUpdateEvent(uuid=str(uuid4()), counter=i, stdout=f'line {i}', job_created=kwargs['created'], **kwargs) for i in range(3)]
+        copy_events(InventoryUpdateEvent, events)
+        saved = dict(InventoryUpdateEvent.objects.filter(inventory_update=kwargs['inventory_update']).values_list('id', 'stdout'))
+        assert saved == {e.id: e.stdout for e in events}
+
+        # and through a flush, without falling back to individual saves
+        worker = self.get_worker()
+        worker.use_copy = True
+        events = [InventoryUpdateEvent(uuid=str(uuid4()), counter=i, job_created=kwargs['created'], **kwargs) for i in range(3, 5)]
+        worker.buff = {InventoryUpdateEvent: events.copy()}
+        with mock.patch.object(InventoryUpdateEvent, 'save') as save_mock:
+            worker.flush()
+        save_mock.assert_not_called()
+        assert InventoryUpdateEvent.objects.filter(inventory_update=kwargs['inventory_update']).count() == 5
+
+    def test_workers_own_shards(self):
+        worker = self.get_worker()
+        with override_settings(CALLBACK_QUEUE='callback_tasks', CALLBACK_QUEUE_SHARDS=4, JOB_EVENT_WORKERS=2):
+            worker.own_shards(1, 2)
+            assert worker.queue_names == ['callback_tasks_1', 'callback_tasks_3']
+            # the first worker also drains the unsharded queue
+            worker.own_shards(0, 2)
+            assert worker.queue_names == ['callback_tasks_0', 'callback_tasks_2', 'callback_tasks']
+            with pytest.raises(ImproperlyConfigured):
+                worker.own_shards(5, 8)
+        # fewer shards than workers are raised to one shard per worker
+        with override_settings(CALLBACK_QUEUE='callback_tasks', CALLBACK_QUEUE_SHARDS=2, JOB_EVENT_WORKERS=4):
+            worker.own_shards(3, 4)
+            assert worker.queue_names == ['callback_tasks_3']
@@ -52,6 +52,34 @@ class TestEvents:
         for e in events.all():
             assert e.failed is True
 
+    @mock.patch('awx.main.models.events.emit_event_detail')
+    def test_parent_changed_streaming_missed(self, emit, settings):
+        # the callback receiver propagates while saving, but a parent it never saw must still be updated at the end
+        settings.JOB_EVENT_STREAMING_PARENT_PROPAGATION = True
+        j = Job()
+        j.save()
+        JobEvent.create_from_data(job_id=j.pk, uuid='abc123', event='playbook_on_task_start').save()
+        JobEvent.create_from_data(job_id=j.pk, parent_uuid='abc123', event='runner_on_ok', event_data={'res': {'changed': ['localhost']}}).save()
+        assert JobEvent.objects.get(uuid='abc123').changed is False
+
+        JobEvent.create_from_data(job_id=j.pk, parent_uuid='abc123', event='playbook_on_stats').save()
+        assert JobEvent.objects.get(uuid='abc123').changed is True
+
+    @mock.patch('awx.main.models.events.emit_event_detail')
+    def test_parent_changed_pending_parents(self, emit):
+        # a callback receiver that saw every event of the job passes the parents left to update instead
+        j = Job()
+        j.save()
+        for uuid in ('abc123', 'def456'):
+            JobEvent.create_from_data(job_id=j.pk, uuid=uuid, event='playbook_on_task_start').save()
+            JobEvent.create_from_data(job_id=j.pk, parent_uuid=uuid, event='runner_on_ok', event_data={'res': {'changed': ['localhost']}}).save()
+        stats = JobEvent.create_from_data(job_id=j.pk, event='playbook_on_stats', defer_stats_wrapup=True)
+        stats.save()
+
+        stats.update_job_from_stats(pending_parents={'changed': {'abc123'}, 'failed': set()})
+        assert JobEvent.objects.get(uuid='abc123').changed is True
+        assert JobEvent.objects.get(uuid='def456').changed is False
+
     def test_host_summary_generation(self):
         self._generate_hosts(100)
         self._create_job_event(ok=dict((hostname, len(hostname)) for hostname in self.hostnames))
@@ -113,6 +141,21 @@ class TestEvents:
                 assert h.last_job_id is None
                 assert h.last_job_host_summary_id is None
 
+    def test_host_summary_only_updates_summarized_hosts(self):
+        # a second stats event in the same job must not touch the hosts summarized by the first one
+        self._generate_hosts(2)
+        self._create_job_event(ok={'Host 0': 1})
+        first_summary = JobHostSummary.objects.get(host_name='Host 0')
+        Host.objects.filter(name='Host 0').update(last_job_id=None, last_job_host_summary_id=None)
+
+        self._create_job_event(ok={'Host 1': 1})
+        host0, host1 = Host.objects.get(name='Host 0'), Host.objects.get(name='Host 1')
+        assert host0.last_job_id is None
+        assert host0.last_job_host_summary_id is None
+        assert host1.last_job_id == self.job.id
+        assert host1.last_job_host_summary_id == JobHostSummary.objects.get(host_name='Host 1').id
+        assert host1.last_job_host_summary_id != first_summary.id
+
     def test_host_metrics_insert(self):
         self._generate_hosts(10)
 
@@ -4,11 +4,13 @@ import json
 from datetime import timedelta
 
 from awx.main.scheduler import TaskManager, DependencyManager, WorkflowManager
+from awx.main.scheduler import task_manager as task_manager_module
 from awx.main.utils import encrypt_field
 from awx.main.models import WorkflowJobTemplate, JobTemplate, Job
 from awx.main.models.ha import Instance
 from . import create_job
 from django.conf import settings
+from django.test import override_settings
 
 
 @pytest.mark.django_db
@@ -212,6 +214,41 @@ def test_single_jt_multi_job_launch_blocks_last(job_template_factory):
     assert j2.status == "waiting"
 
 
+@pytest.mark.django_db
+def test_incremental_task_manager_skips_blocked_job(job_template_factory, mocker):
+    objects = job_template_factory('jt', organization='org1', project='proj', inventory='inv', credential='cred')
+    j1 = create_job(objects.job_template)
+    j2 = create_job(objects.job_template)
+    # the job explanation of blocked jobs is only saved once they are older than 30 seconds
+    Job.objects.filter(pk=j2.pk).update(created=j2.created - timedelta(minutes=1))
+    mocker.patch('awx.main.scheduler.task_manager.task_manager_state', None)
+
+    def loaded_tasks():
+        tm = TaskManager()
+        with mock.patch.object(tm, 'get_tasks', wraps=tm.get_tasks) as get_tasks:
+            tm.schedule()
+        return set(get_tasks.call_args.args[0]['id__in'])
+
+    with override_settings(TASK_MANAGER_INCREMENTAL=True):
+        assert loaded_tasks() == {j1.pk, j2.pk}
+        j1.refresh_from_db()
+        j2.refresh_from_db()
+        assert j1.status == "waiting"
+        assert j2.status == "pending"
+        assert j2.job_explanation == f"waiting for job-{j1.pk} to finish"
+        # j2 is woken up only by a change of j1
+        assert task_manager_module.task_manager_state.blockers == {j1.pk: ('waiting', {j2.pk})}
+
+        # nothing changed for j2, so it is not even loaded
+        assert loaded_tasks() == {j1.pk}
+
+        j1.status = "successful"
+        j1.save()
+        assert loaded_tasks() == {j2.pk}
+        j2.refresh_from_db()
+        assert j2.status == "waiting"
+
+
 @pytest.mark.django_db
 def test_single_jt_multi_job_launch_allow_simul_allowed(job_template_factory):
     objects = job_template_factory('jt', organization='org1', project='proj', inventory='inv', credential='cred')
@@ -227,6 +264,61 @@ def test_single_jt_multi_job_launch_allow_simul_allowed(job_template_factory):
     assert j2.status == "waiting"
 
 
+@pytest.mark.django_db
+def test_batch_dispatch_saves_and_publishes_together(job_template_factory, mocker):
+    objects = job_template_factory('jt', organization='org1', project='proj', inventory='inv', credential='cred')
+    jt = objects.job_template
+    jt.allow_simultaneous = True
+    jt.save()
+    jobs = [create_job(jt) for i in range(3)]
+    publish_batch = mocker.patch('awx.main.scheduler.task_manager.publish_batch')
+    with override_settings(TASK_MANAGER_BATCH_DISPATCH=True):
+        TaskManager().schedule()
+    for job in jobs:
+        job.refresh_from_db()
+        assert job.status == "waiting"
+        assert job.celery_task_id and job.controller_node and job.execution_node
+    # one call per queue, with the message of every job started
+    publish_batch.assert_called_once()
+    queue, bodies = publish_batch.call_args.args
+    assert queue == jobs[0].get_queue_name()
+    assert [(body['args'], body['uuid']) for body in bodies] == [([job.pk], job.celery_task_id) for job in jobs]
+
+
+@pytest.mark.django_db
+def test_unbatched_dispatch_starts_each_job(hybrid_instance, job_template_factory, mocker):
+    objects = job_template_factory('jt', organization='org1', project='proj', inventory='inv', credential='cred')
+    j = create_job(objects.job_template)
+    publish_batch = mocker.patch('awx.main.scheduler.task_manager.publish_batch')
+    with override_settings(TASK_MANAGER_BATCH_DISPATCH=False):
+        with mock.patch('awx.main.tasks.jobs.RunJob.apply_async') as apply_async:
+            TaskManager().schedule()
+    j.refresh_from_db()
+    assert j.status == "waiting"
+    apply_async.assert_called_once()
+    assert apply_async.call_args.args[0] == [j.pk]
+    assert apply_async.call_args.kwargs == dict(queue=j.get_queue_name(), uuid=j.celery_task_id)
+    publish_batch.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_dispatch', [True, False])
+def test_pre_start_failure_emits_status(hybrid_instance, job_template_factory, mocker, batch_dispatch):
+    objects = job_template_factory('jt', organization='org1', project='proj', inventory='inv', credential='cred')
+    j = create_job(objects.job_template)
+    mocker.patch('awx.main.models.Job.pre_start', return_value=(False, None))
+    mocker.patch('awx.main.tasks.system.handle_failure_notifications')
+    publish_batch = mocker.patch('awx.main.scheduler.task_manager.publish_batch')
+    with override_settings(TASK_MANAGER_BATCH_DISPATCH=batch_dispatch):
+        with mock.patch('awx.main.models.unified_jobs.UnifiedJob.websocket_emit_status') as emit_status:
+            TaskManager().schedule()
+    j.refresh_from_db()
+    assert j.status == "failed"
+    assert 'Task failed pre-start check.' in j.job_explanation
+    emit_status.assert_called_once_with('failed')
+    publish_batch.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_multi_jt_capacity_blocking(hybrid_instance, job_template_factory, mocker):
     instance = hybrid_instance
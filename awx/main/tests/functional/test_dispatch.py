@@ -1,4 +1,5 @@
 import datetime
+import json
 import multiprocessing
 import random
 import signal
@@ -12,7 +13,7 @@ import pytest
 from awx.main.models import Job, WorkflowJob, Instance
 from awx.main.dispatch import reaper
 from awx.main.dispatch.pool import StatefulPoolWorker, WorkerPool, AutoscalePool
-from awx.main.dispatch.publish import task
+from awx.main.dispatch.publish import task, publish_batch
 from awx.main.dispatch.worker import BaseWorker, TaskWorker
 from awx.main.dispatch.periodic import Scheduler
 
@@ -337,6 +338,13 @@ class TestTaskPublisher:
         message, queue = add.apply_async([2, 2], queue=lambda: 'called')
         assert queue == 'called'
 
+    def test_publish_batch(self):
+        bodies = [add.get_async_body([i, i]) for i in range(100)]
+        payloads = publish_batch('foobar', bodies)
+        assert len(payloads) > 1
+        assert all(len(payload) < 8000 for payload in payloads)
+        assert [body for payload in payloads for body in json.loads(payload)] == bodies
+
 
 yesterday = tz_now() - datetime.timedelta(days=1)
 minute = tz_now() - datetime.timedelta(seconds=120)
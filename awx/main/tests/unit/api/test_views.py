@@ -6,7 +6,7 @@ from unittest import mock
 from collections import namedtuple
 
 from awx.api.views.root import ApiVersionRootView
-from awx.api.views import JobTemplateLabelList, InventoryInventorySourcesUpdate, JobTemplateSurveySpec
+from awx.api.views import JobTemplateLabelList, InventoryInventorySourcesUpdate, JobTemplateSurveySpec, filter_stdout
 
 from awx.main.views import handle_error
 
@@ -317,3 +317,10 @@ class TestSurveySpecValidation:
         spec = self.spec_from_element({'type': _type, 'default': ''})
         r = JobTemplateSurveySpec._validate_spec_data(spec, {})
         assert r is None
+
+
+def test_filter_stdout_splits_on_newlines_only():
+    seen = []
+    chunks = ['progress 1\rprogress 2\r\n', 'done\x0b\n']
+    assert list(filter_stdout(chunks, [lambda line: seen.append(line) or line.upper()])) == ['PROGRESS 1\rPROGRESS 2\r\n', 'DONE\x0b\n']
+    assert seen == ['progress 1\rprogress 2\r\n', 'done\x0b\n']
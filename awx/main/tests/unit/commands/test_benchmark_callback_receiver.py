@@ -0,0 +1,28 @@
+from awx.main.management.commands.benchmark_callback_receiver import SyntheticPlaybook, percentile
+
+
+def test_synthetic_playbook_shape():
+    events = list(SyntheticPlaybook(hosts=3, tasks=2, verbose=1, changed=1.0))
+    # playbook and play start, then per task: task start, verbose, and a start and result per host, then stats
+    assert len(events) == 2 + 2 * (1 + 1 + 3 * 2) + 1
+    assert [e['counter'] for e in events] == list(range(1, len(events) + 1))
+    assert events[-1]['event'] == 'playbook_on_stats'
+    assert events[-1]['event_data']['changed'] == {'benchmark-host-0': 2, 'benchmark-host-1': 2, 'benchmark-host-2': 2}
+
+    uuids = {e['uuid']: e for e in events}
+    for e in events:
+        if e['event'] == 'runner_on_ok':
+            assert uuids[e['parent_uuid']]['event'] == 'playbook_on_task_start'
+    for prev, e in zip(events, events[1:]):
+        assert e['start_line'] == prev['end_line']
+
+
+def test_synthetic_playbook_stdout_size():
+    events = list(SyntheticPlaybook(hosts=1, tasks=1, stdout_bytes=512))
+    assert len(events[-2]['stdout']) == 512
+
+
+def test_percentile():
+    assert percentile([], 50) == 0
+    assert percentile(list(range(101)), 50) == 50
+    assert percentile(list(range(101)), 99) == 99
@@ -3,6 +3,7 @@ from datetime import timezone
 import pytest
 
 from awx.main.models import JobEvent, ProjectUpdateEvent, AdHocCommandEvent, InventoryUpdateEvent, SystemJobEvent
+from awx.main.models.events import EventRecord
 
 
 @pytest.mark.parametrize(
@@ -41,3 +42,42 @@ def test_playbook_event_strip_invalid_keys(job_identifier, cls):
 def test_really_long_event_fields(field):
     event = JobEvent.create_from_data(**{'job_id': 123, 'event_data': {field: 'X' * 4096}})
     assert event.event_data[field] == 'X' * 1023 + '…'
+
+
+@pytest.mark.parametrize(
+    'event, event_data',
+    [
+        ['runner_on_ok', {'res': {'changed': True}, 'play': ' a play ', 'task': 'a task', 'role': 'a role'}],
+        ['runner_on_failed', {'res': {}, 'playbook': 'site.yml'}],
+        ['runner_on_failed', {'ignore_errors': True}],
+        ['verbose', {}],
+    ],
+)
+def test_event_record_matches_model(event, event_data):
+    kwargs = {'job_id': 123, 'event': event, 'event_data': event_data, 'created': datetime(2018, 1, 1).isoformat(), 'uuid': 'abc'}
+    model = JobEvent.create_from_data(**dict(kwargs, event_data=dict(event_data)))
+    record = JobEvent.create_record_from_data(**dict(kwargs, event_data=dict(event_data)))
+    assert isinstance(record, EventRecord)
+    for field in ('failed', 'changed', 'playbook', 'play', 'task', 'role', 'created', 'uuid', 'job_id', 'event_level'):
+        assert getattr(record, field) == getattr(model, field)
+
+    materialized = record.to_model()
+    assert isinstance(materialized, JobEvent)
+    for field in ('failed', 'changed', 'play', 'event_data', 'created', 'uuid', 'job_id'):
+        assert getattr(materialized, field) == getattr(model, field)
+
+
+@pytest.mark.parametrize('defer', [True, False])
+def test_stats_event_is_not_a_record(mocker, settings, defer):
+    settings.JOB_EVENT_ASYNC_STATS_WRAPUP = defer
+    create = mocker.patch.object(JobEvent, 'create_from_data')
+    JobEvent.create_record_from_data(job_id=123, event='playbook_on_stats')
+    create.assert_called_once_with(defer_stats_wrapup=defer, job_id=123, event='playbook_on_stats')
+
+
+@pytest.mark.parametrize('defer', [True, False])
+def test_stats_wrapup_can_be_deferred(mocker, defer):
+    update = mocker.patch.object(JobEvent, 'update_job_from_stats')
+    event = JobEvent.create_from_data(defer_stats_wrapup=defer, job_id=123, event='playbook_on_stats', event_data={'ok': {'localhost': 1}})
+    assert getattr(event, '_deferred_stats_wrapup', False) is defer
+    assert update.called is not defer
@@ -221,3 +221,46 @@ class TestSelectBestInstanceForTask(object):
             assert tm_models.instance_groups.find_largest_idle_instance('controlplane') is None, reason
         else:
             assert tm_models.instance_groups.find_largest_idle_instance('controlplane').hostname == instances[instance_fit_index].hostname, reason
+
+    def test_placement_follows_consumed_capacity(self, sample_cluster, create_ig_manager):
+        default, ig_large, ig_small = sample_cluster()
+        instance_groups_mgr = create_ig_manager([default, ig_large, ig_small], [])
+        task = Job(task_impact=150)
+
+        # i2 is in both default and ig_large, capacity it consumes for one group counts for the other
+        assert instance_groups_mgr.fit_task_to_most_remaining_capacity_instance(task, 'default').hostname == 'i2'
+        instance_groups_mgr.task_manager_instances['i2'].consume_capacity(task.task_impact, job_impact=True)
+        assert instance_groups_mgr.fit_task_to_most_remaining_capacity_instance(task, 'ig_large').hostname == 'i3'
+        assert instance_groups_mgr.find_largest_idle_instance('ig_large').hostname == 'i3'
+        assert instance_groups_mgr.fit_task_to_most_remaining_capacity_instance(task, 'default') is None
+        assert instance_groups_mgr.find_largest_idle_instance('default') is None
+        assert instance_groups_mgr.get_consumed_capacity('ig_large') == 150
+        assert instance_groups_mgr.get_remaining_capacity('ig_large') == 250
+        assert instance_groups_mgr.get_jobs_running('default') == 1
+
+
+@pytest.mark.parametrize(
+    'policy,instance_fit_index',
+    [
+        ('most_remaining_capacity', 0),
+        ('best_fit', 1),
+        ('spread', 2),
+        ('project_affinity', 0),  # no project, so the most remaining capacity
+        ('no.such.policy', 0),
+    ],
+)
+def test_placement_policies(policy, instance_fit_index):
+    ig = InstanceGroup(id=10, name='controlplane')
+    instances = Is([(1, 200), (1, 100), (0, 100)])
+    tasks = []
+    for instance in instances:
+        ig.instances.add(instance)
+        for _ in range(instance.jobs_running):
+            tasks.append(Job(execution_node=instance.hostname, controller_node=instance.hostname, instance_group=ig))
+    tm_models = TaskManagerModels.init_with_consumed_capacity(
+        tasks=tasks, instances=instances, instance_groups=[ig], control_task_impact=0, placement_policies={'controlplane': policy}
+    )
+
+    instance_picked = tm_models.instance_groups.place_task(Job(task_impact=43), 'controlplane')
+    assert instance_picked.hostname == instances[instance_fit_index].hostname
+    assert tm_models.instance_groups.get_placement_policy('controlplane').placed == 1
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+import pytest
+
+from awx.main.consumers import ChannelNotificationPublisher, emit_channel_notification
+
+
+class FakeChannelLayer:
+    def __init__(self):
+        self.sent = []
+        self.stalled = threading.Event()
+        self.stalled.set()
+
+    async def group_send(self, group, message):
+        while not self.stalled.is_set():
+            await asyncio.sleep(0.01)
+        if group == 'broken':
+            raise ConnectionError()
+        self.sent.append((group, message))
+
+
+def test_publisher_sends_in_order_from_one_loop():
+    layer = FakeChannelLayer()
+    with mock.patch('awx.main.consumers.get_channel_layer', return_value=layer):
+        publisher = ChannelNotificationPublisher()
+        with mock.patch('awx.main.consumers.get_channel_notification_publisher', return_value=publisher):
+            for i in range(10):
+                emit_channel_notification('jobs-status_changed', {'unified_job_id': i})
+                # a failed send does not stop the publisher
+                emit_channel_notification('broken', {})
+        publisher.close()
+    assert [group for group, message in layer.sent] == ['jobs-status_changed'] * 10
+    assert [json.loads(message['text'])['unified_job_id'] for group, message in layer.sent] == list(range(10))
+    assert all(message['type'] == 'internal.message' and message['needs_relay'] for group, message in layer.sent)
+
+
+def test_publisher_reports_failed_sends():
+    layer = FakeChannelLayer()
+    with mock.patch('awx.main.consumers.get_channel_layer', return_value=layer):
+        publisher = ChannelNotificationPublisher(maxsize=10)
+        with mock.patch('awx.main.consumers.get_channel_notification_publisher', return_value=publisher):
+            assert emit_channel_notification('jobs-status_changed', {}).result(5) is None
+            with pytest.raises(ConnectionError):
+                emit_channel_notification('broken', {}).result(5)
+        publisher.close()
+
+
+def test_publisher_queue_is_bounded():
+    layer = FakeChannelLayer()
+    layer.stalled.clear()
+    with mock.patch('awx.main.consumers.get_channel_layer', return_value=layer):
+        publisher = ChannelNotificationPublisher(maxsize=2, put_timeout=0.1)
+        publisher.send('jobs-status_changed', {})
+        publisher.send('jobs-status_changed', {})
+        with pytest.raises(ConnectionError):
+            publisher.send('jobs-status_changed', {})
+        layer.stalled.set()
+        publisher.close()
+    assert len(layer.sent) == 2
+
+
+def test_publisher_close_in_forked_process():
+    layer = FakeChannelLayer()
+    with mock.patch('awx.main.consumers.get_channel_layer', return_value=layer):
+        publisher = ChannelNotificationPublisher()
+        with mock.patch('awx.main.consumers.os.getpid', return_value=publisher.pid + 1):
+            # the loop thread does not exist after a fork, so there is nothing to wait for
+            publisher.close()
+        assert publisher.thread.is_alive()
+        publisher.close()
+    assert not publisher.thread.is_alive()
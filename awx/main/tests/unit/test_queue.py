@@ -0,0 +1,206 @@
+import json
+import time
+from unittest import mock
+
+import pytest
+import redis
+
+from awx.main.queue import (
+    CallbackQueueDispatcher,
+    BACKPRESSURE_NONE,
+    BACKPRESSURE_SOFT,
+    BACKPRESSURE_HARD,
+    CALLBACK_RECEIVER_LOAD_KEY,
+    CALLBACK_RECEIVER_LOAD_PRUNE_AGE,
+    callback_queue_names,
+    decode_callback_event,
+    encode_callback_event,
+    publish_callback_receiver_load,
+)
+
+
+@pytest.fixture
+def dispatcher(settings):
+    settings.CALLBACK_QUEUE = 'callback_tasks'
+    with mock.patch('awx.main.queue.redis.Redis.from_url'):
+        yield CallbackQueueDispatcher()
+
+
+def pushed(dispatcher):
+    messages = []
+    for call in dispatcher.connection.rpush.call_args_list:
+        assert call.args[0] == 'callback_tasks'
+        messages.extend(json.loads(m) for m in call.args[1:])
+    return messages
+
+
+def test_unbatched_dispatch_pushes_each_event(dispatcher):
+    for i in range(3):
+        dispatcher.dispatch({'counter': i})
+    assert dispatcher.connection.rpush.call_count == 3
+    assert [m['counter'] for m in pushed(dispatcher)] == [0, 1, 2]
+
+
+def test_batched_dispatch_pushes_full_batches_in_order(dispatcher):
+    dispatcher.batch_size = 3
+    dispatcher.batch_max_delay = 60
+    for i in range(7):
+        dispatcher.dispatch({'counter': i})
+    assert dispatcher.connection.rpush.call_count == 2
+    assert dispatcher.buffer == [('callback_tasks', json.dumps({'counter': 6}))]
+
+    dispatcher.flush()
+    assert dispatcher.connection.rpush.call_count == 3
+    assert [m['counter'] for m in pushed(dispatcher)] == list(range(7))
+
+
+def test_batched_dispatch_respects_max_delay(dispatcher):
+    dispatcher.batch_size = 100
+    dispatcher.batch_max_delay = 0.01
+    dispatcher.dispatch({'counter': 1})
+    time.sleep(0.2)
+    assert [m['counter'] for m in pushed(dispatcher)] == [1]
+    assert dispatcher.buffer == []
+
+
+def test_batched_dispatch_retries_after_redis_error(dispatcher):
+    dispatcher.batch_size = 100
+    dispatcher.batch_max_delay = 0.01
+    dispatcher.connection.rpush.side_effect = [redis.exceptions.ConnectionError(), 1]
+    dispatcher.dispatch({'counter': 1})
+    # the timed flush fails, the events are kept and pushed by the next timed flush
+    time.sleep(0.2)
+    assert dispatcher.connection.rpush.call_count == 2
+    assert [m['counter'] for m in pushed(dispatcher)] == [1, 1]
+    assert dispatcher.buffer == []
+
+
+def test_sharded_dispatch_routes_by_job(settings):
+    settings.CALLBACK_QUEUE = 'callback_tasks'
+    settings.CALLBACK_QUEUE_SHARDS = 4
+    with mock.patch('awx.main.queue.redis.Redis.from_url'):
+        dispatcher = CallbackQueueDispatcher()
+    dispatcher.dispatch({'job_id': 6, 'counter': 1})
+    dispatcher.dispatch({'project_update_id': 9, 'counter': 1})
+    assert [call.args[0] for call in dispatcher.connection.rpush.call_args_list] == ['callback_tasks_2', 'callback_tasks_1']
+
+
+def test_sharded_batch_is_pipelined_per_shard(settings):
+    settings.CALLBACK_QUEUE = 'callback_tasks'
+    settings.CALLBACK_QUEUE_SHARDS = 2
+    settings.JOB_EVENT_WORKERS = 2
+    with mock.patch('awx.main.queue.redis.Redis.from_url'):
+        dispatcher = CallbackQueueDispatcher()
+    dispatcher.batch_size = 100
+    dispatcher.batch_max_delay = 60
+    for i in range(4):
+        dispatcher.dispatch({'job_id': i})
+    dispatcher.flush()
+    pipe = dispatcher.connection.pipeline.return_value
+    assert [call.args[0] for call in pipe.rpush.call_args_list] == ['callback_tasks_0', 'callback_tasks_1']
+    assert [len(call.args) for call in pipe.rpush.call_args_list] == [3, 3]
+    pipe.execute.assert_called_once()
+
+
+def test_fewer_shards_than_workers(settings):
+    settings.CALLBACK_QUEUE = 'callback_tasks'
+    settings.CALLBACK_QUEUE_SHARDS = 2
+    settings.JOB_EVENT_WORKERS = 3
+    assert callback_queue_names() == ['callback_tasks_0', 'callback_tasks_1', 'callback_tasks_2']
+
+
+@pytest.mark.parametrize(
+    'depth, lag, expected',
+    [
+        (10, 0, BACKPRESSURE_NONE),
+        (100, 0, BACKPRESSURE_SOFT),
+        (10, 30, BACKPRESSURE_SOFT),
+        (1000, 0, BACKPRESSURE_HARD),
+    ],
+)
+def test_backpressure_levels(dispatcher, settings, depth, lag, expected):
+    settings.CALLBACK_BACKPRESSURE_SOFT_QUEUE_DEPTH = 100
+    settings.CALLBACK_BACKPRESSURE_SOFT_LAG = 30
+    settings.CALLBACK_BACKPRESSURE_HARD_QUEUE_DEPTH = 1000
+    settings.CALLBACK_BACKPRESSURE_MAX_BLOCK = 0
+    dispatcher.connection.hgetall.return_value = {
+        b'1': json.dumps({'depth': depth, 'lag': lag, 'time': time.time()}),
+        b'2': json.dumps({'depth': 100000, 'lag': 100000, 'time': time.time() - 600}),  # stale
+    }
+    assert dispatcher.backpressure() == expected
+
+
+@pytest.mark.parametrize('hard_depth, expected', [(1000, BACKPRESSURE_HARD), (0, BACKPRESSURE_SOFT)])
+def test_backpressure_when_receiver_stopped_publishing(dispatcher, settings, hard_depth, expected):
+    settings.CALLBACK_BACKPRESSURE_SOFT_QUEUE_DEPTH = 100
+    settings.CALLBACK_BACKPRESSURE_HARD_QUEUE_DEPTH = hard_depth
+    settings.CALLBACK_BACKPRESSURE_MAX_BLOCK = 0
+    dispatcher.connection.hgetall.return_value = {b'1': json.dumps({'depth': 0, 'lag': 0, 'time': time.time() - 600})}
+    assert dispatcher.backpressure() == expected
+
+
+def test_publish_load_prunes_stopped_workers():
+    connection = mock.MagicMock()
+    pipe = connection.pipeline.return_value
+    connection.hgetall.return_value = {
+        b'1': json.dumps({'depth': 0, 'lag': 0, 'time': time.time() - 600}),
+        b'2': json.dumps({'depth': 0, 'lag': 0, 'time': time.time() - CALLBACK_RECEIVER_LOAD_PRUNE_AGE - 1}),
+    }
+    publish_callback_receiver_load(connection, 3, 10, 1.5)
+    pipe.hdel.assert_called_once_with(CALLBACK_RECEIVER_LOAD_KEY, b'2')
+    key, worker, load = pipe.hset.call_args.args
+    assert (key, worker) == (CALLBACK_RECEIVER_LOAD_KEY, '3')
+    assert json.loads(load)['depth'] == 10
+    pipe.expire.assert_called_once_with(CALLBACK_RECEIVER_LOAD_KEY, CALLBACK_RECEIVER_LOAD_PRUNE_AGE)
+    pipe.execute.assert_called_once()
+
+
+def test_backpressure_disabled(dispatcher):
+    assert dispatcher.backpressure() == BACKPRESSURE_NONE
+    dispatcher.connection.hgetall.assert_not_called()
+
+
+class Vault:
+    yaml_tag = '!vault'
+    data = '$ANSIBLE_VAULT;1.1;AES256'
+
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack', 'msgpack+zstd'])
+def test_callback_event_codecs_round_trip(codec):
+    event = {'event': 'runner_on_ok', 'counter': 1, 'event_data': {'res': {'secret': Vault(), 'changed': True}, 'task': 'オ'}}
+    decoded = decode_callback_event(encode_callback_event(event, codec=codec))
+    assert decoded == {'event': 'runner_on_ok', 'counter': 1, 'event_data': {'res': {'secret': Vault.data, 'changed': True}, 'task': 'オ'}}
+
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack', 'msgpack+zstd'])
+def test_callback_event_codecs_non_str_keys(codec):
+    event = {'event': 'runner_on_ok', 'event_data': {'res': {'results': {0: 'zero', 1.5: 'float'}}}}
+    decoded = decode_callback_event(encode_callback_event(event, codec=codec, compression_threshold=1))
+    # once saved as JSON, the event is the same whatever the codec
+    assert json.loads(json.dumps(decoded)) == {'event': 'runner_on_ok', 'event_data': {'res': {'results': {'0': 'zero', '1.5': 'float'}}}}
+
+
+def test_large_events_are_compressed():
+    event = {'event': 'runner_on_ok', 'stdout': 'x' * 10000}
+    small = encode_callback_event(event, codec='msgpack', compression_threshold=0)
+    compressed = encode_callback_event(event, codec='msgpack', compression_threshold=4096)
+    assert small[:1] == b'\x01'
+    assert compressed[:1] == b'\x02'
+    assert len(compressed) < len(small)
+    assert decode_callback_event(compressed) == event
+
+
+def test_decode_legacy_json_message():
+    assert decode_callback_event(b'{"event": "verbose"}') == {'event': 'verbose'}
+
+
+@pytest.mark.parametrize('message', [b'{"event"', b'\x01\xc1', b'\x02not zstd'])
+def test_decode_malformed_message(message):
+    with pytest.raises(ValueError):
+        decode_callback_event(message)
+
+
+def test_dispatch_with_msgpack(dispatcher):
+    dispatcher.codec = 'msgpack'
+    dispatcher.dispatch({'counter': 1})
+    assert decode_callback_event(dispatcher.connection.rpush.call_args.args[1]) == {'counter': 1}
@@ -20,6 +20,7 @@ import tempfile
 import functools
 
 # Django
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, FieldDoesNotExist
 from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
@@ -1157,6 +1158,14 @@ def create_partition(tblname, start=None):
                     f'FOR VALUES FROM (\'{start_timestamp}\') TO (\'{end_timestamp}\');'
                 )
 
+                if settings.JOB_EVENT_STDOUT_TRIGRAM_INDEX:
+                    cursor.execute("SELECT EXISTS (SELECT FROM pg_extension WHERE extname = 'pg_trgm');")
+                    if cursor.fetchone()[0]:
+                        # matches the UPPER(stdout::text) LIKE UPPER(...) of icontains lookups
+                        cursor.execute(
+                            f'CREATE INDEX IF NOT EXISTS {tblname}_{partition_label}_stdout_trgm ON {tblname}_{partition_label} USING gin (UPPER(stdout) gin_trgm_ops);'
+                        )
+
     except (ProgrammingError, IntegrityError) as e:
         cause = e.__cause__
         if cause and hasattr(cause, 'sqlstate'):
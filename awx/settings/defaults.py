@@ -201,6 +201,33 @@ CONTROL_PLANE_EXECUTION_ENVIRONMENT = 'quay.io/ansible/awx-ee:latest'
 # Note: This setting may be overridden by database settings.
 STDOUT_MAX_BYTES_DISPLAY = 1048576
 
+# How long, in seconds, the line index used to serve stdout line ranges of a
+# finished job is cached
+STDOUT_LINE_INDEX_CACHE_TIMEOUT = 3600
+
+# How long, in seconds, stdout rendered by the stdout endpoints is cached for
+# finished jobs; 0 disables the cache
+STDOUT_CACHE_TIMEOUT = 86400
+
+# Rendered stdout larger than this many bytes, once compressed, is not cached
+STDOUT_CACHE_MAX_BYTES = 4194304
+
+# Index the stdout of job events with a trigram index on each new event
+# partition, when the pg_trgm extension is available; serves the stdout search
+# endpoints and stdout__icontains event filters, but every event insert then
+# pays for the GIN index maintenance, so it is off by default
+JOB_EVENT_STDOUT_TRIGRAM_INDEX = False
+
+# The most matches returned by a single stdout search request
+STDOUT_SEARCH_MAX_MATCHES = 1000
+
+# Directory the events of finished jobs are moved to, as zstd compressed JSON
+# lines files, by the archive_job_events management command; archived events
+# are still served by the stdout and event list endpoints.  Archived events are
+# deleted from the database, so this must be storage shared by every web and
+# control node, mounted at the same path on each.  Archiving is off when empty.
+JOB_EVENT_ARCHIVE_ROOT = ''
+
 # Returned in the header on event api lists as a recommendation to the UI
 # on how many events to display before truncating/hiding
 MAX_UI_JOB_EVENTS = 4000
@@ -229,6 +256,43 @@ JOB_EVENT_WORKERS = 4
 # writes in memory before flushing via JobEvent.objects.bulk_create()
 JOB_EVENT_BUFFER_SECONDS = 1
 
+# The maximum number of events a callback receiver worker pops from redis in a
+# single round trip; 1 reads events one at a time with BLPOP.  Values above 1
+# use LPOP with a count, which needs redis 6.2 or later; with an older redis the
+# workers log a warning and go back to BLPOP
+JOB_EVENT_READ_BATCH_SIZE = 1
+
+# Persist job events in the callback receiver with PostgreSQL COPY FROM STDIN
+# instead of a multi-row INSERT; batches that fail to COPY are retried row by row
+JOB_EVENT_BULK_COPY = False
+
+# Create host summaries and propagate changed/failed to parent events for a
+# playbook_on_stats event in a dispatcher task instead of in the callback
+# receiver, so that large wrap-ups do not stall event ingestion
+JOB_EVENT_ASYNC_STATS_WRAPUP = False
+
+# Propagate changed/failed from job events to their parent events in the
+# callback receiver as events are saved, rather than by scanning all of the
+# events of a job when it finishes
+JOB_EVENT_STREAMING_PARENT_PROPAGATION = False
+
+# How long, in seconds, the callback receiver keeps retrying the parents of a
+# job that has stopped sending events before giving up on them
+JOB_EVENT_PARENT_PROPAGATION_TIMEOUT = 600
+
+# Keep per-task statistics of each job (see /api/v2/jobs/N/task_stats/)
+# up to date in the callback receiver as the events of the job are saved
+JOB_EVENT_TASK_STATS = False
+
+# Send the websocket messages of the events of a job saved by one callback
+# receiver flush as a single channel layer message; websocket clients that
+# subscribe with "coalesce": true receive them as a single frame
+JOB_EVENT_WEBSOCKET_COALESCE = False
+
+# With JOB_EVENT_WEBSOCKET_COALESCE, the most batches sent per second for the
+# events of a job; 0 for no limit
+JOB_EVENT_WEBSOCKET_MAX_BATCHES_PER_SECOND = 4
+
 # The interval at which callback receiver statistics should be
 # recorded
 JOB_EVENT_STATISTICS_INTERVAL = 5
@@ -264,6 +328,29 @@ TASK_MANAGER_TIMEOUT = 300
 TASK_MANAGER_TIMEOUT_GRACE_PERIOD = 60
 TASK_MANAGER_LOCK_TIMEOUT = TASK_MANAGER_TIMEOUT + TASK_MANAGER_TIMEOUT_GRACE_PERIOD
 
+# Keep what the task manager learned about the pending tasks it could not
+# start, and only look at them again once the task blocking them or the
+# available capacity changes
+TASK_MANAGER_INCREMENTAL = False
+
+# With TASK_MANAGER_INCREMENTAL, how often, in seconds, the task manager
+# looks at every pending task regardless
+TASK_MANAGER_RECONCILE_INTERVAL = 300
+
+# Save the tasks started by a task manager run with one query, and publish
+# them to each dispatcher queue in as few messages as possible, instead of
+# one save and one message per task; every dispatcher must be able to read
+# batched messages before this is enabled
+TASK_MANAGER_BATCH_DISPATCH = False
+
+# How the task manager picks the instance of each instance group to run a
+# task on, by instance group name.  Either a built-in policy, one of
+# most_remaining_capacity (the default), best_fit, spread and
+# project_affinity, or the import path of an
+# awx.main.scheduler.placement.PlacementPolicy subclass, e.g.
+# {'default': 'spread', 'big_nodes': 'best_fit'}
+TASK_MANAGER_PLACEMENT_POLICIES = {}
+
 # Number of seconds _in addition to_ the task manager timeout a job can stay
 # in waiting without being reaped
 JOB_WAITING_GRACE_PERIOD = 60
@@ -822,6 +909,42 @@ ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC = False
 
 CALLBACK_QUEUE = "callback_tasks"
 
+# Backpressure from the callback receiver to running jobs.  When the callback
+# queue holds at least CALLBACK_BACKPRESSURE_SOFT_QUEUE_DEPTH events, or events
+# take CALLBACK_BACKPRESSURE_SOFT_LAG seconds to be saved, jobs only send
+# websocket messages for minimal events and drop events with no output.  At
+# CALLBACK_BACKPRESSURE_HARD_QUEUE_DEPTH jobs also pause, for up to
+# CALLBACK_BACKPRESSURE_MAX_BLOCK seconds per check, to let the receiver
+# catch up.  0 disables a threshold.
+CALLBACK_BACKPRESSURE_SOFT_QUEUE_DEPTH = 0
+CALLBACK_BACKPRESSURE_SOFT_LAG = 0
+CALLBACK_BACKPRESSURE_HARD_QUEUE_DEPTH = 0
+CALLBACK_BACKPRESSURE_MAX_BLOCK = 5
+CALLBACK_BACKPRESSURE_CHECK_INTERVAL = 1
+
+# The number of redis lists CALLBACK_QUEUE is sharded into by job id; each
+# callback receiver worker reads its own shards so that events of one job are
+# processed in order by one worker.  Best set to a multiple of JOB_EVENT_WORKERS;
+# a lower value is raised to JOB_EVENT_WORKERS, so that no two workers share a shard
+CALLBACK_QUEUE_SHARDS = 1
+
+# The number of callback events a running job buffers before pushing them to
+# CALLBACK_QUEUE with a single pipelined RPUSH; 1 pushes every event as it arrives
+CALLBACK_QUEUE_BATCH_SIZE = 1
+
+# The maximum number of seconds a buffered callback event may wait before it is
+# pushed to CALLBACK_QUEUE, regardless of CALLBACK_QUEUE_BATCH_SIZE
+CALLBACK_QUEUE_BATCH_MAX_DELAY = 0.25
+
+# The format callback events are written to CALLBACK_QUEUE in, 'json' or
+# 'msgpack'.  The callback receiver reads either, but only switch to msgpack
+# once every node in the cluster runs a receiver that understands it
+CALLBACK_QUEUE_CODEC = 'json'
+
+# With the msgpack codec, compress events of at least this many bytes with
+# zstd; 0 disables compression
+CALLBACK_QUEUE_COMPRESSION_THRESHOLD = 4096
+
 # Note: This setting may be overridden by database settings.
 ORG_ADMINS_CAN_SEE_ALL_USERS = True
 MANAGE_ORGANIZATION_AUTH = True
@@ -854,6 +977,10 @@ CHANNEL_LAYERS = {
     "default": {"BACKEND": "channels_redis.core.RedisChannelLayer", "CONFIG": {"hosts": [BROKER_URL], "capacity": 10000, "group_expiry": 157784760}}  # 5 years
 }
 
+# How many channel layer messages a process may have queued for sending before
+# emitting a websocket notification blocks, see ChannelNotificationPublisher
+CHANNEL_NOTIFICATION_QUEUE_SIZE = 10000
+
 # Logging configuration.
 LOGGING = {
     'version': 1,
@@ -1152,6 +1279,9 @@ from ansible_base.lib import dynamic_config  # noqa: E402
 
 include(os.path.join(os.path.dirname(dynamic_config.__file__), 'dynamic_settings.py'))
 
+# Query parameter used by the cursor pagination of event lists, not a field filter
+ANSIBLE_BASE_REST_FILTERS_RESERVED_NAMES += ('cursor',)  # noqa: F821
+
 # Add a postfix to the API URL patterns
 # example if set to '' API pattern will be /api
 # example if set to 'controller' API pattern will be /api AND /api/controller